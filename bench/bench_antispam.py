@@ -0,0 +1,98 @@
+"""Anti-spam con muchos usuarios distintos: listas sin límite frente a deques con barrido.
+
+Simula el paso de `--users` usuarios distintos que escriben cada uno
+`--messages` mensajes. Mide el coste por llamada a check_spam y la memoria
+que queda ocupada tras el tráfico y tras pasar la ventana anti-spam
+(con sweep_spam_windows en la versión actual; la antigua no tenía barrido).
+
+Uso: python bench/bench_antispam.py [--users 1000000] [--messages 3]
+"""
+import argparse
+import asyncio
+import gc
+import os
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bot
+from config import SPAM_WINDOW, SPAM_LIMIT
+
+
+# Copia de check_spam antes del cambio: una lista por usuario que se reconstruye en cada mensaje
+legacy_message_count = defaultdict(list)
+
+
+def legacy_check_spam(user_id):
+    current_time = time.time()
+    legacy_message_count[user_id] = [t for t in legacy_message_count[user_id] if current_time - t < SPAM_WINDOW]
+    legacy_message_count[user_id].append(current_time)
+    return len(legacy_message_count[user_id]) > SPAM_LIMIT
+
+
+def legacy_sweep():
+    """La versión antigua nunca olvidaba a nadie."""
+
+
+def current_sweep():
+    # Adelanta el reloj que ve el barrido como si hubiera pasado la ventana completa
+    real_time = bot.time
+    bot.time = SimpleNamespace(monotonic=lambda: real_time.monotonic() + SPAM_WINDOW)
+    try:
+        asyncio.run(bot.sweep_spam_windows(None))
+    finally:
+        bot.time = real_time
+
+
+def drive(check, users, messages):
+    for _ in range(messages):
+        for user_id in range(users):
+            check(user_id)
+
+
+def measure(check, sweep, store, users, messages):
+    store.clear()
+    gc.collect()
+    started = time.perf_counter()
+    drive(check, users, messages)
+    per_call = (time.perf_counter() - started) / (users * messages) * 1e6
+
+    store.clear()
+    gc.collect()
+    tracemalloc.start()
+    drive(check, users, messages)
+    after_traffic = tracemalloc.get_traced_memory()[0]
+    sweep()
+    gc.collect()
+    after_window = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    remaining = len(store)
+    store.clear()
+    return per_call, after_traffic, after_window, remaining
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--messages", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{args.users} users x {args.messages} messages\n")
+    print(f"{'version':<10} {'us/call':>8} {'MB after traffic':>17} {'MB after window':>16} {'users kept':>11}")
+    for name, check, sweep, store in (
+        ("list", legacy_check_spam, legacy_sweep, legacy_message_count),
+        ("deque", bot.check_spam, current_sweep, bot.user_message_count),
+    ):
+        per_call, after_traffic, after_window, remaining = measure(check, sweep, store, args.users, args.messages)
+        print(
+            f"{name:<10} {per_call:>8.2f} {after_traffic / 2**20:>17.1f} "
+            f"{after_window / 2**20:>16.1f} {remaining:>11}"
+        )
+
+
+if __name__ == "__main__":
+    main()
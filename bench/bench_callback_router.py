@@ -0,0 +1,79 @@
+"""Coste de resolver un callback_data: cadena de ==/startswith frente a CallbackRouter.
+
+Construye, con las mismas rutas registradas en bot.callback_router, una
+cadena lineal equivalente al antiguo button_callback (primero los valores
+exactos, después los prefijos del más largo al más corto) y mide cuánto
+cuesta encontrar el manejador de cada callback con una y otra.
+
+Uso: python bench/bench_callback_router.py [--repeat 20000]
+"""
+import argparse
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bot import callback_router
+
+
+def prefix_routes(node, path=""):
+    """Recorre el trie y devuelve los pares (prefijo, manejador)."""
+    routes = []
+    for char, child in node.items():
+        if char is None:
+            routes.append((path, child))
+        else:
+            routes.extend(prefix_routes(child, path + char))
+    return routes
+
+
+def build_chain(router):
+    exact = list(router.routes.items())
+    prefixes = sorted(prefix_routes(router.trie), key=lambda route: -len(route[0]))
+
+    def resolve(data):
+        for value, handler in exact:
+            if data == value:
+                return handler, None
+        for prefix, handler in prefixes:
+            if data.startswith(prefix):
+                return handler, data[len(prefix):]
+        return None, None
+
+    return resolve, exact, prefixes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=20000)
+    args = parser.parse_args()
+
+    chain, exact, prefixes = build_chain(callback_router)
+    samples = [value for value, _ in exact] + [prefix + "1234567890" for prefix, _ in prefixes]
+    samples.append("unknown_callback")
+
+    # Ambas versiones deben elegir el mismo manejador
+    for data in samples:
+        assert chain(data) == callback_router.resolve(data), data
+
+    results = {}
+    for name, resolve in (("chain", chain), ("router", callback_router.resolve)):
+        costs = []
+        for data in samples:
+            seconds = timeit.timeit(lambda: resolve(data), number=args.repeat)
+            costs.append(seconds / args.repeat * 1e9)
+        results[name] = costs
+
+    print(f"{len(exact)} exact routes, {len(prefixes)} prefix routes, {len(samples)} callbacks\n")
+    print(f"{'resolver':<8} {'mean ns':>8} {'p50 ns':>8} {'worst ns':>9}")
+    for name, costs in results.items():
+        ordered = sorted(costs)
+        print(
+            f"{name:<8} {sum(costs) / len(costs):>8.0f} "
+            f"{ordered[len(ordered) // 2]:>8.0f} {ordered[-1]:>9.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
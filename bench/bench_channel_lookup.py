@@ -0,0 +1,90 @@
+"""Búsqueda de un canal aprobado: recorrer toda la colección frente a get_approved_channel.
+
+Carga 50 000 canales en una base de datos desechable y compara el camino
+anterior (traer todos los canales y buscar el channel_id en Python) con la
+consulta puntual sobre el índice único channel_id.
+
+Necesita un MongoDB de pruebas: BENCH_MONGO_URI (o TEST_MONGO_URI). Se usa y
+se borra la base de datos botonera_bot_bench.
+
+Uso: BENCH_MONGO_URI=mongodb://localhost python bench/bench_channel_lookup.py [--channels 50000]
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pymongo import MongoClient
+
+from db import MongoDB
+
+
+def timed(func, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--channels", type=int, default=50000)
+    parser.add_argument("--lookups", type=int, default=20)
+    args = parser.parse_args()
+
+    uri = os.getenv("BENCH_MONGO_URI") or os.getenv("TEST_MONGO_URI")
+    if not uri:
+        sys.exit("BENCH_MONGO_URI (o TEST_MONGO_URI) no configurada")
+
+    client = MongoClient(uri)
+    database = MongoDB()
+    database.client = client
+    database._db = client.botonera_bot_bench
+    database._ready = True
+
+    try:
+        collection = database._db.approved_channels
+        collection.drop()
+        collection.create_index("channel_id", unique=True)
+        collection.insert_many([
+            {
+                "channel_id": f"-100{index:010d}",
+                "channel_name": f"Canal {index}",
+                "channel_username": f"canal_{index}",
+                "category": "Otros ♾",
+                "added_by": index % 5000,
+                "added_date": "2024-01-01 00:00:00",
+                "subscribers": index
+            }
+            for index in range(args.channels)
+        ])
+
+        targets = [f"-100{random.randrange(args.channels):010d}" for _ in range(args.lookups)]
+
+        def full_scan():
+            # Lo que hacían edit/delete/change_name/change_link antes
+            wanted = next(target)
+            channels = list(collection.find({}, {"_id": 0}))
+            return next(channel for channel in channels if channel["channel_id"] == wanted)
+
+        def point_lookup():
+            return database.get_approved_channel(next(target))
+
+        print(f"{args.channels} approved channels, {args.lookups} lookups\n")
+        print(f"{'method':<14} {'median ms':>10} {'max ms':>8}")
+        for name, func in (("full scan", full_scan), ("point lookup", point_lookup)):
+            target = iter(targets)
+            median, worst = timed(func, args.lookups)
+            print(f"{name:<14} {median:>10.2f} {worst:>8.2f}")
+    finally:
+        client.drop_database("botonera_bot_bench")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+"""Bloqueo del bucle de eventos con consultas a MongoDB síncronas frente a AsyncMongoDB.
+
+Simula una consulta de 50 ms y lanza varias a la vez desde corrutinas,
+como harían manejadores concurrentes. Un latido cada milisegundo mide
+cuánto tarda el bucle en atenderlo (retraso del bucle).
+
+Uso: python bench/bench_db_executor.py [--queries 40] [--delay 0.05]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import AsyncMongoDB
+
+
+class SlowMongo:
+    """Imita un método de MongoDB que tarda `delay` segundos en responder."""
+
+    def __init__(self, delay):
+        self.delay = delay
+
+    def get_auto_post_channels(self):
+        time.sleep(self.delay)
+        return []
+
+
+async def heartbeat(stop, lags, interval=0.001):
+    """Registra cuánto se retrasa cada latido respecto a lo programado."""
+    while not stop.is_set():
+        expected = time.perf_counter() + interval
+        await asyncio.sleep(interval)
+        lags.append(max(0.0, time.perf_counter() - expected))
+
+
+async def run(mode, queries, delay):
+    slow = SlowMongo(delay)
+    wrapper = AsyncMongoDB(slow) if mode == "executor" else None
+
+    async def query():
+        if wrapper:
+            await wrapper.get_auto_post_channels()
+        else:
+            slow.get_auto_post_channels()
+
+    stop = asyncio.Event()
+    lags = []
+    beat = asyncio.create_task(heartbeat(stop, lags))
+    await asyncio.sleep(0.01)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(query() for _ in range(queries)))
+    elapsed = time.perf_counter() - started
+
+    stop.set()
+    await beat
+    if wrapper:
+        wrapper.close()
+    return elapsed, lags
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--queries", type=int, default=40)
+    parser.add_argument("--delay", type=float, default=0.05)
+    args = parser.parse_args()
+
+    print(f"{args.queries} queries, {args.delay * 1000:.0f} ms each\n")
+    print(f"{'mode':<10} {'total s':>8} {'max stall ms':>13} {'p99 stall ms':>13} {'mean ms':>8}")
+    for mode in ("sync", "executor"):
+        elapsed, lags = asyncio.run(run(mode, args.queries, args.delay))
+        lags_ms = sorted(lag * 1000 for lag in lags) or [0.0]
+        p99 = lags_ms[min(len(lags_ms) - 1, int(len(lags_ms) * 0.99))]
+        print(f"{mode:<10} {elapsed:>8.2f} {lags_ms[-1]:>13.1f} {p99:>13.1f} {statistics.mean(lags_ms):>8.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Tiempo de arranque: desde lanzar el proceso hasta atender la primera actualización.
+
+Lanza `python bench/bench_startup.py --child` en un subproceso que importa
+bot.py y ejecuta main() tal cual, con la Bot API apuntando a un servidor
+falso (bench/fake_telegram.py). Mientras tanto llega una actualización cada
+`--interval` segundos; las que lleguen antes de que el bot empiece a leer se
+descartan, como hace Telegram con drop_pending_updates. Se mide cuánto tarda
+el import y cuánto pasa hasta que empieza el manejador de la primera.
+
+Con MONGO_URI sin definir o sin servidor la conexión falla en segundo plano
+(warm_up lo reintenta), lo que también comprueba que no retrasa el arranque.
+
+Uso: python bench/bench_startup.py [--runs 5] [--interval 0.01]
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_telegram import FakeTelegram
+
+
+def make_update(update_id):
+    user = {"id": update_id, "is_bot": False, "first_name": "User"}
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": 1,
+            "date": int(time.time()),
+            "chat": {"id": update_id, "type": "private"},
+            "from": user,
+            "text": "hola"
+        }
+    }
+
+
+def child(base_url, spawned):
+    """Arranca el bot real y sale en cuanto empieza a atender la primera actualización."""
+    import bot
+    imported = time.monotonic()
+
+    from telegram import Update
+    from telegram.ext import Application, TypeHandler
+
+    class BenchApplication(Application):
+        @staticmethod
+        def builder():
+            return Application.builder().base_url(base_url)
+
+    async def first_update(update, context):
+        print(json.dumps({"import": imported - spawned, "first_update": time.monotonic() - spawned}), flush=True)
+        os._exit(0)
+
+    run_polling = Application.run_polling
+
+    def run_polling_tracked(self, *args, **kwargs):
+        # Antes que cualquier manejador del bot
+        self.add_handler(TypeHandler(Update, first_update), group=-1)
+        return run_polling(self, *args, **kwargs)
+
+    bot.Application = BenchApplication
+    Application.run_polling = run_polling_tracked
+    bot.main()
+
+
+async def measure(interval):
+    fake = await FakeTelegram(latency=0.05).start()
+    spawned = time.monotonic()
+    process = await asyncio.create_subprocess_exec(
+        sys.executable, os.path.abspath(__file__), "--child", fake.base_url, repr(spawned),
+        stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.DEVNULL
+    )
+
+    async def emit():
+        update_id = 0
+        while True:
+            update_id += 1
+            fake.updates.put_nowait(make_update(update_id))
+            await asyncio.sleep(interval)
+
+    emitter = asyncio.create_task(emit())
+    try:
+        output = await asyncio.wait_for(process.stdout.readline(), timeout=120)
+        await process.wait()
+    finally:
+        emitter.cancel()
+        await fake.stop()
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--interval", type=float, default=0.01)
+    parser.add_argument("--child", nargs=2, metavar=("BASE_URL", "SPAWNED"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child[0], float(args.child[1]))
+        return
+
+    runs = [asyncio.run(measure(args.interval)) for _ in range(args.runs)]
+    print(f"{args.runs} runs, MONGO_URI {'set' if os.getenv('MONGO_URI') else 'not set'}\n")
+    print(f"{'phase':<24} {'median ms':>10} {'max ms':>8}")
+    for key, label in (("import", "spawn -> import bot"), ("first_update", "spawn -> first update")):
+        values = [run[key] * 1000 for run in runs]
+        print(f"{label:<24} {statistics.median(values):>10.0f} {max(values):>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
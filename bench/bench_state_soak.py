@@ -0,0 +1,86 @@
+"""Prueba de resistencia de los estados por usuario: 24 horas simuladas.
+
+Cada minuto simulado llegan `--users-per-minute` usuarios nuevos que
+empiezan a crear un post; solo una parte lo termina, el resto lo abandona.
+Compara un diccionario normal (como antes) con StateStore barrido cada
+STATE_SWEEP_INTERVAL segundos, toma la memoria cada hora y comprueba que la
+de StateStore se mantiene plana. El reloj es falso, así que tarda segundos.
+
+Uso: python bench/bench_state_soak.py [--hours 24] [--users-per-minute 2]
+"""
+import argparse
+import os
+import random
+import sys
+from types import SimpleNamespace
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bot
+import cache
+from cache import StateStore, deep_sizeof
+from config import STATE_MAX_ENTRIES, STATE_TTL, STATE_SWEEP_INTERVAL
+
+FINISH_RATIO = 0.3  # usuarios que terminan el post y liberan su estado
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self):
+        return self.now
+
+
+def soak(store, hours, users_per_minute, clock):
+    """Devuelve (hora, entradas, bytes) muestreados cada hora."""
+    rng = random.Random(14)
+    bot.post_creation_state = store
+    samples = []
+    user_id = 0
+    for minute in range(hours * 60 + 1):
+        clock.now = minute * 60.0
+        for _ in range(users_per_minute):
+            user_id += 1
+            bot.init_post_state(user_id)
+            if rng.random() < FINISH_RATIO:
+                del store[user_id]
+        if isinstance(store, StateStore) and clock.now % STATE_SWEEP_INTERVAL == 0:
+            store.sweep()
+        if minute % 60 == 0:
+            size = store.memory_usage() if isinstance(store, StateStore) else deep_sizeof(store)
+            samples.append((minute // 60, len(store), size))
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--hours", type=int, default=24)
+    parser.add_argument("--users-per-minute", type=int, default=2)
+    args = parser.parse_args()
+
+    clock = FakeClock()
+    real_time = cache.time
+    cache.time = SimpleNamespace(monotonic=clock.monotonic)
+    try:
+        legacy = soak({}, args.hours, args.users_per_minute, clock)
+        store = StateStore(STATE_MAX_ENTRIES, STATE_TTL)
+        bounded = soak(store, args.hours, args.users_per_minute, clock)
+    finally:
+        cache.time = real_time
+
+    print(f"{args.hours} h, {args.users_per_minute} new users/min, TTL {STATE_TTL}s, max {STATE_MAX_ENTRIES}\n")
+    print(f"{'hour':>4} {'dict entries':>13} {'dict KB':>9} {'store entries':>14} {'store KB':>9}")
+    for (hour, legacy_len, legacy_size), (_, store_len, store_size) in zip(legacy, bounded):
+        print(f"{hour:>4} {legacy_len:>13} {legacy_size / 1024:>9.0f} {store_len:>14} {store_size / 1024:>9.0f}")
+    print(f"\nevictions {store.evictions}, expirations {store.expirations}")
+
+    # Pasada la primera mitad la memoria solo oscila por el azar del tráfico y los barridos
+    steady = [size for hour, _, size in bounded if hour >= args.hours // 2]
+    assert all(length <= STATE_MAX_ENTRIES for _, length, _ in bounded), "StateStore supera su tamaño máximo"
+    assert max(steady) <= min(steady) * 1.15, f"La memoria crece: {min(steady)} -> {max(steady)} bytes"
+    print("OK: StateStore memory is flat")
+
+
+if __name__ == "__main__":
+    main()
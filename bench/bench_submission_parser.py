@@ -0,0 +1,135 @@
+"""Análisis de solicitudes de canal: parser antiguo frente a parse_submission + CategoryIndex.
+
+Genera un corpus determinista de `--messages` mensajes de grupo. La mayoría
+son conversación normal que contiene "#" (hashtags, números, precios) y una
+pequeña parte son solicitudes con el formato de categoría, nombre, @usuario e
+ID. Mide el coste medio por mensaje de cada parser y cuántas solicitudes
+completas reconoce cada uno.
+
+Uso: python bench/bench_submission_parser.py [--messages 100000] [--submissions 0.05]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import CATEGORIES, CATEGORY_ALIASES
+from submission import CategoryIndex, parse_submission
+
+CHAT_WITH_HASH = [
+    "jajaja el #{n} de la lista es buenísimo",
+    "alguien tiene el cap {n}? #ayuda",
+    "precio: {n}# negociable",
+    "#offtopic pero hoy hace un calor tremendo",
+    "mañana a las {n} en el canal, no falten #directo",
+    "quedó en el puesto #{n} del ranking",
+    "buenas a todos 👋\nme uno al grupo\n#saludos",
+]
+CHAT_PLAIN = [
+    "hola, alguien sabe cómo entrar al canal?",
+    "gracias admin!",
+    "ok 👍",
+]
+CATEGORY_SPELLINGS = [
+    "Películas y Series 🖥", "Anime", "música", "Videojuegos", "Memes", "frases",
+    "Libros 📚", "wallpapers", "Fotografia", "Apps", "Bins", "Redes Sociales",
+    "Noticias", "deportes", "Grupos", "otros", "+18", "Pelis", "Gaming",
+]
+
+
+def build_corpus(count, submission_ratio):
+    rng = random.Random(20)
+    corpus = []
+    submissions = 0
+    for index in range(count):
+        roll = rng.random()
+        if roll < submission_ratio:
+            submissions += 1
+            category = rng.choice(CATEGORY_SPELLINGS)
+            corpus.append(
+                f"#{category}\nCanal de prueba {index}\n@canal_{index}\n"
+                f"ID: -100{rng.randrange(10**9, 10**10)}\nAdmin: @usuario_{index}"
+            )
+        elif roll < 0.95:
+            corpus.append(rng.choice(CHAT_WITH_HASH).format(n=rng.randrange(1, 500)))
+        else:
+            corpus.append(rng.choice(CHAT_PLAIN))
+    return corpus, submissions
+
+
+def legacy_parse(message_text):
+    """Copia de la lógica de process_channel_submission antes del cambio, sin las respuestas."""
+    if "#" not in message_text:
+        return None
+
+    category_match = re.search(r'#([^\n]+)', message_text)
+    if not category_match:
+        return None
+
+    category_text = category_match.group(1).strip()
+
+    valid_category = None
+    for cat in CATEGORIES.keys():
+        if category_text.lower() in cat.lower():
+            valid_category = cat
+            break
+
+    if not valid_category:
+        return None
+
+    lines = message_text.split('\n')
+    channel_name = None
+    channel_username = None
+    channel_id = None
+
+    for i, line in enumerate(lines):
+        if '#' in line and i < len(lines) - 1:
+            channel_name = lines[i + 1].strip()
+
+        if '@' in line and 'admin' not in line.lower():
+            username_match = re.search(r'@(\w+)', line)
+            if username_match:
+                channel_username = username_match.group(1)
+
+        if 'ID' in line or 'id' in line:
+            id_match = re.search(r'[-]?\d+', line)
+            if id_match:
+                channel_id = id_match.group(0)
+
+    if not (channel_name and channel_username and channel_id):
+        return None
+    return valid_category
+
+
+def current_parse(message_text, index):
+    parsed = parse_submission(message_text, index)
+    if parsed is None or parsed.error:
+        return None
+    return parsed.category
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--messages", type=int, default=100_000)
+    parser.add_argument("--submissions", type=float, default=0.05)
+    args = parser.parse_args()
+
+    corpus, submissions = build_corpus(args.messages, args.submissions)
+    with_hash = sum("#" in message for message in corpus)
+    index = CategoryIndex(CATEGORIES, CATEGORY_ALIASES)
+
+    print(f"{len(corpus)} messages, {with_hash} contain '#', {submissions} are submissions\n")
+    print(f"{'parser':<8} {'us/msg':>7} {'accepted':>9}")
+    for name, parse in (("legacy", legacy_parse), ("current", lambda text: current_parse(text, index))):
+        started = time.perf_counter()
+        accepted = sum(parse(message) is not None for message in corpus)
+        elapsed = time.perf_counter() - started
+        print(f"{name:<8} {elapsed / len(corpus) * 1e6:>7.2f} {accepted:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""Latencia de entrega de actualizaciones: webhook frente a long polling.
+
+Envía `--updates` actualizaciones a `--rate` por segundo, cada una de un
+chat distinto, y mide cuánto pasa desde que "Telegram" la emite hasta que
+empieza su manejador. En polling la Bot API falsa (bench/fake_telegram.py)
+las entrega por getUpdates; en webhook se envían por POST al servidor
+integrado de Updater.start_webhook con el secret token, como hace main()
+con BOT_MODE=webhook. `--latency` es la ida y vuelta de red simulada.
+
+El lado de Telegram corre en otro proceso para no competir con el bot por
+el bucle de eventos; el momento de envío viaja en el texto del mensaje.
+
+Uso: python bench/bench_webhook_load.py [--updates 2000] [--rate 200] [--latency 0.1]
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import socket
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from telegram import Update
+from telegram.ext import Application, TypeHandler
+
+from config import MAX_CONCURRENT_UPDATES, WEBHOOK_MAX_CONNECTIONS
+from processor import KeyedUpdateProcessor
+from fake_telegram import FakeTelegram
+
+SECRET_TOKEN = "bench-secret"
+
+
+def make_update(update_id):
+    user = {"id": update_id, "is_bot": False, "first_name": "User"}
+    return {
+        "update_id": update_id,
+        "message": {
+            "message_id": 1,
+            "date": int(time.time()),
+            "chat": {"id": update_id, "type": "private"},
+            "from": user,
+            # CLOCK_MONOTONIC es común a todos los procesos
+            "text": repr(time.monotonic())
+        }
+    }
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def telegram_side(mode, count, rate, latency, webhook_url, conn):
+    """Bot API falsa y emisor de actualizaciones, en su propio proceso."""
+    loop = asyncio.get_running_loop()
+    fake = await FakeTelegram(latency=latency).start()
+    conn.send(fake.base_url)
+    await loop.run_in_executor(None, conn.recv)
+
+    client = httpx.AsyncClient(limits=httpx.Limits(max_connections=WEBHOOK_MAX_CONNECTIONS))
+    pending = set()
+
+    async def push(update):
+        # Medio trayecto de red hasta el servidor del bot
+        await asyncio.sleep(latency / 2)
+        response = await client.post(
+            webhook_url, json=update,
+            headers={"X-Telegram-Bot-Api-Secret-Token": SECRET_TOKEN}
+        )
+        response.raise_for_status()
+
+    started = time.perf_counter()
+    for update_id in range(1, count + 1):
+        await asyncio.sleep(max(0, started + update_id / rate - time.perf_counter()))
+        update = make_update(update_id)
+        if mode == "polling":
+            fake.updates.put_nowait(update)
+        else:
+            task = asyncio.create_task(push(update))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+
+    await loop.run_in_executor(None, conn.recv)
+    await client.aclose()
+    await fake.stop()
+
+
+def run_telegram_side(*args):
+    asyncio.run(telegram_side(*args))
+
+
+async def run(mode, count, rate, latency):
+    port = free_port()
+    conn, child_conn = multiprocessing.Pipe()
+    process = multiprocessing.Process(
+        target=run_telegram_side,
+        args=(mode, count, rate, latency, f"http://127.0.0.1:{port}/webhook", child_conn)
+    )
+    process.start()
+    loop = asyncio.get_running_loop()
+    base_url = await loop.run_in_executor(None, conn.recv)
+
+    application = (
+        Application.builder()
+        .token("123:bench")
+        .base_url(base_url)
+        .concurrent_updates(KeyedUpdateProcessor(MAX_CONCURRENT_UPDATES))
+        .build()
+    )
+    delays = []
+    done = asyncio.Event()
+
+    async def record(update, context):
+        delays.append(time.monotonic() - float(update.message.text))
+        if len(delays) == count:
+            done.set()
+
+    application.add_handler(TypeHandler(Update, record))
+
+    try:
+        async with application:
+            await application.start()
+            if mode == "polling":
+                await application.updater.start_polling(poll_interval=0, timeout=10)
+            else:
+                await application.updater.start_webhook(
+                    listen="127.0.0.1", port=port, url_path="webhook",
+                    secret_token=SECRET_TOKEN, max_connections=WEBHOOK_MAX_CONNECTIONS
+                )
+            conn.send("start")
+            await asyncio.wait_for(done.wait(), timeout=120)
+            await application.updater.stop()
+            await application.stop()
+    finally:
+        conn.send("stop")
+        process.join()
+    return sorted(delays)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--updates", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=200)
+    parser.add_argument("--latency", type=float, default=0.1)
+    args = parser.parse_args()
+    logging.getLogger("telegram").setLevel(logging.ERROR)
+
+    print(f"{args.updates} updates at {args.rate:.0f}/s, {args.latency * 1000:.0f} ms network round trip\n")
+    print(f"{'mode':<8} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}")
+    for mode in ("polling", "webhook"):
+        delays = asyncio.run(run(mode, args.updates, args.rate, args.latency))
+        p50 = delays[len(delays) // 2] * 1000
+        p99 = delays[int(len(delays) * 0.99)] * 1000
+        print(f"{mode:<8} {p50:>8.1f} {p99:>8.1f} {delays[-1] * 1000:>8.1f}")
+
+
+if __name__ == "__main__":
+    main()
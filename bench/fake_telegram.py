@@ -0,0 +1,158 @@
+"""Servidor local que imita la Bot API de Telegram para los benchmarks.
+
+Responde a los métodos que usan los benchmarks (getMe, sendMessage,
+sendPhoto, getUpdates, setWebhook, deleteWebhook...) con una latencia fija y
+aplica los mismos límites que Telegram: unos 30 mensajes por segundo en
+total y uno por segundo en cada chat. Al superarlos responde 429 con
+retry_after, igual que la API real.
+"""
+import asyncio
+import json
+import time
+from collections import deque
+from urllib.parse import parse_qsl
+
+BOT_USER = {"id": 1, "is_bot": True, "first_name": "Bench", "username": "bench_bot"}
+SEND_METHODS = {"sendmessage", "sendphoto"}
+
+
+class FakeTelegram:
+    """Bot API falsa sobre asyncio.start_server, sin dependencias externas."""
+
+    def __init__(self, latency=0.05, rate=30, chat_interval=1.0):
+        self.latency = latency
+        self.rate = rate
+        self.chat_interval = chat_interval
+        self.requests = 0
+        self.sent = 0
+        self.rejected = 0
+        # Actualizaciones pendientes para getUpdates
+        self.updates = asyncio.Queue()
+        self._sent_times = deque()
+        self._chat_last = {}
+        self._message_id = 0
+        self._server = None
+        self.port = None
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.port}/bot"
+
+    async def start(self):
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    def _limit(self, chat_id):
+        """Devuelve los segundos que hay que esperar si el envío supera algún límite."""
+        now = time.monotonic()
+        while self._sent_times and now - self._sent_times[0] >= 1:
+            self._sent_times.popleft()
+        if len(self._sent_times) >= self.rate:
+            return 1
+        last = self._chat_last.get(chat_id)
+        if last is not None and now - last < self.chat_interval:
+            return 1
+        self._sent_times.append(now)
+        self._chat_last[chat_id] = now
+        return 0
+
+    async def _dispatch(self, method, params):
+        if method == "getme":
+            return BOT_USER
+        if method == "deletewebhook" and params.get("drop_pending_updates") == "true":
+            # Igual que Telegram: se descartan las actualizaciones que nadie ha recogido
+            while not self.updates.empty():
+                self.updates.get_nowait()
+            return True
+        if method in ("setwebhook", "deletewebhook", "deletemessage"):
+            return True
+        if method == "getupdates":
+            timeout = float(params.get("timeout") or 0)
+            updates = []
+            try:
+                updates.append(await asyncio.wait_for(self.updates.get(), timeout or 0.01))
+            except asyncio.TimeoutError:
+                return []
+            while not self.updates.empty():
+                updates.append(self.updates.get_nowait())
+            return updates
+        if method in SEND_METHODS:
+            chat_id = params.get("chat_id")
+            retry_after = self._limit(chat_id)
+            if retry_after:
+                self.rejected += 1
+                return {"__error__": 429, "retry_after": retry_after}
+            self.sent += 1
+            self._message_id += 1
+            message = {
+                "message_id": self._message_id,
+                "date": int(time.time()),
+                "chat": {"id": int(chat_id), "type": "channel"},
+                "text": params.get("text", "")
+            }
+            if method == "sendphoto":
+                message["photo"] = [{
+                    "file_id": f"file_{self._message_id}",
+                    "file_unique_id": "unique_photo",
+                    "width": 1280,
+                    "height": 720
+                }]
+            return message
+        return True
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                _, path, _ = request_line.decode().split(" ", 2)
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = line.decode().partition(":")
+                    headers[key.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                self.requests += 1
+                params = dict(parse_qsl(body.decode())) if body else {}
+                method = path.rsplit("/", 1)[-1].lower()
+                if method == "getupdates":
+                    # Ida y vuelta de la petición larga: medio trayecto antes y medio al responder
+                    await asyncio.sleep(self.latency / 2)
+                    result = await self._dispatch(method, params)
+                    if result:
+                        await asyncio.sleep(self.latency / 2)
+                else:
+                    await asyncio.sleep(self.latency)
+                    result = await self._dispatch(method, params)
+
+                if isinstance(result, dict) and "__error__" in result:
+                    status = "429 Too Many Requests"
+                    payload = {
+                        "ok": False,
+                        "error_code": 429,
+                        "description": "Too Many Requests: retry later",
+                        "parameters": {"retry_after": result["retry_after"]}
+                    }
+                else:
+                    status = "200 OK"
+                    payload = {"ok": True, "result": result}
+                data = json.dumps(payload).encode()
+                writer.write(
+                    f"HTTP/1.1 {status}\r\nContent-Type: application/json\r\n"
+                    f"Content-Length: {len(data)}\r\n\r\n".encode() + data
+                )
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.CancelledError):
+            # Cliente desconectado o servidor parado con un getUpdates pendiente
+            pass
+        finally:
+            writer.close()
@@ -1,23 +1,44 @@
 import logging
-import re
 import html
+import hashlib
 import os
 import time
 import asyncio
+import heapq
 import telegram
-from datetime import datetime, timedelta
-from collections import defaultdict, Counter
+from datetime import datetime, timedelta, timezone
+from collections import defaultdict, deque
 
 from telegram import Update, InlineKeyboardButton, InlineKeyboardMarkup, Bot, ChatPermissions
-from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, ContextTypes, filters
+from telegram.ext import Application, CommandHandler, MessageHandler, CallbackQueryHandler, ChatMemberHandler, ContextTypes, filters
 from telegram.constants import ParseMode, ChatType
 from telegram.error import TelegramError, BadRequest
+from pymongo.errors import PyMongoError
 
 from config import *
-from db import MongoDB
+from db import MongoDB, AsyncMongoDB, StatsBuffer
+from cache import StateStore
+from router import CallbackRouter
+from submission import CategoryIndex, parse_submission
+from processor import KeyedUpdateProcessor
+from ratelimit import RateLimiter
 
-# Inicializar la base de datos MongoDB
-db = MongoDB()
+# Inicializar la base de datos MongoDB (las consultas se ejecutan fuera del bucle de eventos)
+db = AsyncMongoDB(MongoDB())
+
+# Estadísticas por mensaje acumuladas en memoria y escritas en lote
+stats_buffer = StatsBuffer(db)
+
+# Límite global y por chat de los envíos masivos
+broadcast_limiter = RateLimiter(BROADCAST_RATE, BROADCAST_CHAT_INTERVAL)
+
+# Imágenes de las publicaciones automáticas: subidas reales (datos o URL), envíos con file_id,
+# file_id guardados para posts antiguos y bytes enviados
+photo_metrics = {"uploads": 0, "reused": 0, "file_id_backfills": 0, "bytes_uploaded": 0, "last_publish_bytes": 0}
+
+# Manejadores de los botones, registrados con decoradores
+callback_router = CallbackRouter()
+category_index = CategoryIndex(CATEGORIES, CATEGORY_ALIASES)
 
 # Configuración de logging
 logging.basicConfig(
@@ -31,8 +52,6 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Almacenamiento en memoria
-pending_submissions = {}
-admin_rejecting = {}
 custom_welcome = {
     "message": DEFAULT_WELCOME_MESSAGE,
     "buttons": [
@@ -41,18 +60,20 @@ custom_welcome = {
         {"text": "📣 Canales y Grupos 👥", "callback_data": "user_channels"}
     ]
 }
-user_message_count = defaultdict(list)  # Para anti-spam
-muted_users = {}  # Para seguimiento de usuarios silenciados
-user_stats = defaultdict(Counter)  # Para estadísticas
-user_warnings = defaultdict(int)  # Para sistema de advertencias
-user_last_activity = {}  # Para seguimiento de actividad
-user_editing_state = {}  # Para seguimiento de estados de edición
+user_message_count = {}  # Para anti-spam: últimos envíos de cada usuario
+chat_admins = {}  # IDs de administradores por chat y momento en que caducan
+admin_refreshes = {}  # Consultas de administradores en curso por chat
+muted_users = {}  # Fin del silencio (UTC) por (chat_id, user_id)
+mute_expirations = []  # Montículo de (fin del silencio, chat_id, user_id)
 scheduled_posts = {}  # Para posts programados
+dirty_categories = set()  # Categorías con cambios pendientes de publicar
+category_hashes = {}  # Hash del último contenido publicado por (categoría, parte)
+category_shards = {}  # IDs de mensajes adicionales de cada categoría
 
-post_creation_state = {}  # Estado de creación de posts
-user_editing_state = {}   # Estado de edición de usuario
-admin_rejecting = {}      # Estado de rechazo de admin
-pending_submissions = {}   # Solicitudes pendientes
+# Estados de conversación por usuario: caducan sin uso y tienen un tamaño máximo
+post_creation_state = StateStore(STATE_MAX_ENTRIES, STATE_TTL)  # Estado de creación de posts
+user_editing_state = StateStore(STATE_MAX_ENTRIES, STATE_TTL)   # Estado de edición de usuario
+admin_rejecting = StateStore(STATE_MAX_ENTRIES, STATE_TTL)      # Estado de rechazo de admin
 
 def init_post_state(user_id: int) -> None:
     """Inicializa el estado de creación de post para un usuario."""
@@ -60,6 +81,7 @@ def init_post_state(user_id: int) -> None:
         "post_id": f"post_{int(time.time())}",
         "text": "",
         "image": None,
+        "image_file_unique_id": None,
         "buttons": [],
         "selected_channels": [],
         "schedule": {
@@ -75,21 +97,48 @@ def init_post_state(user_id: int) -> None:
     }
 
 # Cargar configuración desde MongoDB
-def load_config_from_db():
+async def load_config_from_db():
     """Carga la configuración desde la base de datos MongoDB."""
-    global custom_welcome
-    
-    welcome_message = db.load_config("welcome_message")
+    welcome_message = await db.load_config("welcome_message")
     if welcome_message:
         custom_welcome["message"] = welcome_message
     
-    welcome_buttons = db.load_config("welcome_buttons")
+    welcome_buttons = await db.load_config("welcome_buttons")
     if welcome_buttons:
         custom_welcome["buttons"] = welcome_buttons
     
-    # Cargar solicitudes pendientes
-    global pending_submissions
-    pending_submissions = db.get_pending_submissions()
+    # Cargar los mensajes adicionales de cada categoría
+    shards = await db.load_config("category_shards")
+    if shards:
+        category_shards.update(shards)
+    
+    # Cargar los silencios que siguen activos
+    for mute in await db.get_active_mutes():
+        until = mute["until"].replace(tzinfo=timezone.utc)
+        muted_users[(mute["chat_id"], mute["user_id"])] = until
+        mute_expirations.append((until, mute["chat_id"], mute["user_id"]))
+    heapq.heapify(mute_expirations)
+
+async def warm_up(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Carga el estado y precalienta las cachés en segundo plano al arrancar el bot."""
+    started = time.perf_counter()
+    
+    # La primera consulta abre la conexión y prepara el esquema si hace falta.
+    # Los demás métodos ocultan los errores, así que se comprueba antes de cargar nada
+    try:
+        await db.check_connection()
+    except PyMongoError as e:
+        logger.error(f"MongoDB unavailable during warm-up, retrying in {WARM_UP_RETRY_DELAY}s: {e}")
+        context.job_queue.run_once(warm_up, WARM_UP_RETRY_DELAY)
+        return
+    
+    await load_config_from_db()
+    await load_scheduled_posts(context)
+    
+    # Precalentar la caché de canales de cada categoría
+    await asyncio.gather(*(db.get_approved_channels(category=category) for category in CATEGORIES))
+    
+    logger.info(f"Warm-up completed in {time.perf_counter() - started:.2f}s")
 
 
 # Funciones de utilidad
@@ -99,23 +148,93 @@ async def is_admin(user_id, chat_id, context):
         return True
     
     try:
-        chat_member = await context.bot.get_chat_member(chat_id, user_id)
-        return chat_member.status in ["creator", "administrator"]
+        return user_id in await get_chat_admin_ids(chat_id, context)
     except TelegramError:
         return False
 
+async def get_chat_admin_ids(chat_id, context):
+    """Devuelve los IDs de los administradores del chat, consultando a Telegram solo si la caché caducó."""
+    cached = chat_admins.get(chat_id)
+    if cached and cached[1] > time.monotonic():
+        return cached[0]
+    
+    # Una sola consulta en curso por chat; el resto de llamadas esperan su resultado
+    task = admin_refreshes.get(chat_id)
+    if task is None:
+        task = asyncio.create_task(refresh_chat_admins(chat_id, context))
+        admin_refreshes[chat_id] = task
+        task.add_done_callback(lambda _: admin_refreshes.pop(chat_id, None))
+    
+    return await asyncio.shield(task)
+
+async def refresh_chat_admins(chat_id, context):
+    """Carga los administradores del chat desde Telegram."""
+    administrators = await context.bot.get_chat_administrators(chat_id)
+    admin_ids = {member.user.id for member in administrators}
+    chat_admins[chat_id] = (admin_ids, time.monotonic() + ADMIN_CACHE_TTL)
+    return admin_ids
+
+async def track_chat_admins(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Mantiene la caché de administradores al día con los cambios de miembros."""
+    member_update = update.chat_member or update.my_chat_member
+    cached = chat_admins.get(member_update.chat.id)
+    if not cached:
+        return
+    
+    user_id = member_update.new_chat_member.user.id
+    if member_update.new_chat_member.status in ["creator", "administrator"]:
+        cached[0].add(user_id)
+    else:
+        cached[0].discard(user_id)
+
 def check_spam(user_id):
     """Verifica si un usuario está enviando spam."""
-    current_time = time.time()
+    current_time = time.monotonic()
+    
+    # Solo hace falta recordar los últimos SPAM_LIMIT + 1 mensajes
+    timestamps = user_message_count.get(user_id)
+    if timestamps is None:
+        timestamps = user_message_count[user_id] = deque(maxlen=SPAM_LIMIT + 1)
     
     # Eliminar mensajes antiguos
-    user_message_count[user_id] = [t for t in user_message_count[user_id] if current_time - t < SPAM_WINDOW]
+    while timestamps and current_time - timestamps[0] >= SPAM_WINDOW:
+        timestamps.popleft()
     
     # Añadir mensaje actual
-    user_message_count[user_id].append(current_time)
+    timestamps.append(current_time)
     
     # Verificar límite
-    return len(user_message_count[user_id]) > SPAM_LIMIT
+    return len(timestamps) > SPAM_LIMIT
+
+async def sweep_spam_windows(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Olvida a los usuarios que no han escrito durante la ventana anti-spam."""
+    current_time = time.monotonic()
+    idle_users = [
+        user_id for user_id, timestamps in user_message_count.items()
+        if not timestamps or current_time - timestamps[-1] >= SPAM_WINDOW
+    ]
+    for user_id in idle_users:
+        del user_message_count[user_id]
+
+async def register_mute(chat_id, user_id, until, reason):
+    """Registra un silencio en memoria y en la base de datos."""
+    muted_users[(chat_id, user_id)] = until
+    heapq.heappush(mute_expirations, (until, chat_id, user_id))
+    await db.save_mute(chat_id, user_id, until, reason)
+
+async def remove_mute(chat_id, user_id):
+    """Quita un silencio antes de que termine."""
+    muted_users.pop((chat_id, user_id), None)
+    await db.delete_mute(chat_id, user_id)
+
+async def sweep_mutes(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Retira de memoria los silencios que ya terminaron."""
+    now = datetime.now(timezone.utc)
+    while mute_expirations and mute_expirations[0][0] <= now:
+        until, chat_id, user_id = heapq.heappop(mute_expirations)
+        # Si el silencio se quitó o se amplió, esta entrada del montículo está obsoleta
+        if muted_users.get((chat_id, user_id)) == until:
+            del muted_users[(chat_id, user_id)]
 
 def format_time_delta(seconds):
     """Formatea un número de segundos en un formato legible."""
@@ -174,7 +293,7 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     
     # Actualizar estadísticas
     if update.effective_user:
-        db.update_user_stats(update.effective_user.id, update.effective_chat.id, "commands")
+        stats_buffer.add(update.effective_user.id, update.effective_chat.id, "commands")
 
 async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Maneja el comando /help."""
@@ -204,7 +323,7 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     
     # Actualizar estadísticas
     if update.effective_user:
-        db.update_user_stats(update.effective_user.id, update.effective_chat.id, "commands")
+        stats_buffer.add(update.effective_user.id, update.effective_chat.id, "commands")
 
 async def welcome_new_member(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Da la bienvenida a nuevos miembros del grupo."""
@@ -267,7 +386,7 @@ async def set_welcome(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
     custom_welcome["message"] = new_message
     
     # Guardar en la base de datos
-    db.save_config("welcome_message", new_message)
+    await db.save_config("welcome_message", new_message)
     
     # Mostrar vista previa
     keyboard = []
@@ -292,7 +411,7 @@ async def set_welcome(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
     )
 
 # Actualizar estadísticas
-    db.update_user_stats(user_id, chat_id, "commands")
+    stats_buffer.add(user_id, chat_id, "commands")
 
 async def add_welcome_button(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Añade un botón al mensaje de bienvenida."""
@@ -320,12 +439,12 @@ async def add_welcome_button(update: Update, context: ContextTypes.DEFAULT_TYPE)
     custom_welcome["buttons"].append({"text": button_text, "url": button_url})
     
     # Guardar en la base de datos
-    db.save_config("welcome_buttons", custom_welcome["buttons"])
+    await db.save_config("welcome_buttons", custom_welcome["buttons"])
     
     await update.message.reply_text(f"✅ Botón añadido: {button_text} -> {button_url}")
     
     # Actualizar estadísticas
-    db.update_user_stats(user_id, chat_id, "commands")
+    stats_buffer.add(user_id, chat_id, "commands")
 
 async def remove_welcome_button(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Elimina un botón del mensaje de bienvenida."""
@@ -351,7 +470,7 @@ async def remove_welcome_button(update: Update, context: ContextTypes.DEFAULT_TY
     await update.message.reply_text("Selecciona el botón que deseas eliminar:", reply_markup=reply_markup)
     
     # Actualizar estadísticas
-    db.update_user_stats(user_id, chat_id, "commands")
+    stats_buffer.add(user_id, chat_id, "commands")
 
 async def show_welcome(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Muestra la configuración actual del mensaje de bienvenida."""
@@ -394,7 +513,7 @@ async def show_welcome(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
     )
     
     # Actualizar estadísticas
-    db.update_user_stats(user_id, chat_id, "commands")
+    stats_buffer.add(user_id, chat_id, "commands")
 
 async def reset_welcome(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Restablece el mensaje de bienvenida a los valores predeterminados."""
@@ -415,13 +534,13 @@ async def reset_welcome(update: Update, context: ContextTypes.DEFAULT_TYPE) -> N
     ]
     
     # Guardar en la base de datos
-    db.save_config("welcome_message", DEFAULT_WELCOME_MESSAGE)
-    db.save_config("welcome_buttons", custom_welcome["buttons"])
+    await db.save_config("welcome_message", DEFAULT_WELCOME_MESSAGE)
+    await db.save_config("welcome_buttons", custom_welcome["buttons"])
     
     await update.message.reply_text("✅ Mensaje de bienvenida restablecido a los valores predeterminados.")
     
     # Actualizar estadísticas
-    db.update_user_stats(user_id, chat_id, "commands")
+    stats_buffer.add(user_id, chat_id, "commands")
 
 async def process_channel_submission(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Procesa solicitudes de canales."""
@@ -432,58 +551,27 @@ async def process_channel_submission(update: Update, context: ContextTypes.DEFAU
     message_text = update.message.text
     user = update.effective_user
     
-    # Verificar si el mensaje contiene formato de solicitud de canal
-    if "#" not in message_text:
+    # Analizar la solicitud (None si el mensaje no tiene una línea de categoría)
+    parsed = parse_submission(message_text, category_index)
+    if parsed is None:
         return
     
-    # Intentar analizar la solicitud
     try:
-        # Extraer categoría usando regex
-        category_match = re.search(r'#([^\n]+)', message_text)
-        if not category_match:
-            return
-        
-        category_text = category_match.group(1).strip()
-        
-        # Verificar si es una categoría válida
-        valid_category = None
-        for cat in CATEGORIES.keys():
-            if category_text.lower() in cat.lower():
-                valid_category = cat
-                break
-        
-        if not valid_category:
+        if parsed.error == "unknown_category":
             await update.message.reply_text(
-                f"❌ Categoría no reconocida: {category_text}\n"
+                f"❌ Categoría no reconocida: {parsed.category_text}\n"
                 f"Por favor, usa una de las categorías disponibles."
             )
             return
         
-        # Extraer nombre del canal, nombre de usuario e ID
-        # Mejorado para evitar errores de regex
-        lines = message_text.split('\n')
-        channel_name = None
-        channel_username = None
-        channel_id = None
-        
-        for i, line in enumerate(lines):
-            if '#' in line and i < len(lines) - 1:
-                # La línea después de una línea con # podría ser el nombre del canal
-                channel_name = lines[i + 1].strip()
-            
-            if '@' in line and 'admin' not in line.lower():
-                # Línea con @ pero sin "admin" podría ser el username
-                username_match = re.search(r'@(\w+)', line)
-                if username_match:
-                    channel_username = username_match.group(1)
-            
-            if 'ID' in line or 'id' in line:
-                # Línea con ID podría contener el ID del canal
-                id_match = re.search(r'[-]?\d+', line)
-                if id_match:
-                    channel_id = id_match.group(0)
+        if parsed.error == "ambiguous_category":
+            await update.message.reply_text(
+                f"❌ La categoría \"{parsed.category_text}\" puede ser: {', '.join(parsed.candidates)}\n"
+                f"Por favor, escribe el nombre completo."
+            )
+            return
         
-        if not (channel_name and channel_username and channel_id):
+        if parsed.error == "missing_fields":
             await update.message.reply_html(
                 "❌ <b>Formato incorrecto</b>. Por favor, usa el siguiente formato:\n\n"
                 "#Categoría\n"
@@ -494,6 +582,11 @@ async def process_channel_submission(update: Update, context: ContextTypes.DEFAU
             )
             return
         
+        valid_category = parsed.category
+        channel_name = parsed.channel_name
+        channel_username = parsed.channel_username
+        channel_id = parsed.channel_id
+        
         # Almacenar solicitud para aprobación del administrador
         submission_id = f"{user.id}_{update.message.message_id}"
         submission_data = {
@@ -507,9 +600,8 @@ async def process_channel_submission(update: Update, context: ContextTypes.DEFAU
             "chat_id": update.effective_chat.id
         }
         
-        # Guardar en memoria y en la base de datos
-        pending_submissions[submission_id] = submission_data
-        db.save_pending_submission(submission_id, submission_data)
+        # Guardar en la base de datos
+        await db.save_pending_submission(submission_id, submission_data)
         
         # Crear botones de aprobación para el administrador
         keyboard = [
@@ -559,7 +651,7 @@ async def process_channel_submission(update: Update, context: ContextTypes.DEFAU
         )
         
         # Actualizar estadísticas
-        db.update_user_stats(user.id, update.effective_chat.id, "messages")
+        stats_buffer.add(user.id, update.effective_chat.id, "messages")
         
     except Exception as e:
         logger.error(f"Error processing channel submission: {e}")
@@ -567,38 +659,26 @@ async def process_channel_submission(update: Update, context: ContextTypes.DEFAU
             "❌ Ocurrió un error al procesar tu solicitud. Por favor, verifica el formato e intenta nuevamente."
         )
 
+@callback_router.exact("user_channels")
 async def handle_channel_list(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Maneja la visualización de la lista de canales del usuario."""
     query = update.callback_query
     user_id = query.from_user.id
     
-    # Obtener los canales añadidos por este usuario
-    user_channels = db.get_approved_channels(user_id=user_id)
-    
-    # Contar canales y grupos
-    channel_count = 0
-    group_count = 0
-    total_channel_subs = 0
-    total_group_subs = 0
-    
-    for channel in user_channels:
-        # Determinamos si es un canal o un grupo basado en el ID
-        # Los IDs de canales suelen empezar con '-100'
-        if str(channel["channel_id"]).startswith("-100"):
-            channel_count += 1
-            total_channel_subs += channel.get("subscribers", 0)
-        else:
-            group_count += 1
-            total_group_subs += channel.get("subscribers", 0)
+    # Obtener los canales añadidos por este usuario y sus totales
+    user_channels, totals = await asyncio.gather(
+        db.get_approved_channels(user_id=user_id),
+        db.count_channels_by_type(user_id)
+    )
     
     # Construir el mensaje
     message = (
         "📣 Canales y Grupos 👥\n\n"
         "☁️ Gestiona los canales o grupos que has añadido a las Categorías\n\n"
-        f"📣 Canales: {channel_count}\n"
-        f"    ┗👤{total_channel_subs}\n"
-        f"👥 Grupos: {group_count}\n"
-        f"    ┗👤{total_group_subs}\n\n"
+        f"📣 Canales: {totals['canales']}\n"
+        f"    ┗👤{totals['subs_canales']}\n"
+        f"👥 Grupos: {totals['grupos']}\n"
+        f"    ┗👤{totals['subs_grupos']}\n\n"
     )
     
     # Añadir la lista de canales
@@ -637,6 +717,7 @@ async def handle_channel_list(update: Update, context: ContextTypes.DEFAULT_TYPE
     else:
         await update.message.reply_text(message, reply_markup=reply_markup)
 
+@callback_router.prefix("edit_channel_")
 async def edit_channel_info(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Muestra opciones para editar la información de un canal."""
     query = update.callback_query
@@ -646,13 +727,7 @@ async def edit_channel_info(update: Update, context: ContextTypes.DEFAULT_TYPE)
     channel_id = query.data.split("_")[2]
     
     # Buscar información del canal
-    channels = db.get_approved_channels()
-    target_channel = None
-    
-    for channel in channels:
-        if channel["channel_id"] == channel_id:
-            target_channel = channel
-            break
+    target_channel = await db.get_approved_channel(channel_id)
     
     if not target_channel:
         await query.answer("No se encontró información del canal.")
@@ -691,8 +766,8 @@ async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     chat_id = update.effective_chat.id
     
     # Obtener estadísticas
-    user_stats = db.get_user_stats(user_id, chat_id)
-    warnings = db.get_warnings(user_id, chat_id)
+    user_stats = await db.get_user_stats(user_id, chat_id)
+    warnings = await db.get_warnings(user_id, chat_id)
     
     # Crear mensaje de estadísticas
     stats_message = (
@@ -719,8 +794,9 @@ async def stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     )
     
     # Actualizar estadísticas
-    db.update_user_stats(user_id, chat_id, "commands")
+    stats_buffer.add(user_id, chat_id, "commands")
 
+@callback_router.prefix("change_name_")
 async def handle_change_name(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Inicia el proceso para cambiar el nombre de un canal."""
     query = update.callback_query
@@ -736,13 +812,7 @@ async def handle_change_name(update: Update, context: ContextTypes.DEFAULT_TYPE)
     }
     
     # Buscar información del canal
-    channels = db.get_approved_channels()
-    target_channel = None
-    
-    for channel in channels:
-        if channel["channel_id"] == channel_id:
-            target_channel = channel
-            break
+    target_channel = await db.get_approved_channel(channel_id)
     
     if not target_channel:
         await query.answer("No se encontró información del canal.")
@@ -758,6 +828,7 @@ async def handle_change_name(update: Update, context: ContextTypes.DEFAULT_TYPE)
     await query.edit_message_text(message, reply_markup=reply_markup)
     await query.answer()
 
+@callback_router.prefix("change_link_")
 async def handle_change_link(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Inicia el proceso para cambiar el enlace de un canal."""
     query = update.callback_query
@@ -773,13 +844,7 @@ async def handle_change_link(update: Update, context: ContextTypes.DEFAULT_TYPE)
     }
     
     # Buscar información del canal
-    channels = db.get_approved_channels()
-    target_channel = None
-    
-    for channel in channels:
-        if channel["channel_id"] == channel_id:
-            target_channel = channel
-            break
+    target_channel = await db.get_approved_channel(channel_id)
     
     if not target_channel:
         await query.answer("No se encontró información del canal.")
@@ -809,13 +874,7 @@ async def handle_edit_input(update: Update, context: ContextTypes.DEFAULT_TYPE)
     new_value = update.message.text
     
     # Buscar información del canal
-    channels = db.get_approved_channels()
-    target_channel = None
-    
-    for channel in channels:
-        if channel["channel_id"] == channel_id:
-            target_channel = channel
-            break
+    target_channel = await db.get_approved_channel(channel_id)
     
     if not target_channel:
         await update.message.reply_text("Canal no encontrado o eliminado.")
@@ -825,7 +884,7 @@ async def handle_edit_input(update: Update, context: ContextTypes.DEFAULT_TYPE)
     # Actualizar el valor según la acción
     if action == "change_name":
         # Actualizar nombre del canal
-        if db.update_channel_info(channel_id, "channel_name", new_value):
+        if await db.update_channel_info(channel_id, "channel_name", new_value):
             await update.message.reply_text(f"✅ Nombre del canal actualizado a: {new_value}")
             
             # Actualizar la categoría correspondiente
@@ -844,7 +903,7 @@ async def handle_edit_input(update: Update, context: ContextTypes.DEFAULT_TYPE)
             username = new_value.replace("@", "")
         
         # Actualizar username del canal
-        if db.update_channel_info(channel_id, "channel_username", username):
+        if await db.update_channel_info(channel_id, "channel_username", username):
             await update.message.reply_text(f"✅ Enlace del canal actualizado a: https://t.me/{username}")
             
             # Actualizar la categoría correspondiente
@@ -859,39 +918,103 @@ async def handle_edit_input(update: Update, context: ContextTypes.DEFAULT_TYPE)
     # Mostrar menú de canales actualizado
     await handle_channel_list(update, context)
 
+def render_category_shards(category, channels):
+    """Reparte la lista de canales de una categoría en textos que caben en un mensaje.
+    
+    El reparto es determinista: los canales se colocan en orden y se pasa a la
+    siguiente parte solo cuando la actual superaría CATEGORY_MESSAGE_LIMIT.
+    """
+    shards = []
+    current = f"{category}\n\n"  # Doble salto después del título
+    has_entries = False
+    
+    for channel in channels:
+        entry = f"[{channel['channel_name']}](https://t.me/{channel['channel_username']})"
+        if has_entries and len(current) + len(entry) > CATEGORY_MESSAGE_LIMIT:
+            shards.append(current.rstrip('\n'))
+            current = f"{category} ({len(shards) + 1})\n\n"
+            has_entries = False
+        
+        current += f"{entry}\n\n"  # Doble salto después de cada canal
+        has_entries = True
+    
+    # Eliminar el último salto de línea extra si hay canales
+    shards.append(current.rstrip('\n') if has_entries else current)
+    return shards
+
 async def update_category_message(context, category):
-    """Actualiza el mensaje de una categoría con la lista de canales actualizada."""
+    """Marca una categoría como modificada y programa una única edición agrupada.
+    
+    Todos los cambios que lleguen dentro de CATEGORY_UPDATE_DELAY segundos se
+    publican juntos, editando solo las partes del post que hayan cambiado.
+    """
+    if category in dirty_categories:
+        return True
+    
+    dirty_categories.add(category)
+    context.job_queue.run_once(
+        publish_category_message,
+        CATEGORY_UPDATE_DELAY,
+        data={"category": category},
+        name=f"category_update_{category}"
+    )
+    return True
+
+async def publish_category_message(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Publica el contenido actual de una categoría si ha cambiado."""
+    category = context.job.data["category"]
+    
+    # Los cambios que lleguen a partir de aquí programan una nueva edición
+    dirty_categories.discard(category)
+    
     try:
-        # Obtener la URL del post para la categoría
+        # El primer mensaje es el del post de la categoría; los demás se crean al crecer
         post_url = CATEGORIES[category]
-        post_message_id = int(post_url.split("/")[-1])
+        message_ids = [int(post_url.split("/")[-1])] + category_shards.get(category, [])
         
-        # Obtener todos los canales de la categoría
-        channels = db.get_approved_channels(category=category)
+        channels = await db.get_approved_channels(category=category)
+        shards = render_category_shards(category, channels)
         
-        # Construir el mensaje con doble espacio entre canales
-        new_text = f"{category}\n\n"  # Doble salto después del título
-        
-        # Añadir cada canal con formato y doble espacio
-        for channel in channels:
-            new_text += f"[{channel['channel_name']}](https://t.me/{channel['channel_username']})\n\n"  # Doble salto después de cada canal
+        # Crear los mensajes que falten para las partes nuevas
+        if len(shards) > len(message_ids):
+            for index in range(len(message_ids), len(shards)):
+                sent_message = await context.bot.send_message(
+                    chat_id=CATEGORY_CHANNEL_ID,
+                    text=shards[index],
+                    parse_mode=ParseMode.MARKDOWN,
+                    disable_web_page_preview=True
+                )
+                message_ids.append(sent_message.message_id)
+                category_hashes[(category, index)] = hashlib.sha256(shards[index].encode("utf-8")).hexdigest()
+            
+            category_shards[category] = message_ids[1:]
+            await db.save_config("category_shards", category_shards)
         
-        # Eliminar el último salto de línea extra si hay canales
-        if channels:
-            new_text = new_text.rstrip('\n')
+        # Las partes sobrantes se quedan solo con el título para poder reutilizarlas
+        for index in range(len(shards), len(message_ids)):
+            shards.append(f"{category} ({index + 1})")
         
-        # Actualizar el mensaje en el canal
-        await context.bot.edit_message_text(
-            chat_id=CATEGORY_CHANNEL_ID,
-            message_id=post_message_id,
-            text=new_text,
-            parse_mode=ParseMode.MARKDOWN,
-            disable_web_page_preview=True
-        )
-        return True
+        for index, text in enumerate(shards):
+            # No editar las partes cuyo contenido no ha cambiado
+            content_hash = hashlib.sha256(text.encode("utf-8")).hexdigest()
+            if category_hashes.get((category, index)) == content_hash:
+                continue
+            
+            try:
+                await context.bot.edit_message_text(
+                    chat_id=CATEGORY_CHANNEL_ID,
+                    message_id=message_ids[index],
+                    text=text,
+                    parse_mode=ParseMode.MARKDOWN,
+                    disable_web_page_preview=True
+                )
+            except BadRequest as e:
+                if "message is not modified" not in str(e).lower():
+                    raise
+            
+            category_hashes[(category, index)] = content_hash
     except Exception as e:
         logger.error(f"Error updating category message: {e}")
-        return False
 
 async def ban_user(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Banea a un usuario."""
@@ -979,7 +1102,7 @@ async def ban_user(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         await update.message.reply_text(f"Error al banear al usuario: {e}")
     
     # Actualizar estadísticas
-    db.update_user_stats(user_id, chat_id, "commands")
+    stats_buffer.add(user_id, chat_id, "commands")
 
 async def unban_user(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Desbanea a un usuario."""
@@ -1018,7 +1141,7 @@ async def unban_user(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
         await update.message.reply_text(f"Error al desbanear al usuario: {e}")
     
     # Actualizar estadísticas
-    db.update_user_stats(user_id, chat_id, "commands")
+    stats_buffer.add(user_id, chat_id, "commands")
 
 async def announce(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Envía un anuncio al grupo."""
@@ -1071,6 +1194,7 @@ async def announce(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         await update.message.reply_text(f"Error al enviar el anuncio: {e}")
 
 
+@callback_router.prefix("delete_channel_")
 async def handle_delete_channel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Maneja la eliminación de un canal."""
     query = update.callback_query
@@ -1080,13 +1204,7 @@ async def handle_delete_channel(update: Update, context: ContextTypes.DEFAULT_TY
     channel_id = query.data.split("_")[2]
     
     # Buscar información del canal
-    channels = db.get_approved_channels()
-    target_channel = None
-    
-    for channel in channels:
-        if channel["channel_id"] == channel_id:
-            target_channel = channel
-            break
+    target_channel = await db.get_approved_channel(channel_id)
     
     if not target_channel:
         await query.answer("No se encontró información del canal.")
@@ -1099,7 +1217,7 @@ async def handle_delete_channel(update: Update, context: ContextTypes.DEFAULT_TY
         return
     
     # Eliminar el canal
-    if db.delete_approved_channel(channel_id):
+    if await db.delete_approved_channel(channel_id):
         # Actualizar la categoría correspondiente
         category = target_channel["category"]
         await update_category_message(context, category)
@@ -1112,872 +1230,809 @@ async def handle_delete_channel(update: Update, context: ContextTypes.DEFAULT_TY
         await query.answer("Error al eliminar el canal.")
 
 
-async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Maneja callbacks de botones en un bot de Telegram."""
+# ----- CALLBACKS DE BOTONES -----
+@callback_router.prefix("cancel_edit_")
+async def cancel_channel_edit(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Cancela la edición de un canal y vuelve al menú de canales."""
     query = update.callback_query
     user_id = query.from_user.id
-    callback_data = query.data
-
-    # Declarar el uso de variables globales
-    global post_creation_state, user_editing_state, admin_rejecting, pending_submissions
-    
-    # Manejar canales y grupos del usuario
-    if callback_data == "user_channels":
-        await handle_channel_list(update, context)
-        return
     
-    # Manejar edición de canales
-    if callback_data.startswith("edit_channel_"):
-        await edit_channel_info(update, context)
-        return
-    
-    if callback_data.startswith("change_name_"):
-        await handle_change_name(update, context)
-        return
+    if user_id in user_editing_state:
+        del user_editing_state[user_id]
+    await handle_channel_list(update, context)
+
+@callback_router.prefix("approve_")
+async def approve_submission(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Aprueba una solicitud de canal y lo añade a su categoría."""
+    query = update.callback_query
+    user_id = query.from_user.id
     
-    if callback_data.startswith("change_link_"):
-        await handle_change_link(update, context)
+    if user_id != ADMIN_ID:
+        await query.edit_message_text("Solo el administrador principal puede aprobar o rechazar solicitudes.")
         return
     
-    if callback_data.startswith("cancel_edit_"):
-        # Cancelar edición y volver al menú de canales
-        if user_id in user_editing_state:
-            del user_editing_state[user_id]
-        await handle_channel_list(update, context)
-        return
+    submission_id = context.args[0]
     
-    if callback_data.startswith("delete_channel_"):
-        await handle_delete_channel(update, context)
+    # Retirar la solicitud de forma atómica para que nadie más la procese
+    submission = await db.take_pending_submission(submission_id)
+    if submission is None:
+        await query.edit_message_text("Esta solicitud ya no está disponible o ha sido procesada.")
         return
     
-    # Manejar aprobación/rechazo de solicitudes de canales
-    if callback_data.startswith("approve_") or callback_data.startswith("reject_"):
-        if user_id != ADMIN_ID:
-            await query.edit_message_text("Solo el administrador principal puede aprobar o rechazar solicitudes.")
-            return
-        
-        submission_id = callback_data.split("_", 1)[1]
-        
-        if submission_id not in pending_submissions:
-            await query.edit_message_text("Esta solicitud ya no está disponible o ha sido procesada.")
-            return
+    try:
+        # Obtener la URL del post para la categoría
+        post_url = CATEGORIES[submission["category"]]
         
-        submission = pending_submissions[submission_id]
+        # Guardar el canal en la base de datos
+        success, total_channels = await db.save_approved_channel(
+            submission["channel_id"],
+            submission["channel_name"],
+            submission["channel_username"],
+            submission["category"],
+            submission["user_id"]
+        )
         
-        if callback_data.startswith("approve_"):
-            try:
-                # Obtener la URL del post para la categoría
-                post_url = CATEGORIES[submission["category"]]
-                post_message_id = int(post_url.split("/")[-1])
-                
-                # Guardar el canal en la base de datos
-                success, total_channels = db.save_approved_channel(
-                    submission["channel_id"],
-                    submission["channel_name"],
-                    submission["channel_username"],
-                    submission["category"],
-                    submission["user_id"]
-                )
-                
-                if success:
-                    # Obtener todos los canales de la categoría
-                    channels = db.get_approved_channels(category=submission["category"])
-                    
-                    # Construir el mensaje con doble espacio entre canales
-                    new_text = f"{submission['category']}\n\n"  # Doble salto después del título
-                    
-                    # Añadir cada canal con formato y doble espacio
-                    for channel in channels:
-                        new_text += f"[{channel['channel_name']}](https://t.me/{channel['channel_username']})\n\n"  # Doble salto después de cada canal
-                    
-                    # Eliminar el último salto de línea extra si hay canales
-                    if channels:
-                        new_text = new_text.rstrip('\n')
-                    
-                    try:
-                        # Actualizar el mensaje en el canal
-                        await context.bot.edit_message_text(
-                            chat_id=CATEGORY_CHANNEL_ID,
-                            message_id=post_message_id,
-                            text=new_text,
-                            parse_mode=ParseMode.MARKDOWN,
-                            disable_web_page_preview=True
-                        )
-                        
-                        # Notificar al administrador
-                        await query.edit_message_text(
-                            f"✅ Canal aprobado y añadido a la categoría {submission['category']}.\n"
-                            f"Total de canales en la categoría: {len(channels)}"
-                        )
-                        
-                        # Notificar al usuario
-                        user_keyboard = [
-                            [
-                                InlineKeyboardButton("🔍 Ver Categoría", url=post_url),
-                                InlineKeyboardButton("📢 Compartir Canal", 
-                                    url=f"https://t.me/share/url?url=https://t.me/{submission['channel_username']}")
-                            ]
-                        ]
-                        user_reply_markup = InlineKeyboardMarkup(user_keyboard)
-                        
-                        await context.bot.send_message(
-                            chat_id=submission["chat_id"],
-                            text=f"✅ Tu canal <b>{html.escape(submission['channel_name'])}</b> ha sido aprobado y añadido a la categoría <b>{submission['category']}</b>.",
-                            parse_mode=ParseMode.HTML,
-                            reply_to_message_id=submission["message_id"],
-                            reply_markup=user_reply_markup
-                        )
-                        
-                    except Exception as e:
-                        logger.error(f"Error updating message: {e}")
-                        await query.edit_message_text(
-                            f"❌ Error al actualizar el mensaje: {str(e)}\n"
-                            f"Por favor, verifica manualmente el mensaje en la categoría {submission['category']}"
-                        )
-                else:
-                    await query.edit_message_text(
-                        f"❌ Error al guardar el canal en la base de datos."
-                    )
-                
-                # Eliminar la solicitud de la base de datos
-                db.delete_pending_submission(submission_id)
-                
-            except Exception as e:
-                logger.error(f"Error in approval process: {e}")
-                await query.edit_message_text(
-                    f"❌ Error en el proceso de aprobación: {str(e)}"
-                )
-            
-            # Eliminar de solicitudes pendientes
-            if submission_id in pending_submissions:
-                del pending_submissions[submission_id]
-            return
-            
-        elif callback_data.startswith("reject_"):
-            # Iniciar proceso de rechazo
-            admin_rejecting[user_id] = submission_id
-            
-            # Crear teclado con razones comunes de rechazo
-            keyboard = [
-                [InlineKeyboardButton("Canal duplicado", callback_data=f"reject_reason_{submission_id}_duplicado")],
-                [InlineKeyboardButton("Contenido inapropiado", callback_data=f"reject_reason_{submission_id}_inapropiado")],
-                [InlineKeyboardButton("Información incorrecta", callback_data=f"reject_reason_{submission_id}_incorrecto")],
-                [InlineKeyboardButton("Categoría equivocada", callback_data=f"reject_reason_{submission_id}_categoria")],
-                [InlineKeyboardButton("Otro motivo (escribir)", callback_data=f"reject_custom_{submission_id}")]
-            ]
-            
-            reply_markup = InlineKeyboardMarkup(keyboard)
+        if success:
+            # Programar la actualización del mensaje de la categoría
+            await update_category_message(context, submission["category"])
             
+            # Notificar al administrador
             await query.edit_message_text(
-                f"Selecciona el motivo del rechazo para el canal {submission['channel_name']}:",
-                reply_markup=reply_markup
+                f"✅ Canal aprobado y añadido a la categoría {submission['category']}.\n"
+                f"Total de canales en la categoría: {total_channels}"
             )
-            return
-
-    elif callback_data.startswith("reject_reason_"):
-        parts = callback_data.split("_")
-        submission_id = parts[2]
-        reason_code = parts[3]
-        
-        if submission_id not in pending_submissions:
-            await query.edit_message_text("Esta solicitud ya no está disponible.")
-            return
-        
-        submission = pending_submissions[submission_id]
-        
-        # Mapear códigos de razón a mensajes
-        reason_messages = {
-            "duplicado": "El canal ya existe en nuestras categorías.",
-            "inapropiado": "El contenido del canal no cumple con nuestras normas.",
-            "incorrecto": "La información proporcionada es incorrecta o incompleta.",
-            "categoria": "La categoría seleccionada no es adecuada para este canal."
-        }
-        
-        reason = reason_messages.get(reason_code, "No cumple con los requisitos.")
-        
-        try:
-            # Notificar al usuario sobre el rechazo
+            
+            # Notificar al usuario
             user_keyboard = [
                 [
-                    InlineKeyboardButton("🔄 Enviar Nueva Solicitud", callback_data="add_channel_help"),
-                    InlineKeyboardButton("❓ Ayuda", callback_data="help_channels")
+                    InlineKeyboardButton("🔍 Ver Categoría", url=post_url),
+                    InlineKeyboardButton("📢 Compartir Canal", 
+                        url=f"https://t.me/share/url?url=https://t.me/{submission['channel_username']}")
                 ]
             ]
             user_reply_markup = InlineKeyboardMarkup(user_keyboard)
             
             await context.bot.send_message(
                 chat_id=submission["chat_id"],
-                text=f"❌ Tu solicitud para añadir el canal <b>{html.escape(submission['channel_name'])}</b> "
-                     f"a la categoría <b>{submission['category']}</b> ha sido rechazada.\n\n"
-                     f"<b>Motivo:</b> {html.escape(reason)}",
+                text=f"✅ Tu canal <b>{html.escape(submission['channel_name'])}</b> ha sido aprobado y añadido a la categoría <b>{submission['category']}</b>.",
                 parse_mode=ParseMode.HTML,
                 reply_to_message_id=submission["message_id"],
                 reply_markup=user_reply_markup
             )
-            
-            # Confirmar al administrador
-            await query.edit_message_text(
-                f"✅ Rechazo enviado al usuario para el canal {submission['channel_name']}.\n"
-                f"Motivo: {reason}"
-            )
-            
-            # Eliminar la solicitud de la base de datos
-            db.delete_pending_submission(submission_id)
-            
-            # Eliminar de solicitudes pendientes
-            if submission_id in pending_submissions:
-                del pending_submissions[submission_id]
-            
-        except Exception as e:
-            logger.error(f"Error sending rejection: {e}")
+        else:
             await query.edit_message_text(
-                f"❌ Error al enviar el rechazo: {str(e)}"
+                f"❌ Error al guardar el canal en la base de datos."
             )
         
-        return
-
-    elif callback_data.startswith("reject_custom_"):
-        submission_id = callback_data.split("_")[2]
-        
-        if submission_id not in pending_submissions:
-            await query.edit_message_text("Esta solicitud ya no está disponible.")
-            return
-        
-        admin_rejecting[user_id] = submission_id
-        
+    except Exception as e:
+        logger.error(f"Error in approval process: {e}")
         await query.edit_message_text(
-            f"Por favor, envía el motivo personalizado del rechazo para el canal {pending_submissions[submission_id]['channel_name']}."
+            f"❌ Error en el proceso de aprobación: {str(e)}"
         )
-        
+
+@callback_router.prefix("reject_")
+async def start_rejection(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Inicia el rechazo de una solicitud pidiendo el motivo."""
+    query = update.callback_query
+    user_id = query.from_user.id
+    
+    if user_id != ADMIN_ID:
+        await query.edit_message_text("Solo el administrador principal puede aprobar o rechazar solicitudes.")
         return
     
-    # Manejar cancelación de solicitud
-    if callback_data.startswith("cancel_"):
-        submission_id = callback_data.split("_")[1]
-        
-        if submission_id not in pending_submissions:
-            await query.edit_message_text("Esta solicitud ya no está disponible o ha sido procesada.")
-            return
-        
-        submission = pending_submissions[submission_id]
-        
-        # Verificar que el usuario es el propietario de la solicitud
-        if user_id != submission["user_id"]:
-            await query.answer("Solo el usuario que envió la solicitud puede cancelarla.", show_alert=True)
-            return
-        
-        # Eliminar la solicitud
-        if submission_id in pending_submissions:
-            del pending_submissions[submission_id]
-        db.delete_pending_submission(submission_id)
-        
-        # Notificar al usuario
-        await query.edit_message_text(
-            "✅ Tu solicitud ha sido cancelada. Puedes enviar una nueva cuando lo desees."
-        )
-        
-        # Notificar al administrador si es necesario
-        try:
-            await context.bot.send_message(
-                chat_id=ADMIN_ID,
-                text=f"ℹ️ El usuario {submission['user_name']} ha cancelado su solicitud para el canal {submission['channel_name']}."
-            )
-        except:
-            pass
-        
+    submission_id = context.args[0]
+    
+    submission = await db.get_pending_submission(submission_id)
+    if submission is None:
+        await query.edit_message_text("Esta solicitud ya no está disponible o ha sido procesada.")
         return
     
-    # Manejar verificación de estado de solicitud
-    if callback_data.startswith("check_status_"):
-        submission_id = callback_data.split("_")[2]
-        
-        if submission_id not in pending_submissions:
-            await query.edit_message_text(
-                "Esta solicitud ya no está disponible o ha sido procesada. Si fue aprobada, deberías haber recibido una notificación."
-            )
-            return
-        
-        submission = pending_submissions[submission_id]
-        
-        # Verificar que el usuario es el propietario de la solicitud
-        if user_id != submission["user_id"]:
-            await query.answer("Solo el usuario que envió la solicitud puede verificar su estado.", show_alert=True)
-            return
-        
-        # Mostrar estado actual
-        await query.edit_message_text(
-            f"ℹ️ Tu solicitud para añadir el canal <b>{html.escape(submission['channel_name'])}</b> "
-            f"a la categoría <b>{submission['category']}</b> está pendiente de aprobación por el administrador.",
-            parse_mode=ParseMode.HTML,
-            reply_markup=InlineKeyboardMarkup([
-                [InlineKeyboardButton("❌ Cancelar Solicitud", callback_data=f"cancel_{submission_id}")]
-            ])
-        )
-        
+    # Iniciar proceso de rechazo
+    admin_rejecting[user_id] = submission_id
+    
+    # Crear teclado con razones comunes de rechazo
+    keyboard = [
+        [InlineKeyboardButton("Canal duplicado", callback_data=f"reject_reason_{submission_id}_duplicado")],
+        [InlineKeyboardButton("Contenido inapropiado", callback_data=f"reject_reason_{submission_id}_inapropiado")],
+        [InlineKeyboardButton("Información incorrecta", callback_data=f"reject_reason_{submission_id}_incorrecto")],
+        [InlineKeyboardButton("Categoría equivocada", callback_data=f"reject_reason_{submission_id}_categoria")],
+        [InlineKeyboardButton("Otro motivo (escribir)", callback_data=f"reject_custom_{submission_id}")]
+    ]
+    
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    
+    await query.edit_message_text(
+        f"Selecciona el motivo del rechazo para el canal {submission['channel_name']}:",
+        reply_markup=reply_markup
+    )
+
+@callback_router.prefix("reject_reason_")
+async def reject_with_reason(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Rechaza una solicitud con uno de los motivos predefinidos."""
+    query = update.callback_query
+    user_id = query.from_user.id
+    
+    if user_id != ADMIN_ID:
+        await query.edit_message_text("Solo el administrador principal puede aprobar o rechazar solicitudes.")
         return
     
-    # Sistema de post automáticos
-    if callback_data == "admin_auto_post":
-        if user_id != ADMIN_ID:
-            await query.answer("Solo el administrador principal puede acceder a esta función.", show_alert=True)
-            return
-        
-        # Inicializar estado si no existe
-        if user_id not in post_creation_state:
-            init_post_state(user_id)
-        
-        # Mostrar menú de creación de post
-        await show_post_creation_menu(query, user_id)
+    # El ID de la solicitud también contiene "_", el motivo va al final
+    submission_id, reason_code = context.args[0].rsplit("_", 1)
+    
+    # Retirar la solicitud de forma atómica para que nadie más la procese
+    submission = await db.take_pending_submission(submission_id)
+    if submission is None:
+        await query.edit_message_text("Esta solicitud ya no está disponible.")
         return
-
-    # Manejar acciones de creación de post
-    elif callback_data == "post_add_text":
-        if user_id != ADMIN_ID:
-            await query.answer("Solo el administrador puede crear posts.", show_alert=True)
-            return
-        
-        state = post_creation_state[user_id]
-        state["current_step"] = "waiting_for_text"
+    
+    # Mapear códigos de razón a mensajes
+    reason_messages = {
+        "duplicado": "El canal ya existe en nuestras categorías.",
+        "inapropiado": "El contenido del canal no cumple con nuestras normas.",
+        "incorrecto": "La información proporcionada es incorrecta o incompleta.",
+        "categoria": "La categoría seleccionada no es adecuada para este canal."
+    }
+    
+    reason = reason_messages.get(reason_code, "No cumple con los requisitos.")
+    
+    try:
+        # Notificar al usuario sobre el rechazo
+        user_keyboard = [
+            [
+                InlineKeyboardButton("🔄 Enviar Nueva Solicitud", callback_data="add_channel_help"),
+                InlineKeyboardButton("❓ Ayuda", callback_data="help_channels")
+            ]
+        ]
+        user_reply_markup = InlineKeyboardMarkup(user_keyboard)
         
-        await query.edit_message_text(
-            "📝 Por favor, envía el texto para el post.\n\n"
-            "Puedes usar formato HTML básico:\n"
-            "<b>negrita</b>, <i>cursiva</i>, <code>código</code>, <u>subrayado</u>\n"
-            "<a href='URL'>texto con enlace</a>",
+        await context.bot.send_message(
+            chat_id=submission["chat_id"],
+            text=f"❌ Tu solicitud para añadir el canal <b>{html.escape(submission['channel_name'])}</b> "
+                 f"a la categoría <b>{submission['category']}</b> ha sido rechazada.\n\n"
+                 f"<b>Motivo:</b> {html.escape(reason)}",
             parse_mode=ParseMode.HTML,
-            reply_markup=InlineKeyboardMarkup([[
-                InlineKeyboardButton("❌ Cancelar", callback_data="post_cancel_input")
-            ]])
+            reply_to_message_id=submission["message_id"],
+            reply_markup=user_reply_markup
         )
-        return
-
-    elif callback_data == "post_add_buttons":
-        if user_id != ADMIN_ID:
-            await query.answer("Solo el administrador puede configurar botones.", show_alert=True)
-            return
         
-        await show_button_menu(update, context)
-        return
-
-    elif callback_data.startswith("post_btn_"):
-        if user_id != ADMIN_ID:
-            await query.answer("Solo el administrador puede configurar botones.", show_alert=True)
-            return
+        # Confirmar al administrador
+        await query.edit_message_text(
+            f"✅ Rechazo enviado al usuario para el canal {submission['channel_name']}.\n"
+            f"Motivo: {reason}"
+        )
         
-        await handle_button_actions(update, context)
-        return
+    except Exception as e:
+        logger.error(f"Error sending rejection: {e}")
+        # Devolver la solicitud para poder reintentar el rechazo
+        await db.save_pending_submission(submission_id, submission)
+        await query.edit_message_text(
+            f"❌ Error al enviar el rechazo: {str(e)}"
+        )
 
-    elif callback_data == "post_schedule":
-        if user_id != ADMIN_ID:
-            await query.answer("Solo el administrador puede configurar el horario.", show_alert=True)
-            return
-        
-        await configure_post_schedule(update, context)
+@callback_router.prefix("reject_custom_")
+async def request_custom_rejection(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Pide al administrador un motivo de rechazo personalizado."""
+    query = update.callback_query
+    user_id = query.from_user.id
+    
+    if user_id != ADMIN_ID:
+        await query.edit_message_text("Solo el administrador principal puede aprobar o rechazar solicitudes.")
         return
-
-    elif callback_data.startswith("post_sched_"):
-        if user_id != ADMIN_ID:
-            await query.answer("Solo el administrador puede configurar el horario.", show_alert=True)
-            return
-        
-        await handle_schedule_setting(update, context)
+    
+    submission_id = context.args[0]
+    
+    submission = await db.get_pending_submission(submission_id)
+    if submission is None:
+        await query.edit_message_text("Esta solicitud ya no está disponible.")
         return
+    
+    admin_rejecting[user_id] = submission_id
+    
+    await query.edit_message_text(
+        f"Por favor, envía el motivo personalizado del rechazo para el canal {submission['channel_name']}."
+    )
 
-    elif callback_data == "post_save":
-        if user_id != ADMIN_ID:
-            await query.answer("Solo el administrador puede guardar posts.", show_alert=True)
-            return
-        
-        await save_auto_post(update, context)
+@callback_router.prefix("cancel_")
+async def cancel_submission(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Cancela una solicitud a petición de quien la envió."""
+    query = update.callback_query
+    user_id = query.from_user.id
+    
+    submission_id = context.args[0]
+    
+    submission = await db.get_pending_submission(submission_id)
+    if submission is None:
+        await query.edit_message_text("Esta solicitud ya no está disponible o ha sido procesada.")
         return
-
-    elif callback_data == "post_cancel_input":
-        if user_id != ADMIN_ID or user_id not in post_creation_state:
-            await query.answer("No hay un proceso de creación activo.", show_alert=True)
-            return
-        
-        state = post_creation_state[user_id]
-        state["current_step"] = "text"
-        await show_post_creation_menu(query, user_id)
+    
+    # Verificar que el usuario es el propietario de la solicitud
+    if user_id != submission["user_id"]:
+        await query.answer("Solo el usuario que envió la solicitud puede cancelarla.", show_alert=True)
         return
+    
+    # Eliminar la solicitud (puede haberse procesado mientras tanto)
+    if await db.take_pending_submission(submission_id) is None:
+        await query.edit_message_text("Esta solicitud ya no está disponible o ha sido procesada.")
+        return
+    
+    # Notificar al usuario
+    await query.edit_message_text(
+        "✅ Tu solicitud ha sido cancelada. Puedes enviar una nueva cuando lo desees."
+    )
+    
+    # Notificar al administrador si es necesario
+    try:
+        await context.bot.send_message(
+            chat_id=ADMIN_ID,
+            text=f"ℹ️ El usuario {submission['user_name']} ha cancelado su solicitud para el canal {submission['channel_name']}."
+        )
+    except:
+        pass
 
-        
-        keyboard = [
-            [
-                InlineKeyboardButton("➕ Nuevo Post", callback_data="create_auto_post"),
-                InlineKeyboardButton("📋 Lista de Posts", callback_data="list_auto_posts")
-            ],
-            [
-                InlineKeyboardButton("📊 Estadísticas", callback_data="post_stats"),
-                InlineKeyboardButton("⚙️ Configuración", callback_data="post_config")
-            ],
-            [InlineKeyboardButton("🔙 Volver", callback_data="admin_panel")]
-        ]
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
+@callback_router.prefix("check_status_")
+async def check_submission_status(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Muestra el estado de una solicitud a quien la envió."""
+    query = update.callback_query
+    user_id = query.from_user.id
+    
+    submission_id = context.args[0]
+    
+    submission = await db.get_pending_submission(submission_id)
+    if submission is None:
         await query.edit_message_text(
-            "<b>📅 Sistema de Publicación Automática</b>\n\n"
-            "Administra los posts automáticos para tus canales. Puedes crear nuevos posts, "
-            "ver los existentes, consultar estadísticas y configurar el sistema.",
-            parse_mode=ParseMode.HTML,
-            reply_markup=reply_markup
+            "Esta solicitud ya no está disponible o ha sido procesada. Si fue aprobada, deberías haber recibido una notificación."
         )
-        
         return
     
-    # Crear nuevo post automático
-    if callback_data == "create_auto_post":
-        await create_auto_post(update, context)
+    # Verificar que el usuario es el propietario de la solicitud
+    if user_id != submission["user_id"]:
+        await query.answer("Solo el usuario que envió la solicitud puede verificar su estado.", show_alert=True)
         return
     
-    # Lista de posts automáticos
-    if callback_data == "list_auto_posts":
-        await list_auto_posts(update, context)
+    # Mostrar estado actual
+    await query.edit_message_text(
+        f"ℹ️ Tu solicitud para añadir el canal <b>{html.escape(submission['channel_name'])}</b> "
+        f"a la categoría <b>{submission['category']}</b> está pendiente de aprobación por el administrador.",
+        parse_mode=ParseMode.HTML,
+        reply_markup=InlineKeyboardMarkup([
+            [InlineKeyboardButton("❌ Cancelar Solicitud", callback_data=f"cancel_{submission_id}")]
+        ])
+    )
+
+@callback_router.exact("admin_auto_post")
+async def show_auto_post_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Muestra el menú de creación de posts automáticos."""
+    query = update.callback_query
+    user_id = query.from_user.id
+    
+    if user_id != ADMIN_ID:
+        await query.answer("Solo el administrador principal puede acceder a esta función.", show_alert=True)
         return
     
-    # Configuración de posts
-    if callback_data.startswith("post_"):
-        await handle_post_configuration(update, context)
+    # Inicializar estado si no existe
+    if user_id not in post_creation_state:
+        init_post_state(user_id)
+    
+    # Mostrar menú de creación de post
+    await show_post_creation_menu(query, user_id)
+
+@callback_router.exact("post_add_text")
+async def request_post_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Pide al administrador el texto del post."""
+    query = update.callback_query
+    user_id = query.from_user.id
+    
+    if user_id != ADMIN_ID:
+        await query.answer("Solo el administrador puede crear posts.", show_alert=True)
         return
     
-    # Manejar visualización de categorías
-    if callback_data == "show_categories":
-        categories_text = "<b>📚 Categorías disponibles:</b>\n\n"
-        
-        keyboard = []
-        for i, (category, url) in enumerate(CATEGORIES.items(), 1):
-            categories_text += f"{i}. {category}\n"
-            # Crear filas de 2 botones
-            if i % 2 == 1:
-                row = [InlineKeyboardButton(category, url=url)]
-            else:
-                row.append(InlineKeyboardButton(category, url=url))
-                keyboard.append(row)
-        
-        # Añadir la última fila si quedó incompleta
-        if len(CATEGORIES) % 2 == 1:
-            keyboard.append(row)
-        
-        # Añadir botón de volver
-        keyboard.append([InlineKeyboardButton("🔙 Volver", callback_data="back_to_main")])
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await query.edit_message_text(
-            categories_text,
-            parse_mode=ParseMode.HTML,
-            reply_markup=reply_markup
-        )
-        
+    state = post_creation_state[user_id]
+    state["current_step"] = "waiting_for_text"
+    
+    await query.edit_message_text(
+        "📝 Por favor, envía el texto para el post.\n\n"
+        "Puedes usar formato HTML básico:\n"
+        "<b>negrita</b>, <i>cursiva</i>, <code>código</code>, <u>subrayado</u>\n"
+        "<a href='URL'>texto con enlace</a>",
+        parse_mode=ParseMode.HTML,
+        reply_markup=InlineKeyboardMarkup([[
+            InlineKeyboardButton("❌ Cancelar", callback_data="post_cancel_input")
+        ]])
+    )
+
+@callback_router.exact("post_add_buttons")
+async def open_post_buttons(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Abre el menú de botones del post."""
+    query = update.callback_query
+    user_id = query.from_user.id
+    
+    if user_id != ADMIN_ID:
+        await query.answer("Solo el administrador puede configurar botones.", show_alert=True)
         return
     
-    # Manejar visualización de reglas
-    if callback_data == "show_rules":
-        rules_text = (
-            "<b>📜 Reglas del Grupo</b>\n\n"
-            "1. Sé respetuoso con todos los miembros.\n"
-            "2. No envíes spam ni contenido no relacionado.\n"
-            "3. No compartas contenido ilegal o inapropiado.\n"
-            "4. Usa los canales adecuados para cada tipo de contenido.\n"
-            "5. Sigue las instrucciones de los administradores.\n"
-            "6. Para añadir un canal, sigue el formato establecido.\n"
-            "7. No promociones otros grupos sin permiso.\n"
-            "8. Respeta los temas de cada categoría.\n\n"
-            "El incumplimiento de estas reglas puede resultar en advertencias o expulsión."
-        )
-        
-        await query.edit_message_text(
-            rules_text,
-            parse_mode=ParseMode.HTML,
-            reply_markup=InlineKeyboardMarkup([
-                [InlineKeyboardButton("🔙 Volver", callback_data="back_to_main")]
-            ])
-        )
-        
+    await show_button_menu(update, context)
+
+@callback_router.exact("post_cancel_input")
+async def cancel_post_input(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Cancela la entrada pendiente y vuelve al menú del post."""
+    query = update.callback_query
+    user_id = query.from_user.id
+    
+    if user_id != ADMIN_ID or user_id not in post_creation_state:
+        await query.answer("No hay un proceso de creación activo.", show_alert=True)
         return
+
+    state = post_creation_state[user_id]
+    state["current_step"] = "text"
+    await show_post_creation_menu(query, user_id)
+
+@callback_router.exact("show_categories")
+async def show_categories_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Muestra las categorías disponibles."""
+    query = update.callback_query
     
-    # Manejar ayuda para añadir canales
-    if callback_data == "add_channel_help":
-        help_text = (
-            "<b>📝 Cómo añadir un canal</b>\n\n"
-            "Para añadir un canal, envía un mensaje con el siguiente formato:\n\n"
-            "<code>#Categoría\nNombre del Canal\n@username_canal\nID -100xxxxxxxxxx\n@admin bot añadido</code>\n\n"
-            "<b>Ejemplo:</b>\n\n"
-            "<code>#Música 🎶\nCanal de Música Pop\n@musica_pop\nID -1001234567890\n@admin bot añadido</code>\n\n"
-            "<b>Notas:</b>\n"
-            "- Puedes añadir #Nuevo si es un canal nuevo\n"
-            "- La categoría debe ser una de las disponibles\n"
-            "- Para obtener el ID del canal, reenvía un mensaje del canal a @getidsbot"
-        )
-        
-        # Crear teclado con categorías
-        keyboard = []
-        row = []
-        for i, category in enumerate(CATEGORIES.keys()):
-            if i % 2 == 0 and i > 0:
-                keyboard.append(row)
-                row = []
-            row.append(InlineKeyboardButton(category, callback_data=f"select_category_{category}"))
-        
-        if row:
+    categories_text = "<b>📚 Categorías disponibles:</b>\n\n"
+    
+    keyboard = []
+    for i, (category, url) in enumerate(CATEGORIES.items(), 1):
+        categories_text += f"{i}. {category}\n"
+        # Crear filas de 2 botones
+        if i % 2 == 1:
+            row = [InlineKeyboardButton(category, url=url)]
+        else:
+            row.append(InlineKeyboardButton(category, url=url))
             keyboard.append(row)
-        
-        keyboard.append([InlineKeyboardButton("🔙 Volver", callback_data="back_to_main")])
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await query.edit_message_text(
-            help_text,
-            parse_mode=ParseMode.HTML,
-            reply_markup=reply_markup
-        )
-        
+    
+    # Añadir la última fila si quedó incompleta
+    if len(CATEGORIES) % 2 == 1:
+        keyboard.append(row)
+    
+    # Añadir botón de volver
+    keyboard.append([InlineKeyboardButton("🔙 Volver", callback_data="back_to_main")])
+    
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    
+    await query.edit_message_text(
+        categories_text,
+        parse_mode=ParseMode.HTML,
+        reply_markup=reply_markup
+    )
+
+@callback_router.exact("show_rules")
+async def show_rules(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Muestra las reglas del grupo."""
+    query = update.callback_query
+    
+    rules_text = (
+        "<b>📜 Reglas del Grupo</b>\n\n"
+        "1. Sé respetuoso con todos los miembros.\n"
+        "2. No envíes spam ni contenido no relacionado.\n"
+        "3. No compartas contenido ilegal o inapropiado.\n"
+        "4. Usa los canales adecuados para cada tipo de contenido.\n"
+        "5. Sigue las instrucciones de los administradores.\n"
+        "6. Para añadir un canal, sigue el formato establecido.\n"
+        "7. No promociones otros grupos sin permiso.\n"
+        "8. Respeta los temas de cada categoría.\n\n"
+        "El incumplimiento de estas reglas puede resultar en advertencias o expulsión."
+    )
+    
+    await query.edit_message_text(
+        rules_text,
+        parse_mode=ParseMode.HTML,
+        reply_markup=InlineKeyboardMarkup([
+            [InlineKeyboardButton("🔙 Volver", callback_data="back_to_main")]
+        ])
+    )
+
+@callback_router.exact("add_channel_help")
+async def show_add_channel_help(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Explica cómo añadir un canal."""
+    query = update.callback_query
+    
+    help_text = (
+        "<b>📝 Cómo añadir un canal</b>\n\n"
+        "Para añadir un canal, envía un mensaje con el siguiente formato:\n\n"
+        "<code>#Categoría\nNombre del Canal\n@username_canal\nID -100xxxxxxxxxx\n@admin bot añadido</code>\n\n"
+        "<b>Ejemplo:</b>\n\n"
+        "<code>#Música 🎶\nCanal de Música Pop\n@musica_pop\nID -1001234567890\n@admin bot añadido</code>\n\n"
+        "<b>Notas:</b>\n"
+        "- Puedes añadir #Nuevo si es un canal nuevo\n"
+        "- La categoría debe ser una de las disponibles\n"
+        "- Para obtener el ID del canal, reenvía un mensaje del canal a @getidsbot"
+    )
+    
+    # Crear teclado con categorías
+    keyboard = []
+    row = []
+    for i, category in enumerate(CATEGORIES.keys()):
+        if i % 2 == 0 and i > 0:
+            keyboard.append(row)
+            row = []
+        row.append(InlineKeyboardButton(category, callback_data=f"select_category_{category}"))
+    
+    if row:
+        keyboard.append(row)
+    
+    keyboard.append([InlineKeyboardButton("🔙 Volver", callback_data="back_to_main")])
+    
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    
+    await query.edit_message_text(
+        help_text,
+        parse_mode=ParseMode.HTML,
+        reply_markup=reply_markup
+    )
+
+@callback_router.prefix("select_category_")
+async def show_category_template(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Muestra la plantilla de solicitud para una categoría."""
+    query = update.callback_query
+    
+    category = context.args[0]
+    
+    template = (
+        f"#Nuevo\n#{category}\nNombre del Canal\n@username_canal\nID -100xxxxxxxxxx\n@admin bot añadido"
+    )
+    
+    await query.edit_message_text(
+        f"<b>📋 Plantilla para la categoría {category}</b>\n\n"
+        f"<code>{template}</code>\n\n"
+        f"Copia esta plantilla, reemplaza los datos con la información de tu canal y envíala al grupo o al bot.",
+        parse_mode=ParseMode.HTML,
+        reply_markup=InlineKeyboardMarkup([
+            [InlineKeyboardButton("📋 Copiar Plantilla", callback_data=f"copy_template_{category}")],
+            [InlineKeyboardButton("🔙 Volver a Categorías", callback_data="add_channel_help")]
+        ])
+    )
+
+@callback_router.prefix("copy_template_")
+async def send_category_template(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Envía la plantilla de una categoría en un mensaje nuevo."""
+    query = update.callback_query
+    
+    category = context.args[0]
+    
+    template = (
+        f"#Nuevo\n#{category}\nNombre del Canal\n@username_canal\nID -100xxxxxxxxxx\n@admin bot añadido"
+    )
+    
+    await query.answer("Plantilla copiada al portapapeles", show_alert=False)
+    
+    # No podemos realmente copiar al portapapeles, así que enviamos un mensaje nuevo
+    await context.bot.send_message(
+        chat_id=update.effective_chat.id,
+        text=f"<code>{template}</code>\n\n"
+             f"👆 Copia esta plantilla, reemplaza los datos con la información de tu canal y envíala.",
+        parse_mode=ParseMode.HTML
+    )
+
+@callback_router.exact("admin_panel")
+async def show_admin_panel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Muestra el panel de administrador."""
+    query = update.callback_query
+    user_id = query.from_user.id
+    
+    if user_id != ADMIN_ID:
+        await query.answer("Solo el administrador principal puede acceder a este panel.", show_alert=True)
         return
     
-    # Manejar selección de categoría
-    if callback_data.startswith("select_category_"):
-        category = callback_data[16:]
-        
-        template = (
-            f"#Nuevo\n#{category}\nNombre del Canal\n@username_canal\nID -100xxxxxxxxxx\n@admin bot añadido"
-        )
-        
+    keyboard = [
+        [
+            InlineKeyboardButton("📊 Estadísticas", callback_data="admin_stats"),
+            InlineKeyboardButton("⚙️ Configuración", callback_data="admin_config")
+        ],
+        [
+            InlineKeyboardButton("👮 Moderación", callback_data="admin_moderation"),
+            InlineKeyboardButton("📢 Anuncios", callback_data="admin_announce")
+        ],
+        [
+            InlineKeyboardButton("🔍 Ver Solicitudes", callback_data="admin_submissions"),
+            InlineKeyboardButton("📋 Ver Canales", callback_data="admin_channels")
+        ],
+        [
+            InlineKeyboardButton("📅 Post Automáticos", callback_data="admin_auto_post"),
+            InlineKeyboardButton("📊 Informes", callback_data="admin_reports")
+        ],
+        [InlineKeyboardButton("🔙 Volver", callback_data="back_to_main")]
+    ]
+    
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    
+    await query.edit_message_text(
+        "<b>⚙️ Panel de Administrador</b>\n\n"
+        "Bienvenido al panel de administración. Selecciona una opción para continuar:",
+        parse_mode=ParseMode.HTML,
+        reply_markup=reply_markup
+    )
+
+@callback_router.exact("back_to_main")
+async def back_to_main_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Vuelve al menú principal."""
+    query = update.callback_query
+    user_id = query.from_user.id
+    
+    keyboard = [
+        [InlineKeyboardButton("📚 Comandos", callback_data="show_commands")],
+        [InlineKeyboardButton("📊 Estadísticas", callback_data="show_stats")],
+        [InlineKeyboardButton("🔍 Ver Categorías", callback_data="show_categories")],
+        [InlineKeyboardButton("📣 Canales y Grupos 👥", callback_data="user_channels")],
+        [InlineKeyboardButton("➕ Añadir Canal", callback_data="add_channel_help")]
+    ]
+    
+    if user_id == ADMIN_ID:
+        keyboard.append([InlineKeyboardButton("⚙️ Panel de Administrador", callback_data="admin_panel")])
+    
+    reply_markup = InlineKeyboardMarkup(keyboard)
+    
+    await query.edit_message_text(
+        f"Hola {update.effective_user.first_name}! Soy el bot administrador de Botonera Multimedia-TV.\n\n"
+        f"Puedo ayudarte a gestionar el grupo y procesar solicitudes de canales.\n\n"
+        f"Selecciona una opción para continuar:",
+        reply_markup=reply_markup
+    )
+
+@callback_router.exact("show_commands")
+async def show_commands(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Muestra la lista de comandos."""
+    query = update.callback_query
+    
+    commands_text = (
+        "<b>📚 Comandos Disponibles</b>\n\n"
+        "<b>Comandos Básicos:</b>\n"
+        "/start - Iniciar el bot\n"
+        "/help - Mostrar ayuda\n"
+        "/categories - Ver categorías disponibles\n"
+        "/stats - Ver tus estadísticas\n"
+        "/MisCanales - Ver tus canales añadidos\n\n"
+        "<b>Comandos para Administradores:</b>\n"
+        "/setwelcome - Establecer mensaje de bienvenida\n"
+        "/addbutton - Añadir botón al mensaje de bienvenida\n"
+        "/removebutton - Eliminar botón del mensaje de bienvenida\n"
+        "/showwelcome - Mostrar configuración actual\n"
+        "/resetwelcome - Restablecer configuración por defecto\n"
+        "/warn - Advertir a un usuario\n"
+        "/unwarn - Quitar advertencia a un usuario\n"
+        "/mute - Silenciar a un usuario\n"
+        "/unmute - Quitar silencio a un usuario\n"
+        "/ban - Banear a un usuario\n"
+        "/unban - Desbanear a un usuario\n"
+        "/announce - Enviar anuncio al grupo\n"
+        "/metrics - Ver métricas internas del bot\n\n"
+        "<b>Comandos para Posts Automáticos:</b>\n"
+        "/del - Elimina un canal de las categorías\n"
+        "/edit - Edita un canal de las categorías\n"
+        "/A - Añade un canal para publicación automática\n"
+        "/E - Elimina un canal de publicación automática\n"
+        "/List - Muestra lista de canales para publicación automática\n"
+        "/V - Verifica permisos de bot en los canales"
+    )
+    
+    await query.edit_message_text(
+        commands_text,
+        parse_mode=ParseMode.HTML,
+        reply_markup=InlineKeyboardMarkup([
+            [InlineKeyboardButton("🔙 Volver", callback_data="back_to_main")]
+        ])
+    )
+
+@callback_router.exact("show_stats")
+async def show_user_stats(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Muestra las estadísticas del usuario."""
+    query = update.callback_query
+    user_id = query.from_user.id
+    
+    user_stats = await db.get_user_stats(user_id, query.message.chat.id)
+    warnings = await db.get_warnings(user_id, query.message.chat.id)
+    
+    stats_message = (
+        f"📊 <b>Estadísticas de {update.effective_user.first_name}</b>\n\n"
+        f"Mensajes enviados: {user_stats['messages']}\n"
+        f"Medios compartidos: {user_stats['media']}\n"
+        f"Comandos utilizados: {user_stats['commands']}\n"
+        f"Advertencias: {warnings['count']}/3\n"
+        f"Última actividad: {user_stats['last_active'] if user_stats['last_active'] else 'Desconocida'}"
+    )
+    
+    await query.edit_message_text(
+        stats_message,
+        parse_mode=ParseMode.HTML,
+        reply_markup=InlineKeyboardMarkup([
+            [InlineKeyboardButton("🔙 Volver", callback_data="back_to_main")]
+        ])
+    )
+
+@callback_router.exact("admin_submissions")
+async def show_pending_submissions(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Lista las solicitudes pendientes."""
+    query = update.callback_query
+    user_id = query.from_user.id
+    
+    if user_id != ADMIN_ID:
+        await query.answer("Solo el administrador principal puede ver las solicitudes pendientes.", show_alert=True)
+        return
+    
+    # Solo se consulta una página; el resto sigue en la base de datos
+    submissions = await db.get_pending_submissions(limit=SUBMISSIONS_PAGE_SIZE)
+    if not submissions:
         await query.edit_message_text(
-            f"<b>📋 Plantilla para la categoría {category}</b>\n\n"
-            f"<code>{template}</code>\n\n"
-            f"Copia esta plantilla, reemplaza los datos con la información de tu canal y envíala al grupo o al bot.",
-            parse_mode=ParseMode.HTML,
+            "No hay solicitudes pendientes en este momento.",
             reply_markup=InlineKeyboardMarkup([
-                [InlineKeyboardButton("📋 Copiar Plantilla", callback_data=f"copy_template_{category}")],
-                [InlineKeyboardButton("🔙 Volver a Categorías", callback_data="add_channel_help")]
+                [InlineKeyboardButton("🔙 Volver", callback_data="admin_panel")]
             ])
         )
-        
         return
     
-    # Manejar copia de plantilla
-    if callback_data.startswith("copy_template_"):
-        category = callback_data[14:]
-        
-        template = (
-            f"#Nuevo\n#{category}\nNombre del Canal\n@username_canal\nID -100xxxxxxxxxx\n@admin bot añadido"
-        )
-        
-        await query.answer("Plantilla copiada al portapapeles", show_alert=False)
-        
-        # No podemos realmente copiar al portapapeles, así que enviamos un mensaje nuevo
-        await context.bot.send_message(
-            chat_id=update.effective_chat.id,
-            text=f"<code>{template}</code>\n\n"
-                 f"👆 Copia esta plantilla, reemplaza los datos con la información de tu canal y envíala.",
-            parse_mode=ParseMode.HTML
-        )
-        
-        return
+    # Mostrar lista de solicitudes pendientes
+    submissions_text = "<b>📋 Solicitudes Pendientes</b>\n\n"
     
-    # Manejar panel de administrador
-    if callback_data == "admin_panel":
-        if user_id != ADMIN_ID:
-            await query.answer("Solo el administrador principal puede acceder a este panel.", show_alert=True)
-            return
-        
-        keyboard = [
-            [
-                InlineKeyboardButton("📊 Estadísticas", callback_data="admin_stats"),
-                InlineKeyboardButton("⚙️ Configuración", callback_data="admin_config")
-            ],
-            [
-                InlineKeyboardButton("👮 Moderación", callback_data="admin_moderation"),
-                InlineKeyboardButton("📢 Anuncios", callback_data="admin_announce")
-            ],
-            [
-                InlineKeyboardButton("🔍 Ver Solicitudes", callback_data="admin_submissions"),
-                InlineKeyboardButton("📋 Ver Canales", callback_data="admin_channels")
-            ],
-            [
-                InlineKeyboardButton("📅 Post Automáticos", callback_data="admin_auto_post"),
-                InlineKeyboardButton("📊 Informes", callback_data="admin_reports")
-            ],
-            [InlineKeyboardButton("🔙 Volver", callback_data="back_to_main")]
-        ]
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
-        await query.edit_message_text(
-            "<b>⚙️ Panel de Administrador</b>\n\n"
-            "Bienvenido al panel de administración. Selecciona una opción para continuar:",
-            parse_mode=ParseMode.HTML,
-            reply_markup=reply_markup
-        )
+    keyboard = []
+    for submission_id, submission in submissions.items():
+        submissions_text += f"• Canal: <b>{html.escape(submission['channel_name'])}</b>\n"
+        submissions_text += f"  Categoría: {submission['category']}\n"
+        submissions_text += f"  Usuario: {html.escape(submission['user_name'])}\n\n"
         
+        keyboard.append([
+            InlineKeyboardButton(
+                f"Ver: {submission['channel_name'][:20]}...", 
+                callback_data=f"view_submission_{submission_id}"
+            )
+        ])
+    
+    total = await db.count_pending_submissions()
+    if total > len(submissions):
+        submissions_text += f"<i>... y {total - len(submissions)} más. Revisa primero las más antiguas.</i>\n"
+    
+    keyboard.append([InlineKeyboardButton("🔙 Volver", callback_data="admin_panel")])
+    
+    await query.edit_message_text(
+        submissions_text,
+        parse_mode=ParseMode.HTML,
+        reply_markup=InlineKeyboardMarkup(keyboard)
+    )
+
+@callback_router.prefix("view_submission_")
+async def show_submission(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Muestra los detalles de una solicitud pendiente."""
+    query = update.callback_query
+    user_id = query.from_user.id
+    
+    if user_id != ADMIN_ID:
+        await query.answer("Solo el administrador principal puede ver las solicitudes.", show_alert=True)
         return
     
-    # Manejar volver al menú principal
-    if callback_data == "back_to_main":
-        keyboard = [
-            [InlineKeyboardButton("📚 Comandos", callback_data="show_commands")],
-            [InlineKeyboardButton("📊 Estadísticas", callback_data="show_stats")],
-            [InlineKeyboardButton("🔍 Ver Categorías", callback_data="show_categories")],
-            [InlineKeyboardButton("📣 Canales y Grupos 👥", callback_data="user_channels")],
-            [InlineKeyboardButton("➕ Añadir Canal", callback_data="add_channel_help")]
-        ]
-        
-        if user_id == ADMIN_ID:
-            keyboard.append([InlineKeyboardButton("⚙️ Panel de Administrador", callback_data="admin_panel")])
-        
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        
+    submission_id = context.args[0]
+    
+    submission = await db.get_pending_submission(submission_id)
+    if submission is None:
         await query.edit_message_text(
-            f"Hola {update.effective_user.first_name}! Soy el bot administrador de Botonera Multimedia-TV.\n\n"
-            f"Puedo ayudarte a gestionar el grupo y procesar solicitudes de canales.\n\n"
-            f"Selecciona una opción para continuar:",
-            reply_markup=reply_markup
+            "Esta solicitud ya no está disponible o ha sido procesada.",
+            reply_markup=InlineKeyboardMarkup([
+                [InlineKeyboardButton("🔙 Volver a Solicitudes", callback_data="admin_submissions")]
+            ])
         )
-        
         return
     
-    # Manejar mostrar comandos
-    if callback_data == "show_commands":
-        commands_text = (
-            "<b>📚 Comandos Disponibles</b>\n\n"
-            "<b>Comandos Básicos:</b>\n"
+    # Mostrar detalles de la solicitud
+    submission_text = (
+        f"📋 <b>Detalles de la Solicitud</b>\n\n"
+        f"<b>Canal:</b> {html.escape(submission['channel_name'])}\n"
+        f"<b>Username:</b> @{html.escape(submission['channel_username'])}\n"
+        f"<b>ID:</b> {html.escape(submission['channel_id'])}\n"
+        f"<b>Categoría:</b> {submission['category']}\n"
+        f"<b>Solicitado por:</b> {html.escape(submission['user_name'])}\n"
+    )
+    
+    keyboard = [
+        [
+            InlineKeyboardButton("✅ Aprobar", callback_data=f"approve_{submission_id}"),
+            InlineKeyboardButton("❌ Rechazar", callback_data=f"reject_{submission_id}")
+        ],
+        [
+            InlineKeyboardButton("🔍 Ver Canal", url=f"https://t.me/{submission['channel_username']}"),
+            InlineKeyboardButton("📋 Ver Categoría", url=CATEGORIES[submission['category']])
+        ],
+        [InlineKeyboardButton("🔙 Volver a Solicitudes", callback_data="admin_submissions")]
+    ]
+    
+    await query.edit_message_text(
+        submission_text,
+        parse_mode=ParseMode.HTML,
+        reply_markup=InlineKeyboardMarkup(keyboard)
+    )
+
+@callback_router.prefix("help_")
+async def show_help_section(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Muestra una sección del centro de ayuda."""
+    query = update.callback_query
+    
+    help_type = context.args[0]
+    help_texts = {
+        "basic": (
+            "<b>📝 Comandos Básicos</b>\n\n"
             "/start - Iniciar el bot\n"
             "/help - Mostrar ayuda\n"
             "/categories - Ver categorías disponibles\n"
-            "/stats - Ver tus estadísticas\n"
-            "/MisCanales - Ver tus canales añadidos\n\n"
-            "<b>Comandos para Administradores:</b>\n"
-            "/setwelcome - Establecer mensaje de bienvenida\n"
-            "/addbutton - Añadir botón al mensaje de bienvenida\n"
-            "/removebutton - Eliminar botón del mensaje de bienvenida\n"
-            "/showwelcome - Mostrar configuración actual\n"
-            "/resetwelcome - Restablecer configuración por defecto\n"
+            "/stats - Ver tus estadísticas"
+        ),
+        "mod": (
+            "<b>👮 Comandos de Moderación</b>\n\n"
             "/warn - Advertir a un usuario\n"
             "/unwarn - Quitar advertencia a un usuario\n"
             "/mute - Silenciar a un usuario\n"
             "/unmute - Quitar silencio a un usuario\n"
             "/ban - Banear a un usuario\n"
-            "/unban - Desbanear a un usuario\n"
-            "/announce - Enviar anuncio al grupo\n\n"
-            "<b>Comandos para Posts Automáticos:</b>\n"
-            "/del - Elimina un canal de las categorías\n"
-            "/edit - Edita un canal de las categorías\n"
-            "/A - Añade un canal para publicación automática\n"
-            "/E - Elimina un canal de publicación automática\n"
-            "/List - Muestra lista de canales para publicación automática\n"
-            "/V - Verifica permisos de bot en los canales"
-        )
-        
-        await query.edit_message_text(
-            commands_text,
-            parse_mode=ParseMode.HTML,
-            reply_markup=InlineKeyboardMarkup([
-                [InlineKeyboardButton("🔙 Volver", callback_data="back_to_main")]
-            ])
+            "/unban - Desbanear a un usuario"
+        ),
+        "stats": (
+            "<b>📊 Comandos de Estadísticas</b>\n\n"
+            "/stats - Ver tus estadísticas en el grupo\n"
+            "También puedes ver estadísticas globales desde el menú principal."
+        ),
+        "channels": (
+            "<b>🔄 Comandos de Canales</b>\n\n"
+            "Para añadir un canal, envía un mensaje con el formato:\n"
+            "<code>#Categoría\nNombre del Canal\n@username_canal\nID -100xxxxxxxxxx\n@admin bot añadido</code>\n\n"
+            "Para ver las categorías disponibles usa /categories"
+        ),
+        "config": (
+            "<b>⚙️ Comandos de Configuración</b>\n\n"
+            "/setwelcome - Establecer mensaje de bienvenida\n"
+            "/addbutton - Añadir botón al mensaje de bienvenida\n"
+            "/removebutton - Eliminar botón del mensaje de bienvenida\n"
+            "/showwelcome - Mostrar configuración actual\n"
+            "/resetwelcome - Restablecer configuración por defecto"
+        ),
+        "fun": (
+            "<b>🎮 Comandos de Diversión</b>\n\n"
+            "Próximamente se añadirán comandos de diversión."
         )
-        
-        return
+    }
     
-    # Manejar estadísticas
-    if callback_data == "show_stats":
-        user_stats = db.get_user_stats(user_id, query.message.chat.id)
-        warnings = db.get_warnings(user_id, query.message.chat.id)
-        
-        stats_message = (
-            f"📊 <b>Estadísticas de {update.effective_user.first_name}</b>\n\n"
-            f"Mensajes enviados: {user_stats['messages']}\n"
-            f"Medios compartidos: {user_stats['media']}\n"
-            f"Comandos utilizados: {user_stats['commands']}\n"
-            f"Advertencias: {warnings['count']}/3\n"
-            f"Última actividad: {user_stats['last_active'] if user_stats['last_active'] else 'Desconocida'}"
-        )
-        
+    if help_type in help_texts:
         await query.edit_message_text(
-            stats_message,
+            help_texts[help_type],
             parse_mode=ParseMode.HTML,
             reply_markup=InlineKeyboardMarkup([
-                [InlineKeyboardButton("🔙 Volver", callback_data="back_to_main")]
-            ])
-        )
-        
-        return
-    
-    # Manejar ver solicitudes pendientes (admin)
-    if callback_data == "admin_submissions":
-        if user_id != ADMIN_ID:
-            await query.answer("Solo el administrador principal puede ver las solicitudes pendientes.", show_alert=True)
-            return
-        
-        if not pending_submissions:
-            await query.edit_message_text(
-                "No hay solicitudes pendientes en este momento.",
-                reply_markup=InlineKeyboardMarkup([
-                    [InlineKeyboardButton("🔙 Volver", callback_data="admin_panel")]
-                ])
-            )
-            return
-        
-        # Mostrar lista de solicitudes pendientes
-        submissions_text = "<b>📋 Solicitudes Pendientes</b>\n\n"
-        
-        keyboard = []
-        for submission_id, submission in pending_submissions.items():
-            submissions_text += f"• Canal: <b>{html.escape(submission['channel_name'])}</b>\n"
-            submissions_text += f"  Categoría: {submission['category']}\n"
-            submissions_text += f"  Usuario: {html.escape(submission['user_name'])}\n\n"
-            
-            keyboard.append([
-                InlineKeyboardButton(
-                    f"Ver: {submission['channel_name'][:20]}...", 
-                    callback_data=f"view_submission_{submission_id}"
-                )
+                [InlineKeyboardButton("🔙 Volver", callback_data="help_back")]
             ])
-        
-        keyboard.append([InlineKeyboardButton("🔙 Volver", callback_data="admin_panel")])
-        
-        await query.edit_message_text(
-            submissions_text,
-            parse_mode=ParseMode.HTML,
-            reply_markup=InlineKeyboardMarkup(keyboard)
-        )
-        
-        return
-        
-    # Manejar ver una solicitud específica
-    if callback_data.startswith("view_submission_"):
-        if user_id != ADMIN_ID:
-            await query.answer("Solo el administrador principal puede ver las solicitudes.", show_alert=True)
-            return
-        
-        submission_id = callback_data[15:]
-        
-        if submission_id not in pending_submissions:
-            await query.edit_message_text(
-                "Esta solicitud ya no está disponible o ha sido procesada.",
-                reply_markup=InlineKeyboardMarkup([
-                    [InlineKeyboardButton("🔙 Volver a Solicitudes", callback_data="admin_submissions")]
-                ])
-            )
-            return
-        
-        submission = pending_submissions[submission_id]
-        
-        # Mostrar detalles de la solicitud
-        submission_text = (
-            f"📋 <b>Detalles de la Solicitud</b>\n\n"
-            f"<b>Canal:</b> {html.escape(submission['channel_name'])}\n"
-            f"<b>Username:</b> @{html.escape(submission['channel_username'])}\n"
-            f"<b>ID:</b> {html.escape(submission['channel_id'])}\n"
-            f"<b>Categoría:</b> {submission['category']}\n"
-            f"<b>Solicitado por:</b> {html.escape(submission['user_name'])}\n"
         )
-        
+    elif help_type == "back":
+        # Volver al menú de ayuda principal
         keyboard = [
             [
-                InlineKeyboardButton("✅ Aprobar", callback_data=f"approve_{submission_id}"),
-                InlineKeyboardButton("❌ Rechazar", callback_data=f"reject_{submission_id}")
+                InlineKeyboardButton("📝 Comandos Básicos", callback_data="help_basic"),
+                InlineKeyboardButton("👮 Comandos de Moderación", callback_data="help_mod")
+            ],
+            [
+                InlineKeyboardButton("📊 Estadísticas", callback_data="help_stats"),
+                InlineKeyboardButton("🔄 Canales", callback_data="help_channels")
             ],
             [
-                InlineKeyboardButton("🔍 Ver Canal", url=f"https://t.me/{submission['channel_username']}"),
-                InlineKeyboardButton("📋 Ver Categoría", url=CATEGORIES[submission['category']])
+                InlineKeyboardButton("⚙️ Configuración", callback_data="help_config"),
+                InlineKeyboardButton("🎮 Diversión", callback_data="help_fun")
             ],
-            [InlineKeyboardButton("🔙 Volver a Solicitudes", callback_data="admin_submissions")]
+            [InlineKeyboardButton("🔙 Menú Principal", callback_data="back_to_main")]
         ]
         
+        reply_markup = InlineKeyboardMarkup(keyboard)
+        
         await query.edit_message_text(
-            submission_text,
+            "<b>🤖 Centro de Ayuda</b>\n\n"
+            "Selecciona una categoría para ver los comandos disponibles:",
             parse_mode=ParseMode.HTML,
-            reply_markup=InlineKeyboardMarkup(keyboard)
+            reply_markup=reply_markup
         )
-        
+
+async def button_callback(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Maneja callbacks de botones en un bot de Telegram."""
+    # Buscar el manejador registrado para el callback
+    if await callback_router.dispatch(update, context):
         return
     
-    # Manejar botones de ayuda
-    if callback_data.startswith("help_"):
-        help_type = callback_data[5:]
-        help_texts = {
-            "basic": (
-                "<b>📝 Comandos Básicos</b>\n\n"
-                "/start - Iniciar el bot\n"
-                "/help - Mostrar ayuda\n"
-                "/categories - Ver categorías disponibles\n"
-                "/stats - Ver tus estadísticas"
-            ),
-            "mod": (
-                "<b>👮 Comandos de Moderación</b>\n\n"
-                "/warn - Advertir a un usuario\n"
-                "/unwarn - Quitar advertencia a un usuario\n"
-                "/mute - Silenciar a un usuario\n"
-                "/unmute - Quitar silencio a un usuario\n"
-                "/ban - Banear a un usuario\n"
-                "/unban - Desbanear a un usuario"
-            ),
-            "stats": (
-                "<b>📊 Comandos de Estadísticas</b>\n\n"
-                "/stats - Ver tus estadísticas en el grupo\n"
-                "También puedes ver estadísticas globales desde el menú principal."
-            ),
-            "channels": (
-                "<b>🔄 Comandos de Canales</b>\n\n"
-                "Para añadir un canal, envía un mensaje con el formato:\n"
-                "<code>#Categoría\nNombre del Canal\n@username_canal\nID -100xxxxxxxxxx\n@admin bot añadido</code>\n\n"
-                "Para ver las categorías disponibles usa /categories"
-            ),
-            "config": (
-                "<b>⚙️ Comandos de Configuración</b>\n\n"
-                "/setwelcome - Establecer mensaje de bienvenida\n"
-                "/addbutton - Añadir botón al mensaje de bienvenida\n"
-                "/removebutton - Eliminar botón del mensaje de bienvenida\n"
-                "/showwelcome - Mostrar configuración actual\n"
-                "/resetwelcome - Restablecer configuración por defecto"
-            ),
-            "fun": (
-                "<b>🎮 Comandos de Diversión</b>\n\n"
-                "Próximamente se añadirán comandos de diversión."
-            )
-        }
-        
-        if help_type in help_texts:
-            await query.edit_message_text(
-                help_texts[help_type],
-                parse_mode=ParseMode.HTML,
-                reply_markup=InlineKeyboardMarkup([
-                    [InlineKeyboardButton("🔙 Volver", callback_data="help_back")]
-                ])
-            )
-        elif help_type == "back":
-            # Volver al menú de ayuda principal
-            keyboard = [
-                [
-                    InlineKeyboardButton("📝 Comandos Básicos", callback_data="help_basic"),
-                    InlineKeyboardButton("👮 Comandos de Moderación", callback_data="help_mod")
-                ],
-                [
-                    InlineKeyboardButton("📊 Estadísticas", callback_data="help_stats"),
-                    InlineKeyboardButton("🔄 Canales", callback_data="help_channels")
-                ],
-                [
-                    InlineKeyboardButton("⚙️ Configuración", callback_data="help_config"),
-                    InlineKeyboardButton("🎮 Diversión", callback_data="help_fun")
-                ],
-                [InlineKeyboardButton("🔙 Menú Principal", callback_data="back_to_main")]
-            ]
-            
-            reply_markup = InlineKeyboardMarkup(keyboard)
-            
-            await query.edit_message_text(
-                "<b>🤖 Centro de Ayuda</b>\n\n"
-                "Selecciona una categoría para ver los comandos disponibles:",
-                parse_mode=ParseMode.HTML,
-                reply_markup=reply_markup
-            )
-        
-        return
-
     # Manejar otros callbacks que no estén definidos explícitamente
-    await query.answer("Esta función aún no está implementada.", show_alert=True)
+    await update.callback_query.answer("Esta función aún no está implementada.", show_alert=True)
 
+@callback_router.exact("create_auto_post")
 async def create_auto_post(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Inicia el proceso de creación de un post automático."""
     query = update.callback_query
@@ -1993,6 +2048,7 @@ async def create_auto_post(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         "post_id": post_id,
         "text": "",
         "image": None,
+        "image_file_unique_id": None,
         "buttons": [],
         "selected_channels": [],
         "schedule": {
@@ -2099,6 +2155,7 @@ async def show_post_creation_menu(query, user_id):
         reply_markup=reply_markup
     )
 
+@callback_router.prefix("post_")
 async def handle_post_configuration(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Maneja los callbacks relacionados con la configuración de posts."""
     query = update.callback_query
@@ -2237,13 +2294,7 @@ async def edit_channel_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     channel_id = context.args[0]
     
     # Buscar información del canal
-    channels = db.get_approved_channels()
-    target_channel = None
-    
-    for channel in channels:
-        if channel["channel_id"] == channel_id:
-            target_channel = channel
-            break
+    target_channel = await db.get_approved_channel(channel_id)
     
     if not target_channel:
         await update.message.reply_text("Canal no encontrado.")
@@ -2360,6 +2411,7 @@ async def process_post_image(update: Update, context: ContextTypes.DEFAULT_TYPE)
     
     # Guardar la imagen (el último elemento es la versión de mayor resolución)
     state["image"] = update.message.photo[-1].file_id
+    state["image_file_unique_id"] = update.message.photo[-1].file_unique_id
     state["current_step"] = "text"  # Volver al menú principal
     
     # Enviar confirmación
@@ -2455,7 +2507,7 @@ async def select_post_channels(update: Update, context: ContextTypes.DEFAULT_TYP
     
     try:
         # Obtener canales disponibles para publicación automática
-        channels = db.get_auto_post_channels()
+        channels = await db.get_auto_post_channels()
         
         if not channels:
             await query.edit_message_text(
@@ -2536,7 +2588,7 @@ async def handle_channel_selection(update: Update, context: ContextTypes.DEFAULT
                 await query.answer("Canal deseleccionado")
             else:
                 # Buscar el canal en la lista completa
-                all_channels = db.get_auto_post_channels()
+                all_channels = await db.get_auto_post_channels()
                 target_channel = next((ch for ch in all_channels if ch['channel_id'] == channel_id), None)
                 
                 if target_channel:
@@ -2550,7 +2602,7 @@ async def handle_channel_selection(update: Update, context: ContextTypes.DEFAULT
         # Seleccionar todos los canales
         elif callback_data == "post_chan_select_all":
             old_count = len(state["selected_channels"])
-            state["selected_channels"] = db.get_auto_post_channels()
+            state["selected_channels"] = await db.get_auto_post_channels()
             
             if len(state["selected_channels"]) != old_count:
                 await select_post_channels(update, context)
@@ -2595,7 +2647,7 @@ async def handle_channel_selection(update: Update, context: ContextTypes.DEFAULT
             selected_ids = [ch['channel_id'] for ch in state["selected_channels"]]
             
             # Buscar el canal en la lista completa
-            all_channels = db.get_auto_post_channels()
+            all_channels = await db.get_auto_post_channels()
             target_channel = next((ch for ch in all_channels if ch['channel_id'] == channel_id), None)
             
             if channel_id in selected_ids:
@@ -2611,7 +2663,7 @@ async def handle_channel_selection(update: Update, context: ContextTypes.DEFAULT
         
         # Seleccionar todos los canales
         elif callback_data == "post_chan_select_all":
-            state["selected_channels"] = db.get_auto_post_channels()
+            state["selected_channels"] = await db.get_auto_post_channels()
             await query.answer("Todos los canales seleccionados")
             await select_post_channels(update, context)
         
@@ -2718,58 +2770,7 @@ async def process_button_input(update: Update, context: ContextTypes.DEFAULT_TYP
         await update.message.reply_text("✅ Botón añadido correctamente.")
         await show_post_creation_menu(update.message, user_id)
 
-async def save_auto_post(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Guarda el post automático en la base de datos."""
-    query = update.callback_query
-    user_id = query.from_user.id
-    
-    if user_id != ADMIN_ID or user_id not in post_creation_state:
-        await query.answer("No hay un post para guardar.", show_alert=True)
-        return
-    
-    state = post_creation_state[user_id]
-    
-    # Validar que tenga lo mínimo necesario
-    if not state["text"]:
-        await query.answer("❌ Debes añadir texto al post.", show_alert=True)
-        return
-        
-    if not state["selected_channels"]:
-        await query.answer("❌ Debes seleccionar al menos un canal.", show_alert=True)
-        return
-    
-    try:
-        # Preparar datos del post
-        post_data = {
-            "post_id": state["post_id"],
-            "text": state["text"],
-            "image": state["image"],
-            "buttons": state["buttons"],
-            "channels": state["selected_channels"],
-            "schedule": state["schedule"],
-            "created_by": user_id,
-            "created_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        }
-        
-        # Guardar en la base de datos
-        if db.save_auto_post(post_data):
-            # Limpiar estado
-            del post_creation_state[user_id]
-            
-            await query.edit_message_text(
-                "✅ Post guardado correctamente.\n\n"
-                "El post se publicará automáticamente según la programación establecida.",
-                reply_markup=InlineKeyboardMarkup([[
-                    InlineKeyboardButton("🔙 Volver al Menú", callback_data="admin_menu")
-                ]])
-            )
-        else:
-            await query.answer("❌ Error al guardar el post.", show_alert=True)
-            
-    except Exception as e:
-        logger.error(f"Error al guardar post automático: {e}")
-        await query.answer("❌ Error al guardar el post.", show_alert=True)
-
+@callback_router.exact("post_schedule")
 async def configure_post_schedule(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Configura la programación del post."""
     query = update.callback_query
@@ -2903,6 +2904,7 @@ async def handle_schedule_actions(update: Update, context: ContextTypes.DEFAULT_
 
 
 
+@callback_router.prefix("post_btn_")
 async def handle_button_actions(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Maneja las acciones relacionadas con los botones del post."""
     query = update.callback_query
@@ -2993,6 +2995,7 @@ async def show_button_menu(update: Update, context: ContextTypes.DEFAULT_TYPE) -
             logger.error(f"Error mostrando menú de botones: {e}")
 
 
+@callback_router.prefix("post_sched_")
 async def handle_schedule_setting(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Maneja la configuración de horarios del post."""
     query = update.callback_query
@@ -3453,6 +3456,7 @@ async def preview_post(update: Update, context: ContextTypes.DEFAULT_TYPE) -> No
         reply_markup=reply_markup
     )
 
+@callback_router.exact("post_save")
 async def save_post(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Guarda el post configurado en la base de datos."""
     query = update.callback_query
@@ -3486,9 +3490,14 @@ async def save_post(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         "status": "scheduled"
     }
     
+    # Una imagen enviada al bot ya es un file_id de Telegram y no hay que volver a subirla
+    if state["image"] and state.get("image_file_unique_id"):
+        post_data["image_file_id"] = state["image"]
+        post_data["image_file_unique_id"] = state["image_file_unique_id"]
+    
     # Guardar en la base de datos
     try:
-        success = db.save_post_config(state["post_id"], post_data)
+        success = await db.save_post_config(state["post_id"], post_data)
         
         if success:
             # Programar la publicación
@@ -3552,19 +3561,40 @@ async def schedule_post_publication(context: ContextTypes.DEFAULT_TYPE, post_dat
         while scheduled_time.weekday() not in schedule["days"]:
             scheduled_time += timedelta(days=1)
     
-    # Calcular delay en segundos
-    delay = (scheduled_time - now).total_seconds()
-    
-    # Programar la tarea
-    context.job_queue.run_once(
-        publish_scheduled_post,
-        delay,
-        data={"post_id": post_id},
-        name=f"publish_post_{post_id}"
+    # Programar la tarea (la hora local se convierte a UTC para guardarla)
+    await schedule_job(
+        context.job_queue,
+        "publish",
+        f"publish_post_{post_id}",
+        scheduled_time.astimezone(timezone.utc),
+        {"post_id": post_id}
     )
     
     logger.info(f"Post {post_id} scheduled for {scheduled_time}")
 
+async def schedule_job(job_queue, kind, job_id, run_at, payload, persist=True):
+    """Programa un trabajo y lo guarda en la base de datos para que sobreviva a reinicios.
+    
+    `run_at` debe ser una fecha con zona horaria; `kind` indica la función en JOB_CALLBACKS.
+    """
+    # MongoDB guarda las fechas con precisión de milisegundos
+    run_at = run_at.replace(microsecond=run_at.microsecond // 1000 * 1000)
+    
+    if persist:
+        await db.save_scheduled_job(job_id, kind, run_at, payload)
+    
+    for existing_job in job_queue.get_jobs_by_name(job_id):
+        existing_job.schedule_removal()
+    
+    delay = max((run_at - datetime.now(timezone.utc)).total_seconds(), 0)
+    job_queue.run_once(
+        JOB_CALLBACKS[kind],
+        delay,
+        data={**payload, "run_at": run_at},
+        name=job_id
+    )
+
+@callback_router.exact("list_auto_posts")
 async def list_auto_posts(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Lista todos los posts automáticos."""
     query = update.callback_query
@@ -3575,7 +3605,7 @@ async def list_auto_posts(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         return
     
     # Obtener todos los posts configurados
-    posts = db.get_post_config()
+    posts = await db.get_post_config()
     
     if not posts:
         await query.edit_message_text(
@@ -3628,13 +3658,41 @@ async def list_auto_posts(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         reply_markup=InlineKeyboardMarkup(keyboard)
     )
 
+def format_broadcast_report(title, post_id, results):
+    """Resume en un solo mensaje el resultado de un envío masivo."""
+    failed = [result for result in results if result["status"] == "failed"]
+    report_message = (
+        f"<b>{title}</b>\n\n"
+        f"Post ID: <code>{post_id}</code>\n"
+        f"Canales exitosos: {len(results) - len(failed)}\n"
+        f"Canales fallidos: {len(failed)}\n\n"
+    )
+    
+    # Agrupar los fallos por error para que el informe no crezca con cada canal
+    errors = defaultdict(list)
+    for result in failed:
+        errors[result["error"]].append(result["channel_name"])
+    
+    if errors:
+        report_message += "<b>Errores:</b>\n\n"
+        for error, names in list(errors.items())[:20]:
+            shown = ", ".join(html.escape(name) for name in names[:10])
+            if len(names) > 10:
+                shown += f" y {len(names) - 10} más"
+            report_message += f"❌ {html.escape(error)} ({len(names)}): {shown}\n"
+    
+    return report_message
+
 async def publish_scheduled_post(context: ContextTypes.DEFAULT_TYPE) -> None:
     """Publica un post programado."""
     job = context.job
     post_id = job.data["post_id"]
     
+    # El trabajo ya se está ejecutando, deja de estar pendiente
+    await db.delete_scheduled_job(job.name, job.data.get("run_at"))
+    
     # Obtener configuración del post
-    post_config = db.get_post_config(post_id)
+    post_config = await db.get_post_config(post_id)
     if not post_config:
         logger.error(f"Post configuration not found for id: {post_id}")
         return
@@ -3673,93 +3731,117 @@ async def publish_scheduled_post(context: ContextTypes.DEFAULT_TYPE) -> None:
         if keyboard:
             reply_markup = InlineKeyboardMarkup(keyboard)
     
-    # Estadísticas de publicación
-    publish_stats = {
-        "success": 0,
-        "failed": 0,
-        "channels": []
-    }
+    # Parámetros del envío según el contenido
+    if image:
+        send_method = context.bot.send_photo
+        # Si ya se conoce el file_id de Telegram, ningún envío vuelve a subir la imagen
+        send_kwargs = {"photo": post_config.get("image_file_id") or image, "reply_markup": reply_markup}
+        if text:
+            send_kwargs.update(caption=text, parse_mode=ParseMode.HTML)
+    else:
+        send_method = context.bot.send_message
+        send_kwargs = {"text": text, "parse_mode": ParseMode.HTML, "reply_markup": reply_markup}
     
-    # Publicar en cada canal
-    for channel in channels:
+    semaphore = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+    
+    async def publish_to_channel(channel, capture_photo=False):
         channel_id = channel["channel_id"]
-        try:
-            sent_message = None
-            
-            # Enviar mensaje según el contenido
-            if image and text:
-                # Mensaje con texto e imagen
-                sent_message = await context.bot.send_photo(
-                    chat_id=channel_id,
-                    photo=image,
-                    caption=text,
-                    parse_mode=ParseMode.HTML,
-                    reply_markup=reply_markup
-                )
-            elif image:
-                # Solo imagen
-                sent_message = await context.bot.send_photo(
-                    chat_id=channel_id,
-                    photo=image,
-                    reply_markup=reply_markup
-                )
-            else:
-                # Solo texto
-                sent_message = await context.bot.send_message(
+        async with semaphore:
+            try:
+                sent_message = await broadcast_limiter.call(
+                    channel_id,
+                    send_method,
                     chat_id=channel_id,
-                    text=text,
-                    parse_mode=ParseMode.HTML,
-                    reply_markup=reply_markup
+                    max_retries=BROADCAST_MAX_RETRIES,
+                    **send_kwargs
                 )
+                result = {
+                    "channel_id": channel_id,
+                    "channel_name": channel["channel_name"],
+                    "status": "success",
+                    "message_id": sent_message.message_id if sent_message else None
+                }
+                if capture_photo and sent_message and sent_message.photo:
+                    result["photo"] = sent_message.photo[-1]
+                return result
+            except Exception as e:
+                logger.error(f"Error publishing post to channel {channel_id}: {e}")
+                return {
+                    "channel_id": channel_id,
+                    "channel_name": channel["channel_name"],
+                    "status": "failed",
+                    "error": str(e)
+                }
+    
+    results = []
+    remaining = list(channels)
+    publish_bytes = 0
+    
+    # Origen de la imagen: solo los datos y las URL hacen que Telegram reciba una imagen nueva
+    if not image or post_config.get("image_file_id"):
+        photo_source = "file_id"
+    elif isinstance(image, (bytes, bytearray)):
+        photo_source = "bytes"
+    elif str(image).startswith(("http://", "https://")):
+        photo_source = "url"
+    else:
+        # Post antiguo: la imagen ya es un file_id, solo falta guardarlo con su file_unique_id
+        photo_source = "legacy_file_id"
+    
+    # Subir la imagen una sola vez: se envía canal a canal hasta que un envío
+    # funcione y el resto de canales (y las próximas ejecuciones) usan su file_id
+    if photo_source in ("bytes", "url"):
+        while remaining:
+            result = await publish_to_channel(remaining.pop(0), capture_photo=True)
+            results.append(result)
             
-            # Registrar estadísticas de éxito
-            publish_stats["success"] += 1
-            publish_stats["channels"].append({
-                "channel_id": channel_id,
-                "channel_name": channel["channel_name"],
-                "status": "success",
-                "message_id": sent_message.message_id if sent_message else None
-            })
-            
-            # Actualizar estadísticas del post
-            db.update_post_stats(
-                post_id, 
-                channel_id,
-                "published",
-                message_id=sent_message.message_id if sent_message else None
-            )
-            
-        except Exception as e:
-            logger.error(f"Error publishing post to channel {channel_id}: {e}")
-            
-            # Registrar estadísticas de error
-            publish_stats["failed"] += 1
-            publish_stats["channels"].append({
-                "channel_id": channel_id,
-                "channel_name": channel["channel_name"],
-                "status": "failed",
-                "error": str(e)
-            })
-            
-            # Actualizar estadísticas del post
-            db.update_post_stats(post_id, channel_id, "failed")
+            photo = result.pop("photo", None)
+            if photo:
+                photo_metrics["uploads"] += 1
+                # Una URL la descarga Telegram; solo se envían bytes si la imagen está guardada como datos
+                if photo_source == "bytes":
+                    publish_bytes += len(image)
+                send_kwargs["photo"] = photo.file_id
+                await db.set_post_image_file(post_id, photo.file_id, photo.file_unique_id)
+                break
+    
+    # Publicar en el resto de canales a la vez, respetando los límites de Telegram
+    capture_photo = photo_source == "legacy_file_id"
+    sent = await asyncio.gather(*(publish_to_channel(channel, capture_photo) for channel in remaining))
+    
+    if capture_photo:
+        photos = [photo for photo in (result.pop("photo", None) for result in sent) if photo]
+        if photos:
+            photo_metrics["file_id_backfills"] += 1
+            await db.set_post_image_file(post_id, image, photos[0].file_unique_id)
+    
+    if image:
+        photo_metrics["reused"] += sum(1 for result in sent if result["status"] == "success")
+        photo_metrics["bytes_uploaded"] += publish_bytes
+        photo_metrics["last_publish_bytes"] = publish_bytes
     
-    # Enviar informe al administrador
-    report_message = (
-        f"<b>📊 Informe de Publicación Automática</b>\n\n"
-        f"Post ID: <code>{post_id}</code>\n"
-        f"Canales exitosos: {publish_stats['success']}\n"
-        f"Canales fallidos: {publish_stats['failed']}\n\n"
-    )
+    results.extend(sent)
     
-    if publish_stats["channels"]:
-        report_message += "<b>Detalles:</b>\n\n"
-        
-        for channel_stat in publish_stats["channels"]:
-            if channel_stat["status"] == "success":
-                report_message += f"✅ {html.escape(channel_stat['channel_name'])}\n"
-            else:
-                report_message += f"❌ {html.escape(channel_stat['channel_name'])}: {html.escape(channel_stat['error'])}\n"
+    # Estadísticas de publicación
+    publish_stats = {
+        "success": sum(1 for result in results if result["status"] == "success"),
+        "failed": sum(1 for result in results if result["status"] == "failed"),
+        "channels": results
+    }
+    
+    # Actualizar las estadísticas del post en una sola escritura
+    await db.bulk_update_post_stats(post_id, [
+        {
+            "channel_id": result["channel_id"],
+            "status": "published" if result["status"] == "success" else "failed",
+            "message_id": result.get("message_id")
+        }
+        for result in results
+    ])
+    await db.record_post_history(post_id, "publish", results)
+    
+    # Enviar un único informe al administrador
+    report_message = format_broadcast_report("📊 Informe de Publicación Automática", post_id, results)
     
     await context.bot.send_message(
         chat_id=ADMIN_ID,
@@ -3770,21 +3852,22 @@ async def publish_scheduled_post(context: ContextTypes.DEFAULT_TYPE) -> None:
     # Programar eliminación si es necesaria
     if post_config.get("schedule", {}).get("duration"):
         duration_hours = post_config["schedule"]["duration"]
-        delete_time = datetime.now() + timedelta(hours=duration_hours)
+        delete_time = datetime.now(timezone.utc) + timedelta(hours=duration_hours)
         
         # Actualizar estadísticas
         successful_channels = [ch for ch in publish_stats["channels"] if ch["status"] == "success"]
         
-        # Programar tarea para eliminar el post
+        # Programar tarea para eliminar el post (una por publicación, por si se solapan)
         if successful_channels:
-            context.job_queue.run_once(
-                delete_scheduled_post,
+            await schedule_job(
+                context.job_queue,
+                "delete",
+                f"delete_post_{post_id}_{int(delete_time.timestamp())}",
                 delete_time,
-                data={
+                {
                     "post_id": post_id,
                     "channels": successful_channels
-                },
-                name=f"delete_post_{post_id}"
+                }
             )
     
     # Si es publicación diaria, programar siguiente publicación
@@ -3804,15 +3887,13 @@ async def publish_scheduled_post(context: ContextTypes.DEFAULT_TYPE) -> None:
             while next_run.weekday() not in schedule["days"]:
                 next_run += timedelta(days=1)
         
-        # Calcular delay en segundos
-        delay = (next_run - datetime.now()).total_seconds()
-        
         # Programar la próxima publicación
-        context.job_queue.run_once(
-            publish_scheduled_post,
-            delay,
-            data={"post_id": post_id},
-            name=f"publish_post_{post_id}"
+        await schedule_job(
+            context.job_queue,
+            "publish",
+            f"publish_post_{post_id}",
+            next_run.astimezone(timezone.utc),
+            {"post_id": post_id}
         )
         
         logger.info(f"Next publication of post {post_id} scheduled for {next_run}")
@@ -3823,72 +3904,54 @@ async def delete_scheduled_post(context: ContextTypes.DEFAULT_TYPE) -> None:
     post_id = job.data["post_id"]
     channels = job.data["channels"]
     
-    # Estadísticas de eliminación
-    delete_stats = {
-        "success": 0,
-        "failed": 0,
-        "channels": []
-    }
+    # El trabajo ya se está ejecutando, deja de estar pendiente
+    await db.delete_scheduled_job(job.name, job.data.get("run_at"))
     
-    # Eliminar de cada canal
-    for channel_info in channels:
-        if channel_info["status"] != "success" or not channel_info.get("message_id"):
-            continue
-        
+    semaphore = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+    
+    async def delete_from_channel(channel_info):
         channel_id = channel_info["channel_id"]
-        message_id = channel_info["message_id"]
-        
-        try:
-            # Eliminar mensaje
-            await context.bot.delete_message(
-                chat_id=channel_id,
-                message_id=message_id
-            )
-            
-            # Registrar estadísticas de éxito
-            delete_stats["success"] += 1
-            delete_stats["channels"].append({
-                "channel_id": channel_id,
-                "channel_name": channel_info["channel_name"],
-                "status": "success"
-            })
-            
-            # Actualizar estadísticas del post
-            db.update_post_stats(
-                post_id, 
-                channel_id,
-                "deleted",
-                deleted_at=datetime.now().isoformat()
-            )
-            
-        except Exception as e:
-            logger.error(f"Error deleting post from channel {channel_id}: {e}")
-            
-            # Registrar estadísticas de error
-            delete_stats["failed"] += 1
-            delete_stats["channels"].append({
-                "channel_id": channel_id,
-                "channel_name": channel_info["channel_name"],
-                "status": "failed",
-                "error": str(e)
-            })
-    
-    # Enviar informe al administrador
-    report_message = (
-        f"<b>🗑️ Informe de Eliminación Automática</b>\n\n"
-        f"Post ID: <code>{post_id}</code>\n"
-        f"Canales exitosos: {delete_stats['success']}\n"
-        f"Canales fallidos: {delete_stats['failed']}\n\n"
-    )
+        async with semaphore:
+            try:
+                await broadcast_limiter.call(
+                    channel_id,
+                    context.bot.delete_message,
+                    chat_id=channel_id,
+                    message_id=channel_info["message_id"],
+                    max_retries=BROADCAST_MAX_RETRIES
+                )
+                return {
+                    "channel_id": channel_id,
+                    "channel_name": channel_info["channel_name"],
+                    "status": "success",
+                    "deleted_at": datetime.now().isoformat()
+                }
+            except Exception as e:
+                logger.error(f"Error deleting post from channel {channel_id}: {e}")
+                return {
+                    "channel_id": channel_id,
+                    "channel_name": channel_info["channel_name"],
+                    "status": "failed",
+                    "error": str(e)
+                }
+    
+    # Eliminar de todos los canales a la vez, respetando los límites de Telegram
+    results = await asyncio.gather(*(
+        delete_from_channel(channel_info)
+        for channel_info in channels
+        if channel_info["status"] == "success" and channel_info.get("message_id")
+    ))
     
-    if delete_stats["channels"]:
-        report_message += "<b>Detalles:</b>\n\n"
-        
-        for channel_stat in delete_stats["channels"]:
-            if channel_stat["status"] == "success":
-                report_message += f"✅ {html.escape(channel_stat['channel_name'])}\n"
-            else:
-                report_message += f"❌ {html.escape(channel_stat['channel_name'])}: {html.escape(channel_stat['error'])}\n"
+    # Actualizar las estadísticas del post en una sola escritura
+    await db.bulk_update_post_stats(post_id, [
+        {"channel_id": result["channel_id"], "status": "deleted", "deleted_at": result["deleted_at"]}
+        for result in results
+        if result["status"] == "success"
+    ])
+    await db.record_post_history(post_id, "delete", results)
+    
+    # Enviar un único informe al administrador
+    report_message = format_broadcast_report("🗑️ Informe de Eliminación Automática", post_id, results)
     
     await context.bot.send_message(
         chat_id=ADMIN_ID,
@@ -3896,6 +3959,12 @@ async def delete_scheduled_post(context: ContextTypes.DEFAULT_TYPE) -> None:
         parse_mode=ParseMode.HTML
     )
 
+# Funciones de los trabajos programados que se guardan en la base de datos
+JOB_CALLBACKS = {
+    "publish": publish_scheduled_post,
+    "delete": delete_scheduled_post
+}
+
 async def handle_rejection_reason(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Maneja el motivo de rechazo del administrador."""
     user_id = update.effective_user.id
@@ -3903,13 +3972,13 @@ async def handle_rejection_reason(update: Update, context: ContextTypes.DEFAULT_
     if user_id != ADMIN_ID or user_id not in admin_rejecting:
         return
     
-    submission_id = admin_rejecting[user_id]
-    if submission_id not in pending_submissions:
+    # Retirar la solicitud de forma atómica para que nadie más la procese
+    submission_id = admin_rejecting.pop(user_id)
+    submission = await db.take_pending_submission(submission_id)
+    if submission is None:
         await update.message.reply_text("Esta solicitud ya no está disponible.")
-        del admin_rejecting[user_id]
         return
     
-    submission = pending_submissions[submission_id]
     rejection_reason = update.message.text
     
     # Notificar al usuario sobre el rechazo
@@ -3937,18 +4006,13 @@ async def handle_rejection_reason(update: Update, context: ContextTypes.DEFAULT_
             f"✅ Rechazo enviado al usuario para el canal {submission['channel_name']}."
         )
         
-        # Eliminar la solicitud de la base de datos
-        db.delete_pending_submission(submission_id)
-        
     except Exception as e:
         logger.error(f"Error sending rejection: {e}")
+        # Devolver la solicitud para poder reintentar el rechazo
+        await db.save_pending_submission(submission_id, submission)
         await update.message.reply_text(
             f"❌ Error al enviar el rechazo: {e}"
         )
-    
-    # Limpiar
-    del pending_submissions[submission_id]
-    del admin_rejecting[user_id]
 
 # Comandos para los posts automáticos
 async def add_auto_post_channel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -3971,7 +4035,7 @@ async def add_auto_post_channel(update: Update, context: ContextTypes.DEFAULT_TY
     channel_id = context.args[0]
     
     # Verificar si ya existe en la lista
-    channels = db.get_auto_post_channels()
+    channels = await db.get_auto_post_channels()
     for channel in channels:
         if channel["channel_id"] == channel_id:
             await update.message.reply_text(f"El canal ya está en la lista de publicación automática.")
@@ -3982,7 +4046,7 @@ async def add_auto_post_channel(update: Update, context: ContextTypes.DEFAULT_TY
         chat = await context.bot.get_chat(channel_id)
         
         # Guardar el canal en la base de datos
-        if db.save_auto_post_channel(
+        if await db.save_auto_post_channel(
             channel_id,
             chat.title,
             chat.username if chat.username else "",
@@ -4025,7 +4089,7 @@ async def delete_auto_post_channel(update: Update, context: ContextTypes.DEFAULT
     channel_id = context.args[0]
     
     # Eliminar el canal
-    if db.delete_auto_post_channel(channel_id):
+    if await db.delete_auto_post_channel(channel_id):
         await update.message.reply_text(f"✅ Canal eliminado correctamente de la lista de publicación automática.")
     else:
         await update.message.reply_text("❌ No se encontró el canal en la lista o hubo un error al eliminarlo.")
@@ -4040,7 +4104,7 @@ async def list_auto_post_channels(update: Update, context: ContextTypes.DEFAULT_
         return
     
     # Obtener la lista de canales
-    channels = db.get_auto_post_channels()
+    channels = await db.get_auto_post_channels()
     
     if not channels:
         await update.message.reply_text("No hay canales en la lista de publicación automática.")
@@ -4069,7 +4133,7 @@ async def verify_auto_post_channels(update: Update, context: ContextTypes.DEFAUL
         return
     
     # Obtener la lista de canales
-    channels = db.get_auto_post_channels()
+    channels = await db.get_auto_post_channels()
     
     if not channels:
         await update.message.reply_text("No hay canales en la lista de publicación automática.")
@@ -4078,76 +4142,129 @@ async def verify_auto_post_channels(update: Update, context: ContextTypes.DEFAUL
     # Mensaje inicial
     status_message = await update.message.reply_text("Verificando canales... ⏳")
     
-    # Verificar cada canal
-    results = {
-        "ok": [],
-        "error": []
-    }
+    required_permissions = [
+        "can_post_messages",
+        "can_edit_messages",
+        "can_delete_messages",
+        "can_invite_users"
+    ]
     
-    for channel in channels:
+    subscribers_by_channel = {}
+    semaphore = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+    progress = {"ok": 0, "error": 0, "last_edit": time.monotonic(), "editing": False}
+    
+    async def report_progress():
+        # Editar el mensaje como mucho una vez cada VERIFY_PROGRESS_INTERVAL segundos
+        now = time.monotonic()
+        if progress["editing"] or now - progress["last_edit"] < VERIFY_PROGRESS_INTERVAL:
+            return
+        
+        progress["editing"] = True
+        progress["last_edit"] = now
         try:
-            # Verificar que el bot está en el canal
-            chat_member = await context.bot.get_chat_member(channel["channel_id"], context.bot.id)
-            
-            # Verificar permisos necesarios
-            required_permissions = [
-                "can_post_messages",
-                "can_edit_messages",
-                "can_delete_messages",
-                "can_invite_users"
-            ]
-            
-            missing_permissions = []
-            for permission in required_permissions:
-                if not hasattr(chat_member, permission) or not getattr(chat_member, permission):
-                    missing_permissions.append(permission.replace("can_", "").replace("_", " "))
-            
-            if missing_permissions:
-                results["error"].append({
-                    "channel": channel,
-                    "error": f"Faltan permisos: {', '.join(missing_permissions)}"
-                })
-            else:
-                # Obtener el número de suscriptores
-                chat = await context.bot.get_chat(channel["channel_id"])
-                subscribers = chat.members_count if hasattr(chat, "members_count") else 0
+            await status_message.edit_text(
+                f"Verificando canales... ⏳ {progress['ok'] + progress['error']}/{len(channels)}\n"
+                f"✅ {progress['ok']} | ❌ {progress['error']}"
+            )
+        except TelegramError as e:
+            logger.warning(f"Could not update verification progress: {e}")
+        finally:
+            progress["editing"] = False
+    
+    async def verify_channel(channel):
+        channel_id = channel["channel_id"]
+        async with semaphore:
+            try:
+                # Verificar que el bot está en el canal
+                chat_member = await broadcast_limiter.call(
+                    None, context.bot.get_chat_member, channel_id, context.bot.id,
+                    max_retries=BROADCAST_MAX_RETRIES
+                )
                 
-                # Actualizar el número de suscriptores en la base de datos
-                db.update_channel_subscribers(channel["channel_id"], subscribers)
+                # Verificar permisos necesarios
+                missing_permissions = [
+                    permission.replace("can_", "").replace("_", " ")
+                    for permission in required_permissions
+                    if not getattr(chat_member, permission, None)
+                ]
                 
-                results["ok"].append({
+                if missing_permissions:
+                    outcome = ("error", {
+                        "channel": channel,
+                        "error": f"Faltan permisos: {', '.join(missing_permissions)}"
+                    })
+                else:
+                    # Obtener el número de suscriptores
+                    subscribers = await broadcast_limiter.call(
+                        None, context.bot.get_chat_member_count, channel_id,
+                        max_retries=BROADCAST_MAX_RETRIES
+                    )
+                    subscribers_by_channel[channel_id] = subscribers
+                    
+                    outcome = ("ok", {
+                        "channel": channel,
+                        "subscribers": subscribers
+                    })
+                    
+            except Exception as e:
+                outcome = ("error", {
                     "channel": channel,
-                    "subscribers": subscribers
+                    "error": str(e)
                 })
-                
-        except Exception as e:
-            results["error"].append({
-                "channel": channel,
-                "error": str(e)
-            })
+        
+        progress[outcome[0]] += 1
+        await report_progress()
+        return outcome
+    
+    # Verificar todos los canales a la vez, respetando los límites de Telegram
+    outcomes = await asyncio.gather(*(verify_channel(channel) for channel in channels))
+    
+    # Agrupar los resultados conservando el orden de la lista de canales
+    results = {
+        "ok": [],
+        "error": []
+    }
+    for kind, result in outcomes:
+        results[kind].append(result)
+    
+    # Guardar todos los suscriptores en una sola escritura
+    await db.bulk_update_channel_subscribers(subscribers_by_channel, refreshed=True)
     
     # Construir mensaje de resultados
-    message = "<b>📋 Verificación de Canales</b>\n\n"
+    message = (
+        "<b>📋 Verificación de Canales</b>\n\n"
+        f"✅ Verificados: {len(results['ok'])} "
+        f"(👤{sum(result['subscribers'] for result in results['ok'])})\n"
+        f"❌ Con problemas: {len(results['error'])}\n\n"
+    )
     
-    if results["ok"]:
-        message += "<b>✅ Canales verificados correctamente:</b>\n\n"
-        
-        for result in results["ok"]:
-            message += (
-                f"• <b>{html.escape(result['channel']['channel_name'])}</b>\n"
-                f"  ID: <code>{result['channel']['channel_id']}</code>\n"
-                f"  Suscriptores: {result['subscribers']}\n\n"
-            )
+    # Agrupar los problemas por error para que el informe no crezca con cada canal
+    errors = defaultdict(list)
+    for result in results["error"]:
+        errors[result["error"]].append(result["channel"]["channel_name"])
     
-    if results["error"]:
+    if errors:
         message += "<b>❌ Canales con problemas:</b>\n\n"
+        for error, names in list(errors.items())[:20]:
+            shown = ", ".join(html.escape(name) for name in names[:10])
+            if len(names) > 10:
+                shown += f" y {len(names) - 10} más"
+            line = f"• {html.escape(error)} ({len(names)}): {shown}\n"
+            if len(message) + len(line) > REPORT_MESSAGE_LIMIT:
+                break
+            message += line
+        message += "\n"
+    
+    if results["ok"]:
+        message += "<b>✅ Canales verificados correctamente:</b>\n\n"
         
-        for result in results["error"]:
-            message += (
-                f"• <b>{html.escape(result['channel']['channel_name'])}</b>\n"
-                f"  ID: <code>{result['channel']['channel_id']}</code>\n"
-                f"  Error: {html.escape(result['error'])}\n\n"
-            )
+        # Listar canales mientras quepan en un mensaje de Telegram
+        for shown, result in enumerate(results["ok"]):
+            line = f"• {html.escape(result['channel']['channel_name'])}: 👤{result['subscribers']}\n"
+            if len(message) + len(line) > REPORT_MESSAGE_LIMIT:
+                message += f"... y {len(results['ok']) - shown} más\n"
+                break
+            message += line
     
     await status_message.edit_text(message, parse_mode=ParseMode.HTML)
 
@@ -4221,7 +4338,7 @@ async def list_categories(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     
     # Actualizar estadísticas
     if update.effective_user:
-        db.update_user_stats(update.effective_user.id, update.effective_chat.id, "commands")
+        stats_buffer.add(update.effective_user.id, update.effective_chat.id, "commands")
 
 # Comandos de moderación
 async def warn_user(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -4288,7 +4405,7 @@ async def warn_user(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         return
     
     # Añadir advertencia
-    warn_count = db.add_warning(target_user.id, chat_id, reason)
+    warn_count = await db.add_warning(target_user.id, chat_id, reason)
     
     # Crear mensaje de advertencia
     warn_message = (
@@ -4320,7 +4437,7 @@ async def warn_user(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     await update.message.reply_html(warn_message, reply_markup=reply_markup)
     
     # Actualizar estadísticas
-    db.update_user_stats(user_id, chat_id, "commands")
+    stats_buffer.add(user_id, chat_id, "commands")
 
 async def unwarn_user(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Quita una advertencia a un usuario."""
@@ -4379,19 +4496,19 @@ async def unwarn_user(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         return
     
     # Obtener advertencias actuales
-    warnings = db.get_warnings(target_user.id, chat_id)
+    warnings = await db.get_warnings(target_user.id, chat_id)
     
     if warnings["count"] <= 0:
         await update.message.reply_text(f"El usuario {target_user.mention_html()} no tiene advertencias.", parse_mode=ParseMode.HTML)
         return
     
     # Restar una advertencia
-    if db.add_warning(target_user.id, chat_id, "Advertencia removida") < 0:
+    if await db.add_warning(target_user.id, chat_id, "Advertencia removida") < 0:
         await update.message.reply_text("Error al quitar la advertencia.")
         return
     
     # Obtener nuevo conteo
-    new_warnings = db.get_warnings(target_user.id, chat_id)
+    new_warnings = await db.get_warnings(target_user.id, chat_id)
     
     await update.message.reply_html(
         f"✅ Se ha quitado una advertencia a {target_user.mention_html()}.\n"
@@ -4399,7 +4516,7 @@ async def unwarn_user(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
     )
     
     # Actualizar estadísticas
-    db.update_user_stats(user_id, chat_id, "commands")
+    stats_buffer.add(user_id, chat_id, "commands")
 
 async def mute_user(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Silencia a un usuario."""
@@ -4494,7 +4611,7 @@ async def mute_user(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
             reason = " ".join(context.args[time_arg_index:])
     
     # Calcular tiempo de finalización
-    until_date = datetime.now() + timedelta(seconds=mute_time)
+    until_date = datetime.now(timezone.utc) + timedelta(seconds=mute_time)
     
     # Silenciar al usuario
     try:
@@ -4517,10 +4634,7 @@ async def mute_user(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         )
         
         # Registrar usuario silenciado
-        muted_users[target_user.id] = {
-            "until": until_date,
-            "reason": reason
-        }
+        await register_mute(chat_id, target_user.id, until_date, reason)
         
         # Crear mensaje de silencio
         mute_message = (
@@ -4528,7 +4642,7 @@ async def mute_user(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
             f"Usuario: {target_user.mention_html()}\n"
             f"Duración: {format_time_delta(mute_time)}\n"
             f"Razón: {html.escape(reason)}\n\n"
-            f"El silencio terminará: {until_date.strftime('%Y-%m-%d %H:%M:%S')}"
+            f"El silencio terminará: {until_date.astimezone().strftime('%Y-%m-%d %H:%M:%S')}"
         )
         
         # Enviar mensaje
@@ -4543,7 +4657,7 @@ async def mute_user(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
         await update.message.reply_text(f"Error al silenciar al usuario: {e}")
     
     # Actualizar estadísticas
-    db.update_user_stats(user_id, chat_id, "commands")
+    stats_buffer.add(user_id, chat_id, "commands")
 
 async def unmute_user(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Quita el silencio a un usuario."""
@@ -4621,8 +4735,7 @@ async def unmute_user(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         )
         
         # Eliminar de usuarios silenciados
-        if target_user.id in muted_users:
-            del muted_users[target_user.id]
+        await remove_mute(chat_id, target_user.id)
         
         await update.message.reply_html(
             f"🔊 Se ha quitado el silencio a {target_user.mention_html()}."
@@ -4632,7 +4745,7 @@ async def unmute_user(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Non
         await update.message.reply_text(f"Error al quitar el silencio al usuario: {e}")
     
     # Actualizar estadísticas
-    db.update_user_stats(user_id, chat_id, "commands")
+    stats_buffer.add(user_id, chat_id, "commands")
 
 # Manejadores de mensajes
 async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
@@ -4648,19 +4761,14 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         await handle_edit_input(update, context)
         return
         
-    # Verificar si el usuario está silenciado
-    if user_id in muted_users:
-        mute_info = muted_users[user_id]
-        if datetime.now() < mute_info["until"]:
-            # Eliminar mensaje si el usuario está silenciado
-            try:
-                await update.message.delete()
-                return
-            except:
-                pass
-        else:
-            # El silencio ha expirado, eliminar de la lista
-            del muted_users[user_id]
+    # Verificar si el usuario está silenciado (los silencios terminados los retira sweep_mutes)
+    if (chat_id, user_id) in muted_users:
+        # Eliminar mensaje si el usuario está silenciado
+        try:
+            await update.message.delete()
+            return
+        except:
+            pass
     
     # Verificar spam
     if check_spam(user_id) and not await is_admin(user_id, chat_id, context):
@@ -4677,7 +4785,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
                 can_pin_messages=False
             )
             
-            until_date = datetime.now() + timedelta(seconds=SPAM_MUTE_TIME)
+            until_date = datetime.now(timezone.utc) + timedelta(seconds=SPAM_MUTE_TIME)
             
             await context.bot.restrict_chat_member(
                 chat_id=chat_id,
@@ -4687,10 +4795,7 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
             )
             
             # Registrar usuario silenciado
-            muted_users[user_id] = {
-                "until": until_date,
-                "reason": "Spam detectado"
-            }
+            await register_mute(chat_id, user_id, until_date, "Spam detectado")
             
             await update.message.reply_html(
                 f"🔇 {update.effective_user.mention_html()} ha sido silenciado por {format_time_delta(SPAM_MUTE_TIME)} por enviar mensajes demasiado rápido."
@@ -4714,242 +4819,10 @@ async def handle_message(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
     # Actualizar estadísticas
     if update.message:
         if update.message.photo or update.message.video or update.message.document or update.message.animation:
-            db.update_user_stats(user_id, chat_id, "media")
+            stats_buffer.add(user_id, chat_id, "media")
         else:
-            db.update_user_stats(user_id, chat_id, "messages")
-    
-    # Actualizar última actividad
-    user_last_activity[user_id] = datetime.now()
-
-# Función para publicar posts programados
-async def publish_scheduled_post(context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Publica los posts programados."""
-    job = context.job
-    post_id = job.data["post_id"]
-    
-    # Obtener configuración del post
-    post_config = db.get_post_config(post_id)
-    if not post_config:
-        logger.error(f"Post configuration not found for id: {post_id}")
-        return
-    
-    # Obtener canales para publicar
-    channels = db.get_auto_post_channels()
-    if not channels:
-        logger.error("No channels found for auto posting")
-        return
-    
-    # Preparar mensaje
-    text = post_config.get("text", "")
-    image = post_config.get("image")
-    buttons = post_config.get("buttons", [])
-    
-    # Preparar teclado si hay botones
-    reply_markup = None
-    if buttons:
-        keyboard = []
-        for button_row in buttons:
-            row = []
-            for button in button_row:
-                if button.get("url"):
-                    row.append(InlineKeyboardButton(button["text"], url=button["url"]))
-                elif button.get("callback_data"):
-                    row.append(InlineKeyboardButton(button["text"], callback_data=button["callback_data"]))
-            if row:
-                keyboard.append(row)
-        
-        if keyboard:
-            reply_markup = InlineKeyboardMarkup(keyboard)
-    
-    # Estadísticas de publicación
-    publish_stats = {
-        "success": 0,
-        "failed": 0,
-        "channels": []
-    }
-    
-    # Publicar en cada canal
-    for channel in channels:
-        channel_id = channel["channel_id"]
-        try:
-            sent_message = None
-            
-            # Enviar mensaje según el contenido
-            if image and text:
-                # Mensaje con texto e imagen
-                sent_message = await context.bot.send_photo(
-                    chat_id=channel_id,
-                    photo=image,
-                    caption=text,
-                    parse_mode=ParseMode.HTML,
-                    reply_markup=reply_markup
-                )
-            elif image:
-                # Solo imagen
-                sent_message = await context.bot.send_photo(
-                    chat_id=channel_id,
-                    photo=image,
-                    reply_markup=reply_markup
-                )
-            else:
-                # Solo texto
-                sent_message = await context.bot.send_message(
-                    chat_id=channel_id,
-                    text=text,
-                    parse_mode=ParseMode.HTML,
-                    reply_markup=reply_markup
-                )
-            
-            # Registrar estadísticas de éxito
-            publish_stats["success"] += 1
-            publish_stats["channels"].append({
-                "channel_id": channel_id,
-                "channel_name": channel["channel_name"],
-                "status": "success",
-                "message_id": sent_message.message_id if sent_message else None
-            })
-            
-            # Actualizar estadísticas del post
-            db.update_post_stats(
-                post_id, 
-                channel_id,
-                "published",
-                message_id=sent_message.message_id if sent_message else None
-            )
-            
-        except Exception as e:
-            logger.error(f"Error publishing post to channel {channel_id}: {e}")
-            
-            # Registrar estadísticas de error
-            publish_stats["failed"] += 1
-            publish_stats["channels"].append({
-                "channel_id": channel_id,
-                "channel_name": channel["channel_name"],
-                "status": "failed",
-                "error": str(e)
-            })
-            
-            # Actualizar estadísticas del post
-            db.update_post_stats(post_id, channel_id, "failed")
-    
-    # Enviar informe al administrador
-    report_message = (
-        f"<b>📊 Informe de Publicación Automática</b>\n\n"
-        f"Post ID: <code>{post_id}</code>\n"
-        f"Canales exitosos: {publish_stats['success']}\n"
-        f"Canales fallidos: {publish_stats['failed']}\n\n"
-    )
-    
-    if publish_stats["channels"]:
-        report_message += "<b>Detalles:</b>\n\n"
-        
-        for channel_stat in publish_stats["channels"]:
-            if channel_stat["status"] == "success":
-                report_message += f"✅ {html.escape(channel_stat['channel_name'])}\n"
-            else:
-                report_message += f"❌ {html.escape(channel_stat['channel_name'])}: {html.escape(channel_stat['error'])}\n"
-    
-    await context.bot.send_message(
-        chat_id=ADMIN_ID,
-        text=report_message,
-        parse_mode=ParseMode.HTML
-    )
-    
-    # Programar eliminación si es necesaria
-    if post_config.get("schedule", {}).get("duration"):
-        duration_hours = post_config["schedule"]["duration"]
-        delete_time = datetime.now() + timedelta(hours=duration_hours)
-        
-        # Programar tarea para eliminar el post
-        context.job_queue.run_once(
-            delete_scheduled_post,
-            delete_time,
-            data={
-                "post_id": post_id,
-                "channels": publish_stats["channels"]
-            },
-            name=f"delete_post_{post_id}"
-        )
+            stats_buffer.add(user_id, chat_id, "messages")
 
-async def delete_scheduled_post(context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Elimina los posts programados después de su duración."""
-    job = context.job
-    post_id = job.data["post_id"]
-    channels = job.data["channels"]
-    
-    # Estadísticas de eliminación
-    delete_stats = {
-        "success": 0,
-        "failed": 0,
-        "channels": []
-    }
-    
-    # Eliminar de cada canal
-    for channel_info in channels:
-        if channel_info["status"] != "success" or not channel_info.get("message_id"):
-            continue
-        
-        channel_id = channel_info["channel_id"]
-        message_id = channel_info["message_id"]
-        
-        try:
-            # Eliminar mensaje
-            await context.bot.delete_message(
-                chat_id=channel_id,
-                message_id=message_id
-            )
-            
-            # Registrar estadísticas de éxito
-            delete_stats["success"] += 1
-            delete_stats["channels"].append({
-                "channel_id": channel_id,
-                "channel_name": channel_info["channel_name"],
-                "status": "success"
-            })
-            
-            # Actualizar estadísticas del post
-            db.update_post_stats(
-                post_id, 
-                channel_id,
-                "deleted",
-                deleted_at=datetime.now().isoformat()
-            )
-            
-        except Exception as e:
-            logger.error(f"Error deleting post from channel {channel_id}: {e}")
-            
-            # Registrar estadísticas de error
-            delete_stats["failed"] += 1
-            delete_stats["channels"].append({
-                "channel_id": channel_id,
-                "channel_name": channel_info["channel_name"],
-                "status": "failed",
-                "error": str(e)
-            })
-    
-    # Enviar informe al administrador
-    report_message = (
-        f"<b>🗑️ Informe de Eliminación Automática</b>\n\n"
-        f"Post ID: <code>{post_id}</code>\n"
-        f"Canales exitosos: {delete_stats['success']}\n"
-        f"Canales fallidos: {delete_stats['failed']}\n\n"
-    )
-    
-    if delete_stats["channels"]:
-        report_message += "<b>Detalles:</b>\n\n"
-        
-        for channel_stat in delete_stats["channels"]:
-            if channel_stat["status"] == "success":
-                report_message += f"✅ {html.escape(channel_stat['channel_name'])}\n"
-            else:
-                report_message += f"❌ {html.escape(channel_stat['channel_name'])}: {html.escape(channel_stat['error'])}\n"
-    
-    await context.bot.send_message(
-        chat_id=ADMIN_ID,
-        text=report_message,
-        parse_mode=ParseMode.HTML
-    )
-    
 async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Maneja todos los mensajes recibidos."""
     user_id = update.effective_user.id
@@ -4968,25 +4841,150 @@ async def message_handler(update: Update, context: ContextTypes.DEFAULT_TYPE) ->
         await process_button_input(update, context)    
     
 async def load_scheduled_posts(context: ContextTypes.DEFAULT_TYPE) -> None:
-    """Carga y reprograma los posts existentes."""
-    posts = db.get_post_config()
+    """Restaura los trabajos guardados y programa los posts que no tengan ninguno."""
+    now = datetime.now(timezone.utc)
+    restored = set()
+    
+    for stored_job in await db.get_scheduled_jobs():
+        # MongoDB devuelve las fechas en UTC sin zona horaria
+        run_at = stored_job["run_at"].replace(tzinfo=timezone.utc)
+        late = (now - run_at).total_seconds()
+        
+        # Una publicación muy atrasada se descarta y se programa para su próxima hora;
+        # las eliminaciones atrasadas se ejecutan siempre
+        if stored_job["kind"] == "publish" and late > JOB_MISFIRE_GRACE_TIME:
+            logger.warning(f"Skipping missed job {stored_job['job_id']} ({int(late)}s late)")
+            continue
+        
+        try:
+            await schedule_job(
+                context.job_queue,
+                stored_job["kind"],
+                stored_job["job_id"],
+                run_at,
+                stored_job["payload"],
+                persist=False
+            )
+            restored.add(stored_job["job_id"])
+        except Exception as e:
+            logger.error(f"Error restoring job {stored_job['job_id']}: {e}")
+    
+    posts = await db.get_post_config()
     
     for post in posts:
-        if post.get("status") == "scheduled":
+        if post.get("status") == "scheduled" and f"publish_post_{post['post_id']}" not in restored:
             try:
                 await schedule_post_publication(context, post)
                 logger.info(f"Loaded and scheduled post {post['post_id']}")
             except Exception as e:
                 logger.error(f"Error loading post {post['post_id']}: {e}")  
 
+async def flush_stats_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Escribe periódicamente las estadísticas acumuladas."""
+    await stats_buffer.flush()
+
+async def sweep_state_stores(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Elimina los estados de conversación caducados."""
+    for store in (post_creation_state, user_editing_state, admin_rejecting):
+        store.sweep()
+
+async def refresh_subscriber_counts(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Actualiza los suscriptores de un lote de canales aprobados, empezando por los más antiguos.
+
+    El progreso se guarda en cada canal (last_refreshed), así que tras un
+    reinicio se continúa por donde se quedó.
+    """
+    refreshed_before = datetime.utcnow() - timedelta(seconds=SUBSCRIBER_REFRESH_MAX_AGE)
+    channels = await db.get_stalest_channels(SUBSCRIBER_REFRESH_BATCH, refreshed_before)
+    if not channels:
+        return
+    
+    subscribers = {}
+    failed = []
+    semaphore = asyncio.Semaphore(BROADCAST_CONCURRENCY)
+    
+    async def refresh_channel(channel):
+        channel_id = channel["channel_id"]
+        async with semaphore:
+            try:
+                subscribers[channel_id] = await broadcast_limiter.call(
+                    None, context.bot.get_chat_member_count, channel_id,
+                    max_retries=BROADCAST_MAX_RETRIES
+                )
+            except TelegramError as e:
+                logger.warning(f"Could not refresh subscribers of {channel_id}: {e}")
+                failed.append(channel_id)
+    
+    await asyncio.gather(*(refresh_channel(channel) for channel in channels))
+    await db.bulk_update_channel_subscribers(subscribers, failed, refreshed=True)
+    logger.info(f"Refreshed subscribers of {len(subscribers)} channels ({len(failed)} failed)")
+
+async def show_metrics(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Muestra métricas internas del bot al administrador."""
+    if update.effective_user.id != ADMIN_ID:
+        await update.message.reply_text("Solo el administrador principal puede usar este comando.")
+        return
+    
+    stats_metrics = stats_buffer.metrics
+    channels_cache = db.channels_cache
+    submissions_cache = db.submissions_cache
+    cache_lookups = channels_cache.hits + channels_cache.misses
+    cache_ratio = (channels_cache.hits / cache_lookups * 100) if cache_lookups else 0
+    message = (
+        "<b>📈 Métricas internas</b>\n\n"
+        "<b>Estadísticas (escritura en lote):</b>\n"
+        f"Pendientes: {len(stats_buffer.pending)}\n"
+        f"Escrituras: {stats_metrics['flushes']} ({stats_metrics['written']} documentos)\n"
+        f"Última escritura: {stats_metrics['last_size']} documentos en {stats_metrics['last_ms']:.1f} ms\n"
+        f"Latencia máxima: {stats_metrics['max_ms']:.1f} ms\n"
+        f"Errores: {stats_metrics['errors']}\n\n"
+        "<b>Caché de canales aprobados:</b>\n"
+        f"Entradas: {len(channels_cache)}/{channels_cache.maxsize}\n"
+        f"Aciertos: {channels_cache.hits} | Fallos: {channels_cache.misses} ({cache_ratio:.1f}% aciertos)\n"
+        f"Expulsiones: {channels_cache.evictions}\n"
+        f"Memoria: {channels_cache.memory_usage() / 1024:.1f} KB\n\n"
+        "<b>Caché de solicitudes pendientes:</b>\n"
+        f"Entradas: {len(submissions_cache)}/{submissions_cache.maxsize}\n"
+        f"Aciertos: {submissions_cache.hits} | Fallos: {submissions_cache.misses}\n"
+        f"Memoria: {submissions_cache.memory_usage() / 1024:.1f} KB\n\n"
+        "<b>Imágenes de publicaciones automáticas:</b>\n"
+        f"Subidas: {photo_metrics['uploads']} | Envíos reutilizando file_id: {photo_metrics['reused']}\n"
+        f"file_id guardados en posts antiguos: {photo_metrics['file_id_backfills']}\n"
+        f"Bytes subidos: {photo_metrics['bytes_uploaded']} (última publicación: {photo_metrics['last_publish_bytes']})\n\n"
+        "<b>Estados de usuario:</b>\n"
+    )
+    
+    for name, store in (
+        ("Creación de posts", post_creation_state),
+        ("Edición de canales", user_editing_state),
+        ("Rechazos", admin_rejecting)
+    ):
+        message += (
+            f"{name}: {len(store)}/{store.maxsize} "
+            f"({store.memory_usage() / 1024:.1f} KB, "
+            f"{store.expirations} caducados, {store.evictions} expulsados)\n"
+        )
+    
+    await update.message.reply_html(message)
+
+async def on_shutdown(application: Application) -> None:
+    """Libera los recursos compartidos al detener el bot."""
+    # Escribir las estadísticas pendientes antes de cerrar la base de datos
+    await stats_buffer.flush()
+    db.close()
+
 # Función principal
 def main() -> None:
     """Inicia el bot."""
-    # Cargar configuración desde la base de datos
-    load_config_from_db()
-    
     # Crear la aplicación y pasarle el token del bot
-    application = Application.builder().token(TOKEN).build()
+    # Las actualizaciones de chats distintos se procesan en paralelo; las de un mismo chat, en orden
+    application = (
+        Application.builder()
+        .token(TOKEN)
+        .concurrent_updates(KeyedUpdateProcessor(MAX_CONCURRENT_UPDATES))
+        .post_shutdown(on_shutdown)
+        .build()
+    )
     
     # Registrar manejador de errores
     application.add_error_handler(lambda update, context: logger.error(f"Error: {context.error} in update {update}"))
@@ -5013,6 +5011,7 @@ def main() -> None:
     application.add_handler(CommandHandler("ban", ban_user))
     application.add_handler(CommandHandler("unban", unban_user))
     application.add_handler(CommandHandler("announce", announce))
+    application.add_handler(CommandHandler("metrics", show_metrics))
     
     # Comandos para posts automáticos
     application.add_handler(CommandHandler("A", add_auto_post_channel))
@@ -5022,6 +5021,9 @@ def main() -> None:
     application.add_handler(CommandHandler("del", delete_auto_post_channel))
     application.add_handler(CommandHandler("edit", edit_channel_cmd))
     
+    # Mantener actualizada la caché de administradores
+    application.add_handler(ChatMemberHandler(track_chat_admins, ChatMemberHandler.ANY_CHAT_MEMBER))
+    
     # Dar bienvenida a nuevos miembros
     application.add_handler(MessageHandler(filters.StatusUpdate.NEW_CHAT_MEMBERS, welcome_new_member))
     
@@ -5058,17 +5060,51 @@ def main() -> None:
         process_post_image
     ))
     
-    # Programar la carga de posts cuando el bot inicie
-    application.job_queue.run_once(load_scheduled_posts, 1)  # Ejecutar después de 1 segundo
+    # Conectar con la base de datos, cargar el estado y programar los posts en segundo plano
+    application.job_queue.run_once(warm_up, 0)
+    
+    # Escribir periódicamente las estadísticas acumuladas
+    application.job_queue.run_repeating(flush_stats_job, interval=STATS_FLUSH_INTERVAL)
+    
+    # Retirar los silencios terminados
+    application.job_queue.run_repeating(sweep_mutes, interval=MUTE_SWEEP_INTERVAL)
+    
+    # Eliminar los estados de conversación caducados
+    application.job_queue.run_repeating(sweep_state_stores, interval=STATE_SWEEP_INTERVAL)
+    
+    # Liberar la memoria de anti-spam de los usuarios inactivos
+    application.job_queue.run_repeating(sweep_spam_windows, interval=SPAM_WINDOW)
+    
+    # Actualizar por lotes los suscriptores de los canales aprobados
+    application.job_queue.run_repeating(refresh_subscriber_counts, interval=SUBSCRIBER_REFRESH_INTERVAL, first=SUBSCRIBER_REFRESH_INTERVAL)
     
     # Manejar todos los mensajes
     application.add_handler(MessageHandler(filters.ALL & ~filters.COMMAND & ~filters.StatusUpdate.NEW_CHAT_MEMBERS, handle_message))
     
     # Ejecutar el bot hasta que el usuario presione Ctrl-C
-    application.run_polling(
+    if BOT_MODE == "webhook":
+        if not WEBHOOK_URL:
+            logger.error("WEBHOOK_URL is required when BOT_MODE is 'webhook'")
+            return
+        if not WEBHOOK_SECRET_TOKEN:
+            logger.warning("WEBHOOK_SECRET_TOKEN is not set, webhook requests will not be authenticated")
+        
+        # Servidor HTTP integrado que recibe las actualizaciones que envía Telegram
+        application.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET_TOKEN,
+            max_connections=WEBHOOK_MAX_CONNECTIONS,
             allowed_updates=Update.ALL_TYPES,
             drop_pending_updates=True
         )
+    else:
+        application.run_polling(
+                allowed_updates=Update.ALL_TYPES,
+                drop_pending_updates=True
+            )
         
 
 if __name__ == "__main__":
@@ -0,0 +1,160 @@
+import sys
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+
+class _Entry:
+    """Valor guardado junto con el momento (monotónico) en que caduca."""
+
+    __slots__ = ("value", "expires")
+
+    def __init__(self, value, expires):
+        self.value = value
+        self.expires = expires
+
+
+def deep_sizeof(obj, seen=None):
+    """Estima los bytes que ocupa un objeto incluyendo los contenedores que referencia."""
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(key, seen) + deep_sizeof(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(item, seen) for item in obj)
+    elif isinstance(obj, _Entry):
+        size += deep_sizeof(obj.value, seen)
+    return size
+
+
+# Caché en memoria con caducidad y expulsión LRU
+class TTLCache:
+    """Caché acotada por tamaño (LRU) cuyas entradas caducan tras `ttl` segundos.
+
+    Es segura entre hilos porque se usa desde los métodos de MongoDB, que se
+    ejecutan en el pool de hilos de AsyncMongoDB.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # Se incrementa en cada invalidación para descartar lecturas que empezaron antes
+        self.generation = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Devuelve el valor guardado o `default` si no existe o ha caducado."""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry.expires <= time.monotonic():
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def set(self, key, value, generation=None):
+        """Guarda un valor. Si se indica `generation` y hubo una invalidación desde entonces, se descarta."""
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return False
+
+            self._data[key] = _Entry(value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+            return True
+
+    def invalidate(self, predicate):
+        """Elimina todas las entradas cuya clave cumple `predicate`."""
+        with self._lock:
+            self.generation += 1
+            for key in [key for key in self._data if predicate(key)]:
+                del self._data[key]
+
+    def clear(self):
+        """Vacía la caché."""
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
+
+    def memory_usage(self):
+        """Estimación en bytes de la memoria ocupada por las entradas."""
+        with self._lock:
+            return deep_sizeof(self._data)
+
+    def __len__(self):
+        return len(self._data)
+
+
+# Estado por usuario con caducidad y expulsión LRU
+class StateStore(MutableMapping):
+    """Diccionario acotado para estados de conversación por usuario.
+
+    Una entrada caduca tras `ttl` segundos sin usarse y, si se superan
+    `maxsize` entradas, se expulsan las usadas hace más tiempo. Solo se usa
+    desde el bucle de eventos, por lo que no necesita candado.
+    """
+
+    def __init__(self, maxsize, ttl):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.evictions = 0
+        self.expirations = 0
+        self._data = OrderedDict()
+
+    def __getitem__(self, key):
+        entry = self._data[key]
+        now = time.monotonic()
+        if entry.expires <= now:
+            del self._data[key]
+            self.expirations += 1
+            raise KeyError(key)
+
+        # Cada acceso renueva la caducidad
+        entry.expires = now + self.ttl
+        self._data.move_to_end(key)
+        return entry.value
+
+    def __setitem__(self, key, value):
+        self._data[key] = _Entry(value, time.monotonic() + self.ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    def __delitem__(self, key):
+        del self._data[key]
+
+    def __iter__(self):
+        return iter(list(self._data))
+
+    def __len__(self):
+        return len(self._data)
+
+    def sweep(self):
+        """Elimina las entradas caducadas y devuelve cuántas se eliminaron."""
+        now = time.monotonic()
+        expired = [key for key, entry in self._data.items() if entry.expires <= now]
+        for key in expired:
+            del self._data[key]
+        self.expirations += len(expired)
+        return len(expired)
+
+    def memory_usage(self):
+        """Estimación en bytes de la memoria ocupada por las entradas."""
+        return deep_sizeof(self._data)
@@ -10,9 +10,43 @@ ADMIN_ID = 1742433244
 GROUP_ID = "botoneraMultimediaTv"  # Grupo username sin @
 CATEGORY_CHANNEL_ID = -1002259108243
 
+# Modo de recepción de actualizaciones: "polling" o "webhook"
+BOT_MODE = os.getenv("BOT_MODE", "polling")
+
+# Configuración del modo webhook
+WEBHOOK_URL = os.getenv("WEBHOOK_URL")  # URL pública (https) por la que Telegram llega al bot
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "0.0.0.0")  # dirección en la que escucha el servidor
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "webhook")
+WEBHOOK_SECRET_TOKEN = os.getenv("WEBHOOK_SECRET_TOKEN")  # se valida en cada petición de Telegram
+WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))  # conexiones simultáneas (1-100)
+
 # URL de MongoDB
 MONGO_URI = os.getenv("MONGO_URI")
 
+# Actualizaciones procesadas a la vez (las de un mismo chat siempre van en orden)
+MAX_CONCURRENT_UPDATES = 64
+
+# Hilos dedicados a consultas de MongoDB (evita bloquear el bucle de eventos)
+DB_MAX_WORKERS = 8
+
+# Segundos entre reintentos de la carga inicial si MongoDB no responde
+WARM_UP_RETRY_DELAY = 30
+
+# Escritura diferida de estadísticas por mensaje
+STATS_FLUSH_INTERVAL = 2  # segundos
+STATS_FLUSH_MAX_ENTRIES = 500  # documentos pendientes antes de forzar escritura
+
+# Caché de canales aprobados
+CHANNEL_CACHE_TTL = 300  # segundos
+CHANNEL_CACHE_SIZE = 256  # consultas distintas guardadas
+
+# Solicitudes de canales pendientes de revisión
+SUBMISSION_EXPIRY_DAYS = 30  # días hasta que una solicitud sin revisar caduca
+SUBMISSION_CACHE_SIZE = 256  # solicitudes guardadas en memoria
+SUBMISSION_CACHE_TTL = 300  # segundos
+SUBMISSIONS_PAGE_SIZE = 20  # solicitudes mostradas en el panel de administrador
+
 # Categorías con sus URLs de post
 CATEGORIES = {
     "Películas y Series 🖥": "https://t.me/c/2259108243/4",
@@ -35,10 +69,67 @@ CATEGORIES = {
     "+18 🔥": "https://t.me/c/2259108243/64",
 }
 
+# Otros nombres aceptados para cada categoría en las solicitudes
+CATEGORY_ALIASES = {
+    "Películas": "Películas y Series 🖥",
+    "Series": "Películas y Series 🖥",
+    "Pelis": "Películas y Series 🖥",
+    "Juegos": "Videojuegos 🎮",
+    "Gaming": "Videojuegos 🎮",
+    "Memes": "Memes y Humor 😂",
+    "Humor": "Memes y Humor 😂",
+    "Fotos": "Fotografía 📸",
+    "Apps": "Apks 📱",
+    "Bins": "Bins y Cuentas 💳",
+    "Cuentas": "Bins y Cuentas 💳",
+    "Redes": "Redes Sociales 😎",
+    "Adultos": "+18 🔥",
+}
+
+# Segundos que se agrupan los cambios antes de editar el post de una categoría
+CATEGORY_UPDATE_DELAY = 10
+# Longitud máxima de cada mensaje de categoría (Telegram admite 4096 caracteres)
+CATEGORY_MESSAGE_LIMIT = 4000
+
+# Límites de envío a Telegram para las publicaciones automáticas
+BROADCAST_RATE = 30  # mensajes por segundo en total
+BROADCAST_CHAT_INTERVAL = 1  # segundos entre mensajes al mismo chat
+BROADCAST_CONCURRENCY = 10  # envíos simultáneos como máximo
+BROADCAST_MAX_RETRIES = 3  # reintentos tras un RetryAfter
+VERIFY_PROGRESS_INTERVAL = 3  # segundos mínimos entre ediciones del progreso de /V
+REPORT_MESSAGE_LIMIT = 3800  # caracteres como máximo en el informe de /V (Telegram admite 4096)
+
+# Historial de publicaciones por canal (un documento por canal y día)
+POST_HISTORY_RETENTION_DAYS = 90  # días que se conserva
+POST_HISTORY_BUCKET_LIMIT = 500  # eventos como máximo por canal y día
+
+# Segundos de retraso tras los que una publicación perdida (bot apagado) ya no se envía
+JOB_MISFIRE_GRACE_TIME = 3600
+
 # Mensaje de bienvenida predeterminado
 DEFAULT_WELCOME_MESSAGE = "Hola bienvenido al grupo Botonera Multimedia-TV"
 
+# Segundos que se guarda la lista de administradores de cada chat
+ADMIN_CACHE_TTL = 600
+
+# Estados de conversación por usuario (creación de posts, edición, rechazos)
+STATE_TTL = 6 * 3600  # segundos sin uso hasta que caducan
+STATE_MAX_ENTRIES = 1000  # usuarios como máximo en cada estado
+STATE_SWEEP_INTERVAL = 600  # segundos entre barridos
+
 # Configuración anti-spam
 SPAM_WINDOW = 60  # segundos
 SPAM_LIMIT = 5  # mensajes
 SPAM_MUTE_TIME = 300  # segundos (5 minutos)
+
+# Actualización periódica de los suscriptores de los canales aprobados
+SUBSCRIBER_REFRESH_INTERVAL = 300  # segundos entre lotes
+SUBSCRIBER_REFRESH_BATCH = 50  # canales por lote
+SUBSCRIBER_REFRESH_MAX_AGE = 24 * 3600  # segundos hasta que un recuento se considera antiguo
+
+# Segundos entre barridos de los silencios terminados
+MUTE_SWEEP_INTERVAL = 5
+
+# Configuración de advertencias
+WARNING_MAX_REASONS = 10  # motivos guardados por usuario
+WARNING_EXPIRY_DAYS = 0  # días sin advertencias hasta que caducan (0 = nunca)
@@ -0,0 +1 @@
+# Permite importar los módulos del bot desde tests/
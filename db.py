@@ -1,8 +1,19 @@
 import logging
-from datetime import datetime
-from pymongo import MongoClient
-from pymongo.errors import PyMongoError
-from config import MONGO_URI, DEFAULT_WELCOME_MESSAGE
+import threading
+import time
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pymongo import MongoClient, UpdateOne, ReplaceOne, DeleteOne, ReturnDocument
+from pymongo.errors import PyMongoError, BulkWriteError, DuplicateKeyError
+from config import (
+    MONGO_URI, DEFAULT_WELCOME_MESSAGE, DB_MAX_WORKERS, STATS_FLUSH_MAX_ENTRIES,
+    WARNING_MAX_REASONS, WARNING_EXPIRY_DAYS, CHANNEL_CACHE_SIZE, CHANNEL_CACHE_TTL,
+    SUBMISSION_CACHE_SIZE, SUBMISSION_CACHE_TTL, SUBMISSION_EXPIRY_DAYS,
+    POST_HISTORY_RETENTION_DAYS, POST_HISTORY_BUCKET_LIMIT
+)
+from cache import TTLCache
 
 # Configuración del logger
 logging.basicConfig(
@@ -11,58 +22,129 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Número de candados entre los que se reparten los propietarios
+OWNER_LOCK_STRIPES = 64
+
+# Versión del esquema (índices y configuración inicial); incrementarla al cambiar init_db
+SCHEMA_VERSION = 5
+
 # Clase principal para manejo de base de datos MongoDB
 class MongoDB:
     def __init__(self):
         self.client = None
-        self.db = None
-        self.connect()
-        self.init_db()
+        self._db = None
+        self._ready = False
+        self._connect_lock = threading.Lock()
+        # Candados repartidos por propietario para que dos recálculos de owner_stats no se pisen
+        self._owner_locks = [threading.Lock() for _ in range(OWNER_LOCK_STRIPES)]
+        # Caché de canales aprobados por (categoría, usuario)
+        self.channels_cache = TTLCache(CHANNEL_CACHE_SIZE, CHANNEL_CACHE_TTL)
+        # Caché de solicitudes pendientes por submission_id (la colección es la fuente de verdad)
+        self.submissions_cache = TTLCache(SUBMISSION_CACHE_SIZE, SUBMISSION_CACHE_TTL)
+
+    @property
+    def db(self):
+        """Base de datos; la conexión y la inicialización se hacen en el primer uso."""
+        if not self._ready:
+            with self._connect_lock:
+                if not self._ready:
+                    self.connect()
+                    self.init_db()
+                    self._ready = True
+        return self._db
 
     def connect(self):
-        """Crea la conexión a MongoDB."""
+        """Crea la conexión a MongoDB (una sola vez; si falla init_db se reutiliza el cliente)."""
+        if self.client is not None:
+            return
+        
         try:
             self.client = MongoClient(MONGO_URI)
-            self.db = self.client.botonera_bot
+            self._db = self.client.botonera_bot
             logger.info("Conexión a MongoDB establecida correctamente")
         except PyMongoError as e:
             logger.error(f"Error al conectar con MongoDB: {e}")
             raise
 
+    def check_connection(self):
+        """Comprueba que MongoDB responde. A diferencia del resto de métodos, lanza PyMongoError si falla."""
+        self.db.client.admin.command("ping")
+        return True
+
     def init_db(self):
-        """Inicializa las colecciones de la base de datos."""
+        """Inicializa las colecciones de la base de datos.
+
+        Los índices y la configuración inicial solo se crean cuando cambia
+        SCHEMA_VERSION; la versión aplicada se guarda en la colección meta.
+        """
         try:
+            meta = self._db.meta.find_one({"_id": "schema"})
+            if meta and meta.get("version") == SCHEMA_VERSION:
+                logger.info(f"Esquema de la base de datos al día (versión {SCHEMA_VERSION})")
+                return
+            
             # Crear índices necesarios
-            self.db.approved_channels.create_index("channel_id", unique=True)
-            self.db.approved_channels.create_index("channel_username")
-            self.db.approved_channels.create_index("added_by")
-            self.db.approved_channels.create_index("category")
+            self._db.approved_channels.create_index("channel_id", unique=True)
+            self._db.approved_channels.create_index("channel_username")
+            self._db.approved_channels.create_index("added_by")
+            self._db.approved_channels.create_index("category")
+            # Orden de actualización de suscriptores: primero los más antiguos
+            self._db.approved_channels.create_index("last_refreshed")
             
-            self.db.pending_submissions.create_index("submission_id", unique=True)
-            self.db.pending_submissions.create_index("user_id")
+            self._db.pending_submissions.create_index("submission_id", unique=True)
+            self._db.pending_submissions.create_index("user_id")
+            # Las solicitudes que nadie revisa caducan solas
+            self._db.pending_submissions.create_index("expires_at", expireAfterSeconds=0)
+            self._db.pending_submissions.update_many(
+                {"expires_at": {"$exists": False}},
+                {"$set": {"expires_at": datetime.utcnow() + timedelta(days=SUBMISSION_EXPIRY_DAYS)}}
+            )
             
-            self.db.warnings.create_index([("user_id", 1), ("chat_id", 1)], unique=True)
-            self.db.stats.create_index([("user_id", 1), ("chat_id", 1)], unique=True)
+            self._db.warnings.create_index([("user_id", 1), ("chat_id", 1)], unique=True)
+            # Las advertencias con fecha de caducidad se eliminan automáticamente
+            self._db.warnings.create_index("expires_at", expireAfterSeconds=0)
+            self._db.stats.create_index([("user_id", 1), ("chat_id", 1)], unique=True)
+            self._db.mutes.create_index([("chat_id", 1), ("user_id", 1)], unique=True)
+            self._db.mutes.create_index("until", expireAfterSeconds=0)
             
-            self.db.auto_post_channels.create_index("channel_id", unique=True)
+            self._db.auto_post_channels.create_index("channel_id", unique=True)
+            # El historial de publicaciones vive en post_history, no en cada canal
+            self._db.auto_post_channels.update_many({}, {"$unset": {"posts_history": ""}})
+            self._db.post_history.create_index([("channel_id", 1), ("day", 1)], unique=True)
+            self._db.post_history.create_index("day", expireAfterSeconds=POST_HISTORY_RETENTION_DAYS * 86400)
             
-            # Verificar configuración inicial
-            if not self.db.config.find_one({"key": "welcome_message"}):
-                self.db.config.insert_one({
-                    "key": "welcome_message",
-                    "value": DEFAULT_WELCOME_MESSAGE
-                })
+            # Recalcular los totales de todos los propietarios
+            self._db.approved_channels.aggregate(
+                self._owner_stats_pipeline({}) + [{"$merge": {"into": "owner_stats", "whenMatched": "replace"}}]
+            )
+
+            self._db.scheduled_jobs.create_index("job_id", unique=True)
+            self._db.scheduled_jobs.create_index("run_at")
             
-            if not self.db.config.find_one({"key": "welcome_buttons"}):
-                default_buttons = [
-                    {"text": "Canal Principal", "url": "https://t.me/botoneraMultimediaTv"},
-                    {"text": "Categorías", "url": "https://t.me/c/2259108243/2"},
-                    {"text": "📣 Canales y Grupos 👥", "callback_data": "user_channels"}
-                ]
-                self.db.config.insert_one({
-                    "key": "welcome_buttons",
-                    "value": default_buttons
-                })
+            # Configuración inicial (no sobrescribe valores existentes)
+            self._db.config.update_one(
+                {"key": "welcome_message"},
+                {"$setOnInsert": {"value": DEFAULT_WELCOME_MESSAGE}},
+                upsert=True
+            )
+            
+            default_buttons = [
+                {"text": "Canal Principal", "url": "https://t.me/botoneraMultimediaTv"},
+                {"text": "Categorías", "url": "https://t.me/c/2259108243/2"},
+                {"text": "📣 Canales y Grupos 👥", "callback_data": "user_channels"}
+            ]
+            self._db.config.update_one(
+                {"key": "welcome_buttons"},
+                {"$setOnInsert": {"value": default_buttons}},
+                upsert=True
+            )
+            
+            # Registrar la versión aplicada
+            self._db.meta.update_one(
+                {"_id": "schema"},
+                {"$set": {"version": SCHEMA_VERSION, "updated_at": datetime.utcnow()}},
+                upsert=True
+            )
             
             logger.info("Base de datos inicializada correctamente")
         except PyMongoError as e:
@@ -93,10 +175,76 @@ class MongoDB:
             return None
 
     # ----- FUNCIONES DE CANALES APROBADOS -----
+    def _invalidate_channels(self, *channels):
+        """Invalida las entradas de caché afectadas por los canales indicados."""
+        targets = [(ch.get("category"), ch.get("added_by")) for ch in channels if ch]
+        
+        def affected(key):
+            category, user_id = key
+            return any(
+                (category is None or category == target_category) and
+                (user_id is None or user_id == target_user)
+                for target_category, target_user in targets
+            )
+        
+        if targets:
+            self.channels_cache.invalidate(affected)
+
+    @staticmethod
+    def _owner_stats_pipeline(match):
+        """Agrupa los canales por propietario y separa canales (ID -100...) de grupos."""
+        is_channel = {"$eq": [{"$substrCP": [{"$toString": "$channel_id"}, 0, 4]}, "-100"]}
+        subscribers = {"$ifNull": ["$subscribers", 0]}
+        return [
+            {"$match": match},
+            {"$group": {
+                "_id": "$added_by",
+                "channels": {"$sum": {"$cond": [is_channel, 1, 0]}},
+                "groups": {"$sum": {"$cond": [is_channel, 0, 1]}},
+                "channel_subs": {"$sum": {"$cond": [is_channel, subscribers, 0]}},
+                "group_subs": {"$sum": {"$cond": [is_channel, 0, subscribers]}}
+            }}
+        ]
+
+    def _refresh_owner_stats(self, *channels):
+        """Recalcula los totales de los propietarios de los canales indicados.
+
+        Usa una sola agregación sobre el índice added_by y una escritura en
+        lote; los propietarios que ya no tienen canales se eliminan. Los
+        candados de los propietarios se mantienen desde la agregación hasta la
+        escritura, así un recálculo más antiguo nunca sobrescribe uno más nuevo.
+        """
+        owners = {ch.get("added_by") for ch in channels if ch and ch.get("added_by") is not None}
+        if not owners:
+            return
+        
+        # Tomar los candados siempre en el mismo orden para evitar interbloqueos
+        locks = [self._owner_locks[index] for index in sorted({hash(owner) % OWNER_LOCK_STRIPES for owner in owners})]
+        for lock in locks:
+            lock.acquire()
+        try:
+            stats = {
+                doc["_id"]: doc
+                for doc in self.db.approved_channels.aggregate(
+                    self._owner_stats_pipeline({"added_by": {"$in": list(owners)}})
+                )
+            }
+            operations = [
+                ReplaceOne({"_id": owner}, stats[owner], upsert=True) if owner in stats
+                else DeleteOne({"_id": owner})
+                for owner in owners
+            ]
+            self.db.owner_stats.bulk_write(operations, ordered=False)
+        except PyMongoError as e:
+            logger.error(f"Error actualizando totales por propietario: {e}")
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
     def save_approved_channel(self, channel_id, channel_name, channel_username, category, added_by):
         """Guarda un canal aprobado en la base de datos."""
         try:
-            self.db.approved_channels.update_one(
+            previous = self.db.approved_channels.find_one_and_update(
                 {"channel_id": channel_id},
                 {
                     "$set": {
@@ -108,8 +256,12 @@ class MongoDB:
                         "subscribers": 0  # Campo para número de suscriptores
                     }
                 },
-                upsert=True
+                projection={"_id": 0, "category": 1, "added_by": 1},
+                upsert=True,
+                return_document=ReturnDocument.BEFORE
             )
+            self._invalidate_channels(previous, {"category": category, "added_by": added_by})
+            self._refresh_owner_stats(previous, {"added_by": added_by})
             
             # Contar canales en la categoría
             count = self.db.approved_channels.count_documents({"category": category})
@@ -120,7 +272,13 @@ class MongoDB:
 
     def get_approved_channels(self, category=None, user_id=None):
         """Obtiene los canales aprobados, opcionalmente filtrados por categoría o usuario."""
+        cache_key = (category or None, user_id or None)
+        channels = self.channels_cache.get(cache_key)
+        if channels is not None:
+            return list(channels)
+        
         try:
+            generation = self.channels_cache.generation
             filter_query = {}
             if category:
                 filter_query["category"] = category
@@ -128,16 +286,40 @@ class MongoDB:
                 filter_query["added_by"] = user_id
                 
             channels = list(self.db.approved_channels.find(filter_query, {'_id': 0}))
-            return channels
+            self.channels_cache.set(cache_key, channels, generation)
+            return list(channels)
         except PyMongoError as e:
             logger.error(f"Error obteniendo canales aprobados: {e}")
             return []
 
+    def get_approved_channel(self, channel_id):
+        """Obtiene un canal aprobado por su ID usando el índice único."""
+        try:
+            return self.db.approved_channels.find_one(
+                {"channel_id": channel_id},
+                {
+                    "_id": 0,
+                    "channel_id": 1,
+                    "channel_name": 1,
+                    "channel_username": 1,
+                    "category": 1,
+                    "added_by": 1
+                }
+            )
+        except PyMongoError as e:
+            logger.error(f"Error obteniendo canal aprobado {channel_id}: {e}")
+            return None
+
     def delete_approved_channel(self, channel_id):
         """Elimina un canal aprobado de la base de datos."""
         try:
-            result = self.db.approved_channels.delete_one({"channel_id": channel_id})
-            return result.deleted_count > 0
+            deleted = self.db.approved_channels.find_one_and_delete(
+                {"channel_id": channel_id},
+                projection={"_id": 0, "category": 1, "added_by": 1}
+            )
+            self._invalidate_channels(deleted)
+            self._refresh_owner_stats(deleted)
+            return deleted is not None
         except PyMongoError as e:
             logger.error(f"Error eliminando canal aprobado: {e}")
             return False
@@ -145,11 +327,17 @@ class MongoDB:
     def update_channel_info(self, channel_id, field_name, new_value):
         """Actualiza un campo específico de un canal."""
         try:
-            result = self.db.approved_channels.update_one(
+            previous = self.db.approved_channels.find_one_and_update(
                 {"channel_id": channel_id},
-                {"$set": {field_name: new_value}}
+                {"$set": {field_name: new_value}},
+                projection={"_id": 0, "category": 1, "added_by": 1, field_name: 1},
+                return_document=ReturnDocument.BEFORE
             )
-            return result.modified_count > 0
+            if not previous:
+                return False
+            
+            self._invalidate_channels(previous, {**previous, field_name: new_value})
+            return previous.get(field_name) != new_value
         except PyMongoError as e:
             logger.error(f"Error actualizando información del canal: {e}")
             return False
@@ -157,45 +345,167 @@ class MongoDB:
     def update_channel_subscribers(self, channel_id, subscribers):
         """Actualiza el número de suscriptores de un canal."""
         try:
-            result = self.db.approved_channels.update_one(
+            previous = self.db.approved_channels.find_one_and_update(
                 {"channel_id": channel_id},
-                {"$set": {"subscribers": subscribers}}
+                {"$set": {"subscribers": subscribers}},
+                projection={"_id": 0, "category": 1, "added_by": 1, "subscribers": 1},
+                return_document=ReturnDocument.BEFORE
             )
-            return result.modified_count > 0
+            if not previous:
+                return False
+            
+            if previous.get("subscribers") == subscribers:
+                return False
+            
+            self._invalidate_channels(previous)
+            self._refresh_owner_stats(previous)
+            return True
         except PyMongoError as e:
             logger.error(f"Error actualizando suscriptores del canal: {e}")
             return False
 
+    def bulk_update_channel_subscribers(self, subscribers, failed=(), refreshed=False):
+        """Actualiza en una sola escritura los suscriptores de varios canales.
+
+        `subscribers` es un dict de channel_id -> número de suscriptores. Con
+        `refreshed` (recuentos obtenidos de Telegram) se marca last_refreshed.
+        Los canales de `failed` solo guardan refresh_failed_at, para que no
+        bloqueen la cola de actualización sin fingir un recuento válido.
+        """
+        if not subscribers and not failed:
+            return True
+        
+        now = datetime.utcnow()
+        operations = []
+        for channel_id, count in subscribers.items():
+            fields = {"subscribers": count}
+            if refreshed:
+                fields["last_refreshed"] = now
+            operations.append(UpdateOne({"channel_id": channel_id}, {"$set": fields}))
+        operations.extend(
+            UpdateOne({"channel_id": channel_id}, {"$set": {"refresh_failed_at": now}})
+            for channel_id in failed
+        )
+        
+        try:
+            # Canales cuyo valor cambia, para invalidar solo sus entradas de caché
+            changed = []
+            if subscribers:
+                changed = list(self.db.approved_channels.find(
+                    {"$or": [
+                        {"channel_id": channel_id, "subscribers": {"$ne": count}}
+                        for channel_id, count in subscribers.items()
+                    ]},
+                    {"_id": 0, "category": 1, "added_by": 1}
+                ))
+            
+            self.db.approved_channels.bulk_write(operations, ordered=False)
+            
+            self._invalidate_channels(*changed)
+            self._refresh_owner_stats(*changed)
+            return True
+        except PyMongoError as e:
+            logger.error(f"Error actualizando suscriptores en lote: {e}")
+            return False
+
+    def get_stalest_channels(self, limit, refreshed_before):
+        """Obtiene los canales aprobados cuyos suscriptores llevan más tiempo sin actualizarse.
+
+        Los que nunca se han actualizado van primero; los actualizados (o que
+        fallaron) después de `refreshed_before` no se devuelven.
+        """
+        try:
+            return list(self.db.approved_channels.find(
+                {
+                    "last_refreshed": {"$not": {"$gte": refreshed_before}},
+                    "refresh_failed_at": {"$not": {"$gte": refreshed_before}}
+                },
+                {"_id": 0, "channel_id": 1, "channel_username": 1}
+            ).sort("last_refreshed", 1).limit(limit))
+        except PyMongoError as e:
+            logger.error(f"Error obteniendo canales para actualizar suscriptores: {e}")
+            return []
+
     # ----- FUNCIONES DE SOLICITUDES PENDIENTES -----
     def save_pending_submission(self, submission_id, submission_data):
         """Guarda una solicitud pendiente en la base de datos."""
         try:
             submission_data["submission_date"] = datetime.now().isoformat()
+            submission_data["expires_at"] = datetime.utcnow() + timedelta(days=SUBMISSION_EXPIRY_DAYS)
             self.db.pending_submissions.update_one(
                 {"submission_id": submission_id},
                 {"$set": submission_data},
                 upsert=True
             )
+            self.submissions_cache.invalidate(lambda key: key == submission_id)
             return True
         except PyMongoError as e:
             logger.error(f"Error guardando solicitud pendiente: {e}")
             return False
 
-    def get_pending_submissions(self):
-        """Obtiene todas las solicitudes pendientes."""
+    def get_pending_submission(self, submission_id):
+        """Obtiene una solicitud pendiente por su ID usando el índice único."""
+        submission = self.submissions_cache.get(submission_id)
+        if submission is not None:
+            return submission
+        
+        try:
+            generation = self.submissions_cache.generation
+            submission = self.db.pending_submissions.find_one(
+                {"submission_id": submission_id, "expires_at": {"$gt": datetime.utcnow()}},
+                {'_id': 0}
+            )
+            if submission:
+                self.submissions_cache.set(submission_id, submission, generation)
+            return submission
+        except PyMongoError as e:
+            logger.error(f"Error obteniendo solicitud pendiente: {e}")
+            return None
+
+    def take_pending_submission(self, submission_id):
+        """Elimina y devuelve una solicitud pendiente en una sola operación.
+
+        Si dos manejadores intentan procesar la misma solicitud, solo uno la obtiene.
+        """
+        try:
+            submission = self.db.pending_submissions.find_one_and_delete(
+                {"submission_id": submission_id, "expires_at": {"$gt": datetime.utcnow()}},
+                projection={'_id': 0}
+            )
+            self.submissions_cache.invalidate(lambda key: key == submission_id)
+            return submission
+        except PyMongoError as e:
+            logger.error(f"Error obteniendo solicitud pendiente: {e}")
+            return None
+
+    def get_pending_submissions(self, limit=0):
+        """Obtiene las solicitudes pendientes más antiguas (todas si `limit` es 0)."""
         try:
             submissions = {}
-            for submission in self.db.pending_submissions.find({}, {'_id': 0}):
+            cursor = self.db.pending_submissions.find(
+                {"expires_at": {"$gt": datetime.utcnow()}},
+                {'_id': 0}
+            ).sort("expires_at", 1).limit(limit)
+            for submission in cursor:
                 submissions[submission["submission_id"]] = submission
             return submissions
         except PyMongoError as e:
             logger.error(f"Error obteniendo solicitudes pendientes: {e}")
             return {}
 
+    def count_pending_submissions(self):
+        """Cuenta las solicitudes pendientes."""
+        try:
+            return self.db.pending_submissions.count_documents({"expires_at": {"$gt": datetime.utcnow()}})
+        except PyMongoError as e:
+            logger.error(f"Error contando solicitudes pendientes: {e}")
+            return 0
+
     def delete_pending_submission(self, submission_id):
         """Elimina una solicitud pendiente de la base de datos."""
         try:
             result = self.db.pending_submissions.delete_one({"submission_id": submission_id})
+            self.submissions_cache.invalidate(lambda key: key == submission_id)
             return result.deleted_count > 0
         except PyMongoError as e:
             logger.error(f"Error eliminando solicitud pendiente: {e}")
@@ -223,6 +533,34 @@ class MongoDB:
             logger.error(f"Error actualizando estadísticas de usuario: {e}")
             return False
 
+    def bulk_update_user_stats(self, deltas):
+        """Aplica en lote incrementos de estadísticas agrupados por (user_id, chat_id).
+
+        Devuelve la lista de claves que no se pudieron escribir.
+        """
+        keys = list(deltas)
+        operations = [
+            UpdateOne(
+                {"user_id": user_id, "chat_id": chat_id},
+                {
+                    "$inc": deltas[(user_id, chat_id)]["inc"],
+                    "$set": {"last_active": deltas[(user_id, chat_id)]["last_active"]}
+                },
+                upsert=True
+            )
+            for user_id, chat_id in keys
+        ]
+        try:
+            self.db.stats.bulk_write(operations, ordered=False)
+            return []
+        except BulkWriteError as e:
+            failed = [keys[error["index"]] for error in e.details.get("writeErrors", [])]
+            logger.error(f"Error escribiendo estadísticas en lote ({len(failed)} fallidas): {e}")
+            return failed
+        except PyMongoError as e:
+            logger.error(f"Error escribiendo estadísticas en lote: {e}")
+            return keys
+
     def get_user_stats(self, user_id, chat_id):
         """Obtiene las estadísticas de un usuario."""
         try:
@@ -252,45 +590,58 @@ class MongoDB:
 
     # ----- FUNCIONES DE ADVERTENCIAS -----
     def add_warning(self, user_id, chat_id, reason):
-        """Añade una advertencia a un usuario."""
-        try:
-            # Obtener advertencias actuales
-            warning_data = self.db.warnings.find_one({"user_id": user_id, "chat_id": chat_id})
-            
-            new_reason = {
-                "reason": reason,
-                "date": datetime.now().isoformat()
-            }
-            
-            if warning_data:
-                count = warning_data.get("count", 0) + 1
-                reasons = warning_data.get("reasons", [])
-                reasons.append(new_reason)
-                
-                self.db.warnings.update_one(
+        """Añade una advertencia a un usuario en una sola operación atómica.
+
+        Solo se conservan los últimos WARNING_MAX_REASONS motivos. Si
+        WARNING_EXPIRY_DAYS es mayor que cero, las advertencias caducan tras
+        ese periodo sin nuevas advertencias.
+        """
+        now = datetime.utcnow()
+        # El barrido TTL no es inmediato: si el documento ya caducó se empieza de cero
+        # dentro de la misma actualización, igual que lo ve get_warnings
+        expired = {"$and": [{"$ifNull": ["$expires_at", False]}, {"$lte": ["$expires_at", now]}]}
+        new_reason = {"reason": reason, "date": datetime.now().isoformat()}
+        fields = {
+            "count": {"$add": [{"$cond": [expired, 0, {"$ifNull": ["$count", 0]}]}, 1]},
+            "reasons": {"$slice": [
+                {"$concatArrays": [
+                    {"$cond": [expired, [], {"$ifNull": ["$reasons", []]}]},
+                    [{"$literal": new_reason}]
+                ]},
+                -WARNING_MAX_REASONS
+            ]},
+            "last_warning": now
+        }
+        if WARNING_EXPIRY_DAYS:
+            fields["expires_at"] = now + timedelta(days=WARNING_EXPIRY_DAYS)
+        update = [{"$set": fields}]
+
+        # Dos upserts simultáneos del mismo documento pueden chocar con el índice único
+        for attempt in range(2):
+            try:
+                warning_data = self.db.warnings.find_one_and_update(
                     {"user_id": user_id, "chat_id": chat_id},
-                    {"$set": {"count": count, "reasons": reasons}}
+                    update,
+                    projection={"_id": 0, "count": 1},
+                    upsert=True,
+                    return_document=ReturnDocument.AFTER
                 )
-            else:
-                count = 1
-                reasons = [new_reason]
-                
-                self.db.warnings.insert_one({
-                    "user_id": user_id,
-                    "chat_id": chat_id,
-                    "count": count,
-                    "reasons": reasons
-                })
-            
-            return count
-        except PyMongoError as e:
-            logger.error(f"Error añadiendo advertencia: {e}")
-            return 0
+                return warning_data["count"]
+            except DuplicateKeyError:
+                if attempt:
+                    logger.error(f"Error añadiendo advertencia: clave duplicada para {user_id} en {chat_id}")
+                    return 0
+            except PyMongoError as e:
+                logger.error(f"Error añadiendo advertencia: {e}")
+                return 0
 
     def get_warnings(self, user_id, chat_id):
         """Obtiene las advertencias de un usuario."""
         try:
             warnings = self.db.warnings.find_one({"user_id": user_id, "chat_id": chat_id})
+            # El barrido TTL de MongoDB no es inmediato: ignorar advertencias ya caducadas
+            if warnings and warnings.get("expires_at") and warnings["expires_at"] <= datetime.utcnow():
+                warnings = None
             if warnings:
                 return {
                     "count": warnings.get("count", 0),
@@ -317,6 +668,37 @@ class MongoDB:
             logger.error(f"Error reiniciando advertencias: {e}")
             return False
 
+    # ----- FUNCIONES DE SILENCIOS -----
+    def save_mute(self, chat_id, user_id, until, reason):
+        """Guarda un silencio; MongoDB lo elimina automáticamente al llegar `until`."""
+        try:
+            self.db.mutes.update_one(
+                {"chat_id": chat_id, "user_id": user_id},
+                {"$set": {"until": until, "reason": reason}},
+                upsert=True
+            )
+            return True
+        except PyMongoError as e:
+            logger.error(f"Error guardando silencio: {e}")
+            return False
+
+    def delete_mute(self, chat_id, user_id):
+        """Elimina el silencio de un usuario en un chat."""
+        try:
+            result = self.db.mutes.delete_one({"chat_id": chat_id, "user_id": user_id})
+            return result.deleted_count > 0
+        except PyMongoError as e:
+            logger.error(f"Error eliminando silencio: {e}")
+            return False
+
+    def get_active_mutes(self):
+        """Obtiene los silencios que aún no han terminado."""
+        try:
+            return list(self.db.mutes.find({"until": {"$gt": datetime.utcnow()}}, {'_id': 0}))
+        except PyMongoError as e:
+            logger.error(f"Error obteniendo silencios: {e}")
+            return []
+
     # ----- FUNCIONES DE PUBLICACIÓN AUTOMÁTICA -----
     def save_auto_post_channel(self, channel_id, channel_name, channel_username, added_by):
         """Guarda un canal para publicación automática."""
@@ -329,8 +711,7 @@ class MongoDB:
                         "channel_username": channel_username,
                         "added_by": added_by,
                         "added_date": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                        "subscribers": 0,
-                        "posts_history": []
+                        "subscribers": 0
                     }
                 },
                 upsert=True
@@ -352,7 +733,10 @@ class MongoDB:
     def get_auto_post_channels(self):
         """Obtiene todos los canales para publicación automática."""
         try:
-            return list(self.db.auto_post_channels.find({}, {'_id': 0}))
+            return list(self.db.auto_post_channels.find(
+                {},
+                {'_id': 0, "channel_id": 1, "channel_name": 1, "channel_username": 1, "subscribers": 1}
+            ))
         except PyMongoError as e:
             logger.error(f"Error obteniendo canales para publicación automática: {e}")
             return []
@@ -371,6 +755,18 @@ class MongoDB:
             logger.error(f"Error guardando configuración de post: {e}")
             return False
 
+    def set_post_image_file(self, post_id, file_id, file_unique_id):
+        """Guarda el file_id de Telegram de la imagen de un post para no volver a subirla."""
+        try:
+            self.db.posts_config.update_one(
+                {"post_id": post_id},
+                {"$set": {"image_file_id": file_id, "image_file_unique_id": file_unique_id}}
+            )
+            return True
+        except PyMongoError as e:
+            logger.error(f"Error guardando file_id de la imagen del post: {e}")
+            return False
+
     def get_post_config(self, post_id=None):
         """Obtiene la configuración de posts automáticos."""
         try:
@@ -406,26 +802,221 @@ class MongoDB:
             logger.error(f"Error actualizando estadísticas de post: {e}")
             return False
 
+    def bulk_update_post_stats(self, post_id, updates):
+        """Actualiza en una sola escritura el estado de un post en varios canales.
+
+        Cada elemento de `updates` incluye channel_id, status y opcionalmente
+        message_id y deleted_at.
+        """
+        now = datetime.now().isoformat()
+        operations = []
+        for update in updates:
+            fields = {"channels.$.status": update["status"], "channels.$.updated_at": now}
+            for key in ("message_id", "deleted_at"):
+                if update.get(key):
+                    fields[f"channels.$.{key}"] = update[key]
+
+            operations.append(UpdateOne(
+                {"post_id": post_id, "channels.channel_id": update["channel_id"]},
+                {"$set": fields}
+            ))
+
+        if not operations:
+            return True
+
+        try:
+            self.db.posts_config.bulk_write(operations, ordered=False)
+            return True
+        except PyMongoError as e:
+            logger.error(f"Error actualizando estadísticas de post en lote: {e}")
+            return False
+
+    def record_post_history(self, post_id, action, results):
+        """Añade al historial de cada canal el resultado de publicar o eliminar un post.
+
+        El historial se agrupa en un documento por canal y día (UTC), con como
+        mucho POST_HISTORY_BUCKET_LIMIT eventos, y caduca tras
+        POST_HISTORY_RETENTION_DAYS días.
+        """
+        now = datetime.utcnow()
+        day = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        operations = []
+        for result in results:
+            event = {"post_id": post_id, "action": action, "status": result["status"], "at": now}
+            if result.get("message_id"):
+                event["message_id"] = result["message_id"]
+
+            operations.append(UpdateOne(
+                {"channel_id": result["channel_id"], "day": day},
+                {
+                    "$push": {"events": {"$each": [event], "$slice": -POST_HISTORY_BUCKET_LIMIT}},
+                    "$inc": {f"counts.{action}_{result['status']}": 1}
+                },
+                upsert=True
+            ))
+
+        if not operations:
+            return True
+
+        try:
+            self.db.post_history.bulk_write(operations, ordered=False)
+            return True
+        except PyMongoError as e:
+            logger.error(f"Error guardando historial de publicaciones: {e}")
+            return False
+
+    def save_scheduled_job(self, job_id, kind, run_at, payload):
+        """Guarda (o reemplaza) un trabajo programado con su próxima ejecución en UTC."""
+        try:
+            self.db.scheduled_jobs.update_one(
+                {"job_id": job_id},
+                {"$set": {"kind": kind, "run_at": run_at, "payload": payload}},
+                upsert=True
+            )
+            return True
+        except PyMongoError as e:
+            logger.error(f"Error guardando trabajo programado {job_id}: {e}")
+            return False
+
+    def get_scheduled_jobs(self):
+        """Obtiene todos los trabajos programados ordenados por fecha de ejecución."""
+        try:
+            return list(self.db.scheduled_jobs.find({}, {'_id': 0}).sort("run_at", 1))
+        except PyMongoError as e:
+            logger.error(f"Error obteniendo trabajos programados: {e}")
+            return []
+
+    def delete_scheduled_job(self, job_id, run_at=None):
+        """Elimina un trabajo programado.
+
+        Si se indica `run_at`, solo se elimina si no se ha reprogramado desde entonces.
+        """
+        try:
+            query = {"job_id": job_id}
+            if run_at is not None:
+                query["run_at"] = run_at
+            result = self.db.scheduled_jobs.delete_one(query)
+            return result.deleted_count > 0
+        except PyMongoError as e:
+            logger.error(f"Error eliminando trabajo programado {job_id}: {e}")
+            return False
+
     def count_channels_by_type(self, user_id):
-        """Cuenta la cantidad de canales y grupos añadidos por un usuario."""
+        """Devuelve los totales de canales, grupos y suscriptores de un usuario.
+
+        Se lee un único documento de owner_stats, que se mantiene al aprobar,
+        eliminar o actualizar los suscriptores de un canal.
+        """
+        empty = {"canales": 0, "grupos": 0, "subs_canales": 0, "subs_grupos": 0, "total_subs": 0}
         try:
-            channels = self.get_approved_channels(user_id=user_id)
-            canal_count = 0
-            grupo_count = 0
-            total_subs = 0
+            stats = self.db.owner_stats.find_one({"_id": user_id})
+            if not stats:
+                return empty
             
-            for channel in channels:
-                if "channel" in channel.get("channel_id", ""):
-                    canal_count += 1
-                else:
-                    grupo_count += 1
-                total_subs += channel.get("subscribers", 0)
-                
             return {
-                "canales": canal_count,
-                "grupos": grupo_count,
-                "total_subs": total_subs
+                "canales": stats["channels"],
+                "grupos": stats["groups"],
+                "subs_canales": stats["channel_subs"],
+                "subs_grupos": stats["group_subs"],
+                "total_subs": stats["channel_subs"] + stats["group_subs"]
             }
         except PyMongoError as e:
             logger.error(f"Error contando canales por tipo: {e}")
-            return {"canales": 0, "grupos": 0, "total_subs": 0}
+            return empty
+
+
+# Envoltura asíncrona para usar la base de datos desde los manejadores
+class AsyncMongoDB:
+    """Expone la misma API que MongoDB pero sin bloquear el bucle de eventos.
+
+    Cada llamada se ejecuta en un pool de hilos acotado; pymongo es seguro
+    entre hilos, por lo que todas las llamadas comparten el mismo cliente.
+    """
+
+    def __init__(self, sync_db, max_workers=DB_MAX_WORKERS):
+        self.sync = sync_db
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="mongo")
+
+    def __getattr__(self, name):
+        attr = getattr(self.sync, name)
+        if not callable(attr):
+            return attr
+
+        @functools.wraps(attr)
+        async def wrapper(*args, **kwargs):
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self.executor, functools.partial(attr, *args, **kwargs))
+
+        # Guardar el envoltorio para no recrearlo en cada llamada
+        setattr(self, name, wrapper)
+        return wrapper
+
+    def close(self):
+        """Espera a que terminen las consultas en curso y libera los hilos."""
+        self.executor.shutdown(wait=True)
+
+
+# Búfer de escritura diferida para las estadísticas por mensaje
+class StatsBuffer:
+    """Acumula los incrementos de estadísticas en memoria y los escribe en lote.
+
+    Los incrementos se fusionan por (user_id, chat_id, stat_type) y se envían
+    con un único bulk_write no ordenado cada cierto intervalo o cuando hay
+    demasiadas entradas pendientes.
+    """
+
+    def __init__(self, db, max_entries=STATS_FLUSH_MAX_ENTRIES):
+        self.db = db
+        self.max_entries = max_entries
+        self.pending = {}
+        self._lock = asyncio.Lock()
+        self._flush_task = None
+        self.metrics = {
+            "flushes": 0,
+            "written": 0,
+            "errors": 0,
+            "last_size": 0,
+            "last_ms": 0.0,
+            "max_ms": 0.0
+        }
+
+    def add(self, user_id, chat_id, stat_type, count=1):
+        """Registra un incremento; no realiza ninguna consulta."""
+        entry = self.pending.get((user_id, chat_id))
+        if entry is None:
+            entry = self.pending[(user_id, chat_id)] = {"inc": {}, "last_active": None}
+        entry["inc"][stat_type] = entry["inc"].get(stat_type, 0) + count
+        entry["last_active"] = datetime.now().isoformat()
+
+        if len(self.pending) >= self.max_entries and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.get_running_loop().create_task(self.flush())
+
+    def _merge(self, batch):
+        """Devuelve al búfer los incrementos que no se pudieron escribir."""
+        for key, delta in batch.items():
+            entry = self.pending.setdefault(key, {"inc": {}, "last_active": delta["last_active"]})
+            for stat_type, count in delta["inc"].items():
+                entry["inc"][stat_type] = entry["inc"].get(stat_type, 0) + count
+
+    async def flush(self):
+        """Escribe todos los incrementos pendientes. Devuelve cuántos documentos se escribieron."""
+        async with self._lock:
+            if not self.pending:
+                return 0
+
+            batch, self.pending = self.pending, {}
+            start = time.perf_counter()
+            failed = await self.db.bulk_update_user_stats(batch)
+            elapsed_ms = (time.perf_counter() - start) * 1000
+
+            if failed:
+                self.metrics["errors"] += 1
+                self._merge({key: batch[key] for key in failed})
+
+            written = len(batch) - len(failed)
+            self.metrics["flushes"] += 1
+            self.metrics["written"] += written
+            self.metrics["last_size"] = len(batch)
+            self.metrics["last_ms"] = elapsed_ms
+            self.metrics["max_ms"] = max(self.metrics["max_ms"], elapsed_ms)
+            return written
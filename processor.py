@@ -0,0 +1,64 @@
+import asyncio
+import sys
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+
+# Procesador de actualizaciones concurrente con orden por chat
+class KeyedUpdateProcessor(BaseUpdateProcessor):
+    """Procesa actualizaciones de chats distintos en paralelo.
+
+    Las actualizaciones del mismo chat (o del mismo usuario si no hay chat) se
+    ejecutan una detrás de otra y en el orden de llegada, porque esperan al
+    mismo candado y los candados de asyncio atienden por orden.
+
+    El límite global se aplica después de obtener el candado del chat: así
+    las actualizaciones que esperan a un chat ocupado no retienen permisos y
+    no bloquean a los demás chats. Por eso a BaseUpdateProcessor se le pasa
+    un límite que nunca se alcanza.
+    """
+
+    def __init__(self, max_concurrent_updates):
+        super().__init__(sys.maxsize)
+        self._limit = asyncio.Semaphore(max_concurrent_updates)
+        # Candado de cada clave y número de actualizaciones que lo usan
+        self._locks = {}
+
+    @staticmethod
+    def update_key(update):
+        """Devuelve la clave que ordena la actualización, o None si puede ir en paralelo."""
+        if not isinstance(update, Update):
+            return None
+        if update.effective_chat:
+            return update.effective_chat.id
+        if update.effective_user:
+            return update.effective_user.id
+        return None
+
+    async def do_process_update(self, update, coroutine):
+        key = self.update_key(update)
+        if key is None:
+            async with self._limit:
+                await coroutine
+            return
+
+        entry = self._locks.get(key)
+        if entry is None:
+            entry = self._locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+
+        try:
+            async with entry[0], self._limit:
+                await coroutine
+        finally:
+            # Liberar el candado cuando ya no queda nadie esperando en ese chat
+            entry[1] -= 1
+            if not entry[1]:
+                del self._locks[key]
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
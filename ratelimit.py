@@ -0,0 +1,88 @@
+import asyncio
+import logging
+import time
+from datetime import timedelta
+
+from telegram.error import RetryAfter
+
+logger = logging.getLogger(__name__)
+
+
+# Limitador de envíos a la API de Telegram
+class RateLimiter:
+    """Token bucket global más un intervalo mínimo entre envíos al mismo chat.
+
+    Telegram permite a un bot unos 30 mensajes por segundo en total y
+    aproximadamente uno por segundo en cada chat.
+    """
+
+    def __init__(self, rate, chat_interval, burst=None):
+        self.rate = rate
+        self.chat_interval = chat_interval
+        self.burst = burst or rate
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        # Momento a partir del cual vuelve a estar permitido enviar (tras un RetryAfter)
+        self._paused_until = 0.0
+        # Próximo hueco libre de cada chat
+        self._chat_next = {}
+        self._lock = asyncio.Lock()
+        self.waits = 0
+        self.retries = 0
+
+    def _reserve_chat(self, chat_id, now):
+        """Reserva el siguiente hueco del chat y devuelve cuántos segundos hay que esperar."""
+        if len(self._chat_next) > 1000:
+            self._chat_next = {key: value for key, value in self._chat_next.items() if value > now}
+
+        slot = max(now, self._chat_next.get(chat_id, 0.0))
+        self._chat_next[chat_id] = slot + self.chat_interval
+        return slot - now
+
+    async def acquire(self, chat_id=None):
+        """Espera hasta poder enviar un mensaje a `chat_id`."""
+        if chat_id is not None:
+            delay = self._reserve_chat(chat_id, time.monotonic())
+            if delay > 0:
+                self.waits += 1
+                await asyncio.sleep(delay)
+
+        # El candado mantiene el orden de llegada entre quienes esperan un token
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                delay = self._paused_until - now
+                if delay <= 0 and self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                if delay <= 0:
+                    delay = (1 - self._tokens) / self.rate
+                self.waits += 1
+                await asyncio.sleep(delay)
+
+    def pause(self, seconds):
+        """Detiene todos los envíos durante `seconds` segundos."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0.0
+
+    async def call(self, chat_id, func, /, *args, max_retries=3, **kwargs):
+        """Ejecuta `func` respetando los límites y reintentando tras un RetryAfter."""
+        for attempt in range(max_retries + 1):
+            await self.acquire(chat_id)
+            try:
+                return await func(*args, **kwargs)
+            except RetryAfter as e:
+                if attempt == max_retries:
+                    raise
+
+                retry_after = e.retry_after
+                if isinstance(retry_after, timedelta):
+                    retry_after = retry_after.total_seconds()
+
+                self.retries += 1
+                logger.warning(f"Límite de Telegram alcanzado en {chat_id}, reintentando en {retry_after}s")
+                self.pause(retry_after)
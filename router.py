@@ -0,0 +1,63 @@
+# Enrutador de callbacks de botones
+class CallbackRouter:
+    """Asocia valores de callback_data con sus manejadores.
+
+    Primero busca una coincidencia exacta en un diccionario y, si no la hay,
+    el prefijo registrado más largo recorriendo un trie carácter a carácter.
+    En las rutas por prefijo, el resto del callback_data se entrega al
+    manejador en `context.args[0]`, igual que los argumentos de un comando.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        # Cada nodo es un dict de carácter -> nodo; el manejador se guarda en la clave None
+        self.trie = {}
+
+    def exact(self, *values):
+        """Registra el manejador decorado para los callback_data indicados."""
+        def decorator(handler):
+            for value in values:
+                if value in self.routes:
+                    raise ValueError(f"Callback duplicado: {value}")
+                self.routes[value] = handler
+            return handler
+        return decorator
+
+    def prefix(self, *prefixes):
+        """Registra el manejador decorado para los callback_data que empiezan por los prefijos indicados."""
+        def decorator(handler):
+            for prefix in prefixes:
+                node = self.trie
+                for char in prefix:
+                    node = node.setdefault(char, {})
+                if None in node:
+                    raise ValueError(f"Prefijo de callback duplicado: {prefix}")
+                node[None] = handler
+            return handler
+        return decorator
+
+    def resolve(self, data):
+        """Devuelve (manejador, resto) para `data`, o (None, None) si no hay ruta."""
+        handler = self.routes.get(data)
+        if handler is not None:
+            return handler, None
+
+        match = (None, None)
+        node = self.trie
+        for index, char in enumerate(data):
+            node = node.get(char)
+            if node is None:
+                break
+            if None in node:
+                match = (node[None], data[index + 1:])
+        return match
+
+    async def dispatch(self, update, context):
+        """Ejecuta el manejador del callback. Devuelve False si no hay ninguno registrado."""
+        handler, rest = self.resolve(update.callback_query.data or "")
+        if handler is None:
+            return False
+
+        context.args = [] if rest is None else [rest]
+        await handler(update, context)
+        return True
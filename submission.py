@@ -0,0 +1,152 @@
+import re
+import unicodedata
+from bisect import bisect_left
+
+# Expresiones precompiladas del formato de solicitud
+_USERNAME_RE = re.compile(r'@(\w+)')
+_ID_RE = re.compile(r'\bid\b\D*?(-?\d+)|^(-100\d+)$', re.IGNORECASE)
+
+
+def normalize_category(text):
+    """Normaliza un nombre de categoría: sin acentos, sin emojis, en minúsculas y con espacios simples."""
+    chars = []
+    for char in unicodedata.normalize("NFKD", text):
+        kind = unicodedata.category(char)
+        if kind[0] in "LN" or char == "+":
+            chars.append(char.lower())
+        elif kind[0] in "ZP":
+            chars.append(" ")
+        # Marcas (acentos, selectores de variante) y símbolos (emojis) se descartan
+    return " ".join("".join(chars).split())
+
+
+# Índice de categorías por nombre normalizado
+class CategoryIndex:
+    """Resuelve el texto escrito por el usuario a una categoría de CATEGORIES.
+
+    Busca primero una coincidencia exacta del nombre normalizado o de un
+    alias y, si no la hay, las categorías que tienen alguna palabra que
+    empieza por el texto. Las claves de prefijo están ordenadas, así que la
+    búsqueda es una bisección en lugar de recorrer todas las categorías.
+    """
+
+    def __init__(self, categories, aliases=None):
+        self.exact = {}
+        self.order = {category: position for position, category in enumerate(categories)}
+        # Pares (sufijo normalizado desde el inicio de cada palabra, categoría) ordenados
+        self.prefixes = []
+        for category in categories:
+            key = normalize_category(category)
+            self.exact[key] = category
+            words = key.split(" ")
+            for index in range(len(words)):
+                self.prefixes.append((" ".join(words[index:]), category))
+        self.prefixes.sort()
+        self._keys = [key for key, _ in self.prefixes]
+
+        for alias, category in (aliases or {}).items():
+            if category not in categories:
+                raise ValueError(f"Alias de categoría desconocida: {alias} -> {category}")
+            self.exact.setdefault(normalize_category(alias), category)
+
+    def candidates(self, text):
+        """Devuelve las categorías que encajan con `text`, en el orden de CATEGORIES."""
+        key = normalize_category(text)
+        if not key:
+            return []
+        if key in self.exact:
+            return [self.exact[key]]
+
+        found = []
+        index = bisect_left(self._keys, key)
+        while index < len(self._keys) and self._keys[index].startswith(key):
+            category = self.prefixes[index][1]
+            if category not in found:
+                found.append(category)
+            index += 1
+        found.sort(key=self.order.get)
+        return found
+
+
+# Resultado del análisis de una solicitud
+class ParsedSubmission:
+    """Campos extraídos de un mensaje y, si no es válido, el motivo.
+
+    `error` vale None si la solicitud es correcta, "unknown_category",
+    "ambiguous_category" (ver `candidates`) o "missing_fields" (ver `missing`).
+    """
+
+    __slots__ = (
+        "category_text", "category", "candidates", "channel_name",
+        "channel_username", "channel_id", "error", "missing"
+    )
+
+    def __init__(self, category_text):
+        self.category_text = category_text
+        self.category = None
+        self.candidates = []
+        self.channel_name = None
+        self.channel_username = None
+        self.channel_id = None
+        self.error = None
+        self.missing = []
+
+
+def parse_submission(text, index):
+    """Analiza un mensaje de solicitud recorriendo sus líneas una sola vez.
+
+    Devuelve None si el mensaje no tiene ninguna línea que empiece por "#",
+    es decir, si no es una solicitud.
+    """
+    if "#" not in text:
+        return None
+
+    result = None
+    expect_name = False
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+
+        if result is None:
+            # Todo lo anterior a la línea de categoría se ignora
+            if line[0] == "#":
+                result = ParsedSubmission(line[1:].strip())
+                expect_name = True
+            continue
+
+        if expect_name:
+            # La línea siguiente a la categoría es el nombre del canal
+            result.channel_name = line
+            expect_name = False
+            continue
+
+        if result.channel_username is None and "@" in line and "admin" not in line.lower():
+            match = _USERNAME_RE.search(line)
+            if match:
+                result.channel_username = match.group(1)
+
+        if result.channel_id is None:
+            match = _ID_RE.search(line)
+            if match:
+                result.channel_id = match.group(1) or match.group(2)
+
+    if result is None:
+        return None
+
+    result.candidates = index.candidates(result.category_text)
+    if not result.candidates:
+        result.error = "unknown_category"
+        return result
+    if len(result.candidates) > 1:
+        result.error = "ambiguous_category"
+        return result
+    result.category = result.candidates[0]
+
+    result.missing = [
+        field for field in ("channel_name", "channel_username", "channel_id")
+        if getattr(result, field) is None
+    ]
+    if result.missing:
+        result.error = "missing_fields"
+    return result
@@ -0,0 +1,59 @@
+"""Pruebas de advertencias contra un MongoDB real.
+
+Necesitan TEST_MONGO_URI apuntando a un servidor desechable (se usa y se
+borra la base de datos botonera_bot_test); sin ella se omiten.
+"""
+import os
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+from pymongo import MongoClient
+
+from config import WARNING_MAX_REASONS
+from db import MongoDB
+
+
+pytestmark = pytest.mark.skipif(not os.getenv("TEST_MONGO_URI"), reason="TEST_MONGO_URI no configurada")
+
+
+@pytest.fixture
+def database():
+    client = MongoClient(os.getenv("TEST_MONGO_URI"))
+    db = MongoDB()
+    db.client = client
+    db._db = client.botonera_bot_test
+    db._db.warnings.create_index([("user_id", 1), ("chat_id", 1)], unique=True)
+    db._ready = True
+    yield db
+    client.drop_database("botonera_bot_test")
+
+
+def test_parallel_warns_are_not_lost(database):
+    with ThreadPoolExecutor(max_workers=100) as executor:
+        counts = list(executor.map(lambda i: database.add_warning(1, -100, f"motivo {i}"), range(100)))
+
+    # Cada advertencia ve un recuento distinto y ninguna se pierde
+    assert sorted(counts) == list(range(1, 101))
+    warnings = database.get_warnings(1, -100)
+    assert warnings["count"] == 100
+    assert len(warnings["reasons"]) == WARNING_MAX_REASONS
+
+
+def test_expired_warnings_start_again(database):
+    database.db.warnings.insert_one({
+        "user_id": 2,
+        "chat_id": -100,
+        "count": 2,
+        "reasons": [{"reason": "antiguo", "date": "2020-01-01T00:00:00"}],
+        "expires_at": datetime.utcnow() - timedelta(minutes=1)
+    })
+
+    assert database.get_warnings(2, -100)["count"] == 0
+    assert database.add_warning(2, -100, "nuevo") == 1
+    assert [item["reason"] for item in database.get_warnings(2, -100)["reasons"]] == ["nuevo"]
+
+
+def test_reason_with_dollar_is_stored_literally(database):
+    database.add_warning(3, -100, "$count")
+    assert database.get_warnings(3, -100)["reasons"][0]["reason"] == "$count"